@@ -1,13 +1,36 @@
 
-from .getFilenames import getFilenames
-from .getDataframe import getDataFrame
+from .getFilenames import getFilenames, iterFilenames
+from .getDataframe import getDataFrame, setSamplesFloat32, getLogfileHeader
+from .parallelParse import getExecutor, iterDataFrames, submitFilenames, iterFutures
+from .dataframeCache import DataFrameCache, DEFAULT_CACHE_DIR
 from .mergeDataframes import mergeDataFrames
+from .spillMerge import SpillMerge, getInputSize
+from .processTestName import processTestName, iterTestNames
+from .incrementalState import IncrementalState, getFingerprint, DEFAULT_STATE_DIR
+from .watchDirs import DirWatcher
+from .manifestIndex import ManifestIndex, DEFAULT_MANIFEST_INDEX
+from .fileDedup import FileDeduplicator
+from .hwIndex import HwIndex, getTestSessionData, getHwStatistics, HW_FIELDS, DEFAULT_INDEX_FILE
+from .measurementStore import MeasurementStore, DEFAULT_STORE_FILE
 from .progressbar import Bar
-from .getExcelfile import getExcelfile, getSheetName, getgroupedCells
+from .getExcelfile import getExcelfile, getSheetName, getgroupedCells, writeCachedFormulas, writeTableRows, \
+    isTableRowsSupported
+from .getStatistics import getStatistics, getCpk, STATS_OUTPUT_MODES
+from .runMetrics import RunMetrics, TimedParser
+from .exportResults import checkExportFormats, getExportDataframe, getExportPath, writeExport, EXPORT_FORMATS
 from .parseConfigFile import ConfigFile, valueCheck, loadConfigfile
 from .dbg import dbg_console ,dbg
 
-__all__ = ['getFilenames','getDataFrame','mergeDataFrames', 'Bar',
-           'getExcelfile', 'getSheetName', 'getgroupedCells',
+__all__ = ['getFilenames','iterFilenames','getDataFrame','setSamplesFloat32','getLogfileHeader','getExecutor','iterDataFrames',
+           'submitFilenames','iterFutures',
+           'DataFrameCache', 'DEFAULT_CACHE_DIR','mergeDataFrames', 'SpillMerge', 'getInputSize',
+           'processTestName', 'iterTestNames', 'IncrementalState', 'getFingerprint', 'DEFAULT_STATE_DIR', 'DirWatcher',
+           'ManifestIndex', 'DEFAULT_MANIFEST_INDEX', 'FileDeduplicator',
+           'HwIndex', 'getTestSessionData', 'getHwStatistics', 'HW_FIELDS', 'DEFAULT_INDEX_FILE',
+           'MeasurementStore', 'DEFAULT_STORE_FILE', 'Bar',
+           'getExcelfile', 'getSheetName', 'getgroupedCells', 'writeCachedFormulas', 'writeTableRows', 'isTableRowsSupported',
+           'getStatistics', 'getCpk', 'STATS_OUTPUT_MODES',
+           'RunMetrics', 'TimedParser',
+           'checkExportFormats', 'getExportDataframe', 'getExportPath', 'writeExport', 'EXPORT_FORMATS',
            'ConfigFile', 'dbg_console', 'valueCheck','loadConfigfile','dbg']
 
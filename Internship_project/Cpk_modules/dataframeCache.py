@@ -0,0 +1,146 @@
+"""
+@file dataframeCache.py
+This module defines a class to keep the DataFrame returned by getDataFrame() for each logfile on disk.
+A cached DataFrame is used again only if the path, size and modification time of the logfile are unchanged.
+"""
+
+import os
+import hashlib
+import pickle
+import shutil
+import tempfile
+import zlib
+import pandas as pd
+from .getDataframe import getDataFrame
+
+# Increase CACHE_VERSION if the layout of the DataFrame returned by getDataFrame() changes.
+CACHE_VERSION = 3
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'Cpk_Tool', 'DataFrames')
+
+class DataFrameCache():
+    """
+    This class takes the cache directory and the maximum cache size (bytes) as arguments.
+    Each entry is a small pickled header {version, path, size, mtime} followed by the zlib compressed DataFrame pickle.
+    Only the header has to be read to validate an entry.
+    """
+
+    def __init__(self, cacheDir, maxSize):
+        self.cacheDir = cacheDir
+        self.maxSize = maxSize
+
+    def entryPath(self, filepath):
+        """
+        This function returns the path of the cache entry of a logfile.
+        @param filepath logfile path
+        @return cache entry path eg: cacheDir/3f/3f5a...e1.pkl
+        """
+        key = hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()
+        return os.path.join(self.cacheDir, key[:2], key + '.pkl')
+
+    def load(self, filepath, size, mtime):
+        """
+        This function reads the cached DataFrame of a logfile.
+        @param filepath logfile path
+        @param size logfile size in bytes
+        @param mtime logfile modification time in ns
+        @return DataFrame or None if there is no valid entry.
+        """
+        entry = self.entryPath(filepath)
+        try:
+            with open(entry, 'rb') as f:
+                header = pickle.load(f)
+                if header != {'version': CACHE_VERSION, 'path': os.path.abspath(filepath), 'size': size, 'mtime': mtime}:
+                    return None
+                DataFrame = pickle.loads(zlib.decompress(f.read()))
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError, zlib.error):
+            return None
+
+        # Updating the access time of the entry, least recently used entries are evicted first.
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return DataFrame
+
+    def store(self, filepath, size, mtime, DataFrame):
+        """
+        This function writes the DataFrame of a logfile to the cache.
+        The entry is written to a temporary file first and renamed, so parallel workers never read half written entries.
+        @param filepath logfile path
+        @param size logfile size in bytes
+        @param mtime logfile modification time in ns
+        @param DataFrame DataFrame returned by getDataFrame()
+        """
+        entry = self.entryPath(filepath)
+        header = {'version': CACHE_VERSION, 'path': os.path.abspath(filepath), 'size': size, 'mtime': mtime}
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(entry), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.write(zlib.compress(pickle.dumps(DataFrame, protocol=pickle.HIGHEST_PROTOCOL), 1))
+            os.replace(tmpPath, entry)
+        except OSError:
+            # The cache is only an optimisation, a failing write must not stop the program.
+            pass
+
+    def getDataFrame(self, filepath):
+        """
+        This function returns the cached DataFrame of a logfile. If the logfile is new or changed it is parsed
+        with getDataFrame() and the result is stored in the cache.
+        @param filepath logfile path
+        @return Dataframe, empty if the logfile is not found anymore.
+        """
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return pd.DataFrame()
+        DataFrame = self.load(filepath, stat.st_size, stat.st_mtime_ns)
+        if DataFrame is None:
+            DataFrame = getDataFrame(filepath)
+            self.store(filepath, stat.st_size, stat.st_mtime_ns, DataFrame)
+        return DataFrame
+
+    def entries(self):
+        """
+        This function lists the cache entries.
+        @return list of tuples (last access time, size, entry path)
+        """
+        entries = []
+        if not os.path.isdir(self.cacheDir):
+            return entries
+        for subdir in os.scandir(self.cacheDir):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.endswith('.pkl'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """
+        This function deletes the least recently used entries until the cache is smaller than maxSize.
+        @return number of deleted entries
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        deleted = 0
+        for _, size, path in entries:
+            if total <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            deleted += 1
+        return deleted
+
+    def clear(self):
+        """
+        This function deletes all the cache entries.
+        """
+        if os.path.isdir(self.cacheDir):
+            shutil.rmtree(self.cacheDir)
@@ -0,0 +1,105 @@
+"""
+@file exportResults.py
+This module defines functions that export the final Dataframe of each testName as a columnar file.
+The exported Dataframe has the IDs, limits, outlier limits, statistics, histogram, samples and settings columns of the
+worksheet table with numeric dtypes, the empty group marker columns (eg: LIMIT_1, STATS_1) are dropped.
+Parquet and Feather files need pyarrow, it is imported only when one of these formats is requested. It is an optional
+requirement, see requirements-optional.txt.
+"""
+
+import os
+import re
+import numpy as np
+import pandas as pd
+
+# Formats of OUTPUT_FORMATS in configuration file. 'xlsx' is the Excel workbook.
+EXPORT_FORMATS = ['parquet', 'csv', 'feather']
+OUTPUT_FORMATS = ['xlsx'] + EXPORT_FORMATS
+
+# Formats which need pyarrow.
+ARROW_FORMATS = ['parquet', 'feather']
+
+def checkExportFormats(formats):
+    """
+    This function checks the formats of OUTPUT_FORMATS in configuration file.
+    @param formats list of formats.
+    @return tuple (list of valid formats, list of (format, reason) of the rejected ones)
+    """
+    valid = []
+    rejected = []
+    for fmt in formats:
+        if fmt not in OUTPUT_FORMATS:
+            rejected.append((fmt, 'unknown format'))
+        elif fmt in ARROW_FORMATS and not hasArrow():
+            rejected.append((fmt, 'pyarrow is not installed'))
+        elif fmt not in valid:
+            valid.append(fmt)
+    return valid, rejected
+
+def hasArrow():
+    """
+    This function checks if pyarrow can be imported.
+    @return boolean
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+def getExportDataframe(finalDF, StatsDF=None):
+    """
+    This function returns a copy of the final Dataframe to export.
+    The group marker columns are dropped, the statistic columns are replaced by the computed values and blank
+    cells ('') are nan. Columns with numbers only are converted to numeric dtypes, other columns are strings.
+    @param finalDF final Dataframe of a worksheet.
+    @param StatsDF Dataframe of computed statistics, see getStatistics().
+    @return Dataframe
+    """
+    markers = re.findall('(?:STATS_|HIST_|LIMIT_|SAMPLES_)[0-9]+|SETTINGS', str(finalDF.columns.tolist()))
+    cols = [col for col in finalDF.columns if col not in markers]
+    DataFrame = finalDF[cols].copy()
+    if StatsDF is not None:
+        for col in StatsDF.columns:
+            if col in DataFrame: DataFrame[col] = StatsDF[col]
+
+    for col in DataFrame.columns:
+        Series = DataFrame[col]
+        if Series.dtype != object:
+            continue
+        Series = Series.replace('', np.nan)
+        Numeric = pd.to_numeric(Series, errors='coerce')
+        if Numeric.isnull().equals(Series.isnull()):
+            Series = Numeric
+        else:
+            # A value which is not a number is nan in Numeric, the column keeps its original values as strings.
+            Series = Series.where(Series.isnull(), Series.astype(str))
+        DataFrame[col] = Series
+    return DataFrame.reset_index(drop=True)
+
+def getExportPath(exportDir, testName, fmt):
+    """
+    This function returns the path of the exported file of a testName eg: exportDir/testName.parquet
+    """
+    return os.path.join(exportDir, testName + '.' + fmt)
+
+def writeExport(DataFrame, path, fmt):
+    """
+    This function writes the Dataframe in the given format. The file is written to a temporary name first, so a
+    reader never sees a partial file.
+    @param DataFrame Dataframe returned by getExportDataframe().
+    @param path file path
+    @param fmt 'parquet', 'csv' or 'feather'
+    @return path
+    """
+    tmpPath = path + '.tmp'
+    if fmt == 'parquet':
+        DataFrame.to_parquet(tmpPath, engine='pyarrow')
+    elif fmt == 'feather':
+        DataFrame.to_feather(tmpPath)
+    elif fmt == 'csv':
+        DataFrame.to_csv(tmpPath, index=False)
+    else:
+        raise ValueError('Unknown export format: {0}'.format(fmt))
+    os.rename(tmpPath, path)
+    return path
@@ -0,0 +1,214 @@
+"""
+@file fileDedup.py
+This module defines the FileDeduplicator class that finds the copies of the selected logfiles, eg: groups whose root
+directories overlap or point at mirrored directories select the same logfile under several paths.
+
+The logfiles are compared in steps, each step only reads the files which are not yet told apart:
+    - paths of the same file (same device and inode, eg: a symbolic link to a mirrored directory) are copies.
+    - files of different sizes are different.
+    - files of the same size are compared by a sha1 of their first and last blocks.
+    - files with the same blocks are compared by a sha1 of their whole content.
+The first path of a content in the order of discovery is kept, its copies are reported as duplicates of it.
+"""
+
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Size of the first and last blocks hashed to compare files of the same size.
+BLOCK_SIZE = 64*1024
+
+# Size of the chunks read to hash a whole file.
+CHUNK_SIZE = 1024*1024
+
+def getBlocksHash(filepath, blockSize=BLOCK_SIZE):
+    """
+    This function hashes the first and last blocks of a file, the whole file if it is not larger than two blocks.
+    @param filepath file path
+    @param blockSize size of the blocks in bytes
+    @return sha1 hex string, None if the file can't be read.
+    """
+    sha1 = hashlib.sha1()
+    try:
+        with open(filepath, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= 2*blockSize:
+                sha1.update(f.read())
+            else:
+                sha1.update(f.read(blockSize))
+                f.seek(size - blockSize)
+                sha1.update(f.read(blockSize))
+    except OSError:
+        return None
+    return sha1.hexdigest()
+
+def getFullHash(filepath):
+    """
+    This function hashes the whole content of a file.
+    @param filepath file path
+    @return sha1 hex string, None if the file can't be read.
+    """
+    sha1 = hashlib.sha1()
+    try:
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha1.update(chunk)
+    except OSError:
+        return None
+    return sha1.hexdigest()
+
+
+class FileDeduplicator(object):
+
+    def __init__(self, threads=8, blockSize=BLOCK_SIZE):
+        """
+        @param threads number of threads to hash the files.
+        @param blockSize size of the first and last blocks in bytes.
+        """
+        self.threads = max(threads, 1)
+        self.blockSize = blockSize
+        self.canonical = {}     # {filepath: path of the first copy}, the path itself if it is the first copy
+        self.inodes = {}        # {(device, inode): filepath}
+        self.sizes = {}         # {size: list of the first copies of that size in order of discovery}
+        self.blocks = {}        # {filepath: hash of the first and last blocks}
+        self.hashes = {}        # {filepath: hash of the whole file}, only for files with the same blocks
+        self.duplicates = []    # list of tuples (filepath, path of the first copy)
+
+    def hashFiles(self, hashes, files, function):
+        """
+        This function hashes the files which are not yet in hashes, the files are read in threads.
+        @param hashes dictionary {filepath: hash} updated with the new hashes.
+        @param files list of file paths
+        @param function function that takes a file path and returns its hash.
+        """
+        files = [file for file in files if file not in hashes]
+        if len(files) == 0:
+            return
+        if self.threads == 1 or len(files) == 1:
+            hashes.update(zip(files, map(function, files)))
+        else:
+            with ThreadPoolExecutor(max_workers=self.threads) as pool:
+                hashes.update(zip(files, pool.map(function, files)))
+
+    def setDuplicate(self, filepath, first):
+        self.canonical[filepath] = first
+        self.duplicates.append((filepath, first))
+
+    def add(self, filesList):
+        """
+        This function compares new files with each other and with the files added before.
+        @param filesList list of file paths in order of discovery, the paths added before are skipped.
+        @return number of new duplicates
+        """
+        duplicates = len(self.duplicates)
+        sizes = set()
+        for file in filesList:
+            if file in self.canonical:
+                continue
+            try:
+                stat = os.stat(file)
+            except OSError:
+                self.canonical[file] = file
+                continue
+            inode = (stat.st_dev, stat.st_ino)
+            if inode in self.inodes:
+                self.setDuplicate(file, self.inodes[inode])
+                continue
+            self.inodes[inode] = file
+            self.canonical[file] = file
+            self.sizes.setdefault(stat.st_size, []).append(file)
+            sizes.add(stat.st_size)
+
+        # A file whose size is unique has no copy.
+        sizes = [size for size in sizes if len(self.sizes[size]) > 1]
+        self.hashFiles(self.blocks, [file for size in sizes for file in self.sizes[size]],
+                       lambda file: getBlocksHash(file, self.blockSize))
+
+        # Files with the same size and blocks are compared by their whole content.
+        collisions = []
+        for size in sizes:
+            byBlocks = {}
+            for file in self.sizes[size]:
+                if self.blocks[file] is not None:
+                    byBlocks.setdefault(self.blocks[file], []).append(file)
+            collisions.extend(file for files in byBlocks.values() if len(files) > 1 for file in files)
+        self.hashFiles(self.hashes, collisions, getFullHash)
+
+        # The first file of each content is kept, a file which can't be read is kept as its own content.
+        for size in sizes:
+            firstFiles = {}
+            kept = []
+            for file in self.sizes[size]:
+                blocks, fullHash = self.blocks[file], self.hashes.get(file, '')
+                key = file if blocks is None or fullHash is None else (blocks, fullHash)
+                if key in firstFiles:
+                    self.setDuplicate(file, firstFiles[key])
+                else:
+                    firstFiles[key] = file
+                    kept.append(file)
+            self.sizes[size] = kept
+        return len(self.duplicates) - duplicates
+
+    def getFirst(self, filepath):
+        """ @return path of the first copy of a file, the path itself if it was not added """
+        return self.canonical.get(filepath, filepath)
+
+    def dedup(self, testNames_dict):
+        """
+        This function removes the copies of the logfiles from testNames_dict. The paths of a copy are replaced by the
+        path of its first copy, so a logfile selected by several groups under different paths is parsed once, and a
+        group keeps one path of each logfile.
+        @param testNames_dict dictionary {testName: {group: list of logfile paths}}, or lists of (filepath, Future)
+               in streaming mode. A copy then gets the Future of its first copy, its own Future is cancelled if it is
+               not running yet. The Future is None for the logfiles which are not submitted yet.
+        @return tuple (testNames_dict, number of logfile paths removed)
+        """
+        self.add([file if isinstance(file, str) else file[0] for groupsDict in testNames_dict.values()
+                  for filesList in groupsDict.values() for file in filesList])
+        removed = 0
+        futures = {}    # {filepath: Future} of the first copies in streaming mode
+        for testName, groupsDict in testNames_dict.items():
+            for group, filesList in groupsDict.items():
+                groupFiles = set()
+                kept = []
+                for file in filesList:
+                    first = self.getFirst(file if isinstance(file, str) else file[0])
+                    if not isinstance(file, str):
+                        # A logfile discovered after the streaming budget has no Future.
+                        future = futures.get(first)
+                        if future is None:
+                            future = futures[first] = file[1]
+                        elif file[1] is not None and future is not file[1]:
+                            file[1].cancel()
+                        file = (first, future)
+                    if first in groupFiles:
+                        removed += 1
+                        continue
+                    groupFiles.add(first)
+                    kept.append(first if isinstance(file, str) else file)
+                groupsDict[group] = kept
+        return testNames_dict, removed
+
+    def dedupEntries(self, fileEntries, testNames_dict):
+        """
+        This function removes the copies of new logfiles, eg: found in WATCH mode.
+        @param fileEntries list of tuples (testName, group, filepath)
+        @param testNames_dict dictionary {testName: {group: list of logfile paths}} of the logfiles selected before.
+        @return tuple (list of tuples (testName, group, filepath) without copies, number of entries removed)
+        """
+        self.add([file for testName, group, file in fileEntries])
+        groupFiles = {}
+        kept = []
+        for testName, group, file in fileEntries:
+            first = self.getFirst(file)
+            if (testName, group) not in groupFiles:
+                groupFiles[(testName, group)] = set(testNames_dict.get(testName, {}).get(group, []))
+            if first in groupFiles[(testName, group)]:
+                continue
+            groupFiles[(testName, group)].add(first)
+            kept.append((testName, group, first))
+        return kept, len(fileEntries) - len(kept)
+
+    def getReport(self):
+        """ @return list of dictionaries {'file', 'copy_of'} of the duplicates in order of discovery """
+        return [{'file': file, 'copy_of': first} for file, first in self.duplicates]
@@ -0,0 +1,139 @@
+"""
+@file filenameTokenizer.py
+This module defines the FilenameTokenizer class that selects the logfiles of all groups by their name in one pass.
+
+A logfile name is split once on its dots into the fields matched by regex.getRegex():
+    Variant.HW.Task.Type1.Type2[.Test].YYYY.MM.DD.Time.ID.log    eg: Wave.Dig.Sampler.Calibration.Factory.Offset.2018.08.20.00h35m37s.th24695.log
+and the VARIANT/HW/TASK/TRANSITION/TEST/YEAR/MONTH filters of each group are checked with set lookups. Filter values
+which are not plain words are regular expressions, they are matched against the whole field.
+
+The selection is the same as with the group regex:
+    - if the fields pass the filters, the regex matches with the fields as groups, the file is selected.
+    - else the file is rejected if one of the filtered fields has plain word values and none of them is found in the
+      name, the regex can't match without it.
+    - else the group regex decides, eg: names with extra dots or a filter value which is found in another field.
+The excluded testNames are matched with one pattern of all EXCLUDE_FILES strings.
+"""
+
+import re
+from .regex import getRegex, Transition_len
+
+# Filter key and TRANSITION type of the fields before the test name, and the pattern of a field without filter.
+HEAD_FIELDS = [('VARIANT', None), ('HW', None), ('TASK', None), ('TRANSITION', 'Type1'), ('TRANSITION', 'Type2')]
+pattern_Word = re.compile('[A-Za-z]+')
+
+# Filter values which are checked by set lookups.
+pattern_Plain = re.compile('[A-Za-z0-9_]+')
+
+# Test name without filter: empty or starting with a letter.
+pattern_Test = re.compile('(?:(?:[A-Za-z]+)(?:.+)?)?')
+
+pattern_Year  = re.compile('[0-9]{4}')
+pattern_Month = re.compile('[0-9]{2}')
+pattern_Day   = re.compile('[0-9]{2}')
+pattern_Time  = re.compile('[a-z0-9]{9}')
+pattern_ID    = re.compile('[a-z0-9]+')
+
+# Number of fields after the test name: YYYY, MM, DD, Time, ID, log
+TAIL_FIELDS = 6
+
+def getFilterValues(Filter, key, Type=None):
+    """
+    This function returns the values of a filter field as regex.getRegex() reads them.
+    @return list of values, empty if the field is not filtered.
+    """
+    if Type is None:
+        return list(Filter[key])
+    if Transition_len(Filter, Type) == 0:
+        return []
+    return list(Filter['TRANSITION'][Type])
+
+def getFieldCheck(values, generic):
+    """
+    This function returns the check of a field.
+    @param values filter values of the field.
+    @param generic compiled pattern of the field without filter, it has to match the whole field.
+    @return tuple (function that takes the field and returns True if it passes, list of the values which are plain
+            words or None if the field is not filtered or has a regular expression value)
+    """
+    if len(values) == 0:
+        return generic.fullmatch, None
+    if all(pattern_Plain.fullmatch(value) for value in values):
+        return frozenset(values).__contains__, list(values)
+    return re.compile('(' + '|'.join(values) + ')').fullmatch, None
+
+def getExcluder(exclude_files):
+    """
+    This function returns the check of the excluded testNames, all strings are searched at once.
+    @param exclude_files list of strings, a testName which contains one of them is excluded.
+    @return function that takes a testName and returns True if it is excluded.
+    """
+    if len(exclude_files) == 0:
+        return lambda testName: False
+    pattern = re.compile('|'.join(re.escape(x) for x in exclude_files))
+    return lambda testName: pattern.search(testName) is not None
+
+
+class FilenameTokenizer(object):
+
+    def __init__(self, Filters, exclude_files):
+        """
+        @param Filters dictionary {group: filter}, see ConfigFile.filenameFilter().
+        @param exclude_files list of patterns, if found in testname then exclude that test name from selection.
+        """
+        self.excluded = getExcluder(exclude_files)
+        self.groups = {}
+        for group, Filter in Filters.items():
+            # The group regex decides the names which are not resolved by the fields.
+            pattern = re.compile(getRegex(Filter))
+            checks = [getFieldCheck(getFilterValues(Filter, key, Type), pattern_Word) for key, Type in HEAD_FIELDS]
+            checks.append(getFieldCheck(getFilterValues(Filter, 'TEST'), pattern_Test))
+            checks.append(getFieldCheck(getFilterValues(Filter, 'YEAR'), pattern_Year))
+            checks.append(getFieldCheck(getFilterValues(Filter, 'MONTH'), pattern_Month))
+            literals = [values for check, values in checks if values is not None]
+            self.groups[group] = ([check for check, values in checks], literals, pattern)
+
+    def getFields(self, filename):
+        """
+        This function splits a logfile name into its fields.
+        @return list [Variant, HW, Task, Type1, Type2, Test, YYYY, MM], or None if the name has not the form
+                Variant.HW.Task.Type1.Type2[.Test].YYYY.MM.DD.Time.ID.log
+        """
+        tokens = filename.split('.')
+        if len(tokens) < len(HEAD_FIELDS) + TAIL_FIELDS or tokens[-1] != 'log':
+            return None
+        if not (pattern_Day.fullmatch(tokens[-4]) and pattern_Time.fullmatch(tokens[-3]) and
+                pattern_ID.fullmatch(tokens[-2])):
+            return None
+        return tokens[:len(HEAD_FIELDS)] + ['.'.join(tokens[len(HEAD_FIELDS):-TAIL_FIELDS])] + tokens[-6:-4]
+
+    def select(self, filename, groups=None):
+        """
+        This function selects a logfile for the groups.
+        @param filename logfile name
+        @param groups list of groups to check, None for all groups.
+        @return tuple (testName, list of the groups which select the file), or None if no group selects it or its
+                testName is excluded.
+        """
+        if 'log' not in filename[1:]:
+            return None
+        fields = self.getFields(filename)
+        selected = []
+        for group in (self.groups if groups is None else groups):
+            checks, literals, pattern = self.groups[group]
+            if fields is not None and all(check(field) for check, field in zip(checks, fields)):
+                selected.append(group)
+                continue
+            if any(not any(value in filename for value in values) for values in literals):
+                continue
+            if pattern.match(filename) is not None:
+                selected.append(group)
+        if not selected:
+            return None
+
+        # The testName is the name up to the time stamp eg: .2018.08.20
+        testName = filename.split('.201')[0]
+
+        if self.excluded(testName):
+            return None
+        return testName, selected
@@ -55,6 +55,20 @@ patterns[KEY_RunNumber] = pattern_RunNumber
 patterns[KEY_Usagelines] = pattern_Usagelines
 patterns[KEY_Data] = pattern_Data
 
+# Dispatch table: first character of a line --> list of (key, pattern) that can match a line starting with it.
+# A line is only tried against the patterns it can match, in the same order as the patterns dictionary.
+# Data lines (P_;>>; / F_;>>;) are recognised with a plain string comparison before the dispatch table is used.
+linePatterns = {' ': [(KEY_STVersion, pattern_STversion), (KEY_Workstation, pattern_WorkStation)],
+                'R': [(KEY_RHELversion, pattern_RHELversion)],
+                'T': [(KEY_Timestamp, pattern_TimeStamp), (KEY_TestSession, pattern_TestSession)],
+                '*': [(KEY_RunNumber, pattern_RunNumber)],
+                '#': [(KEY_Usagelines, pattern_Usagelines)]}
+
+DATA_PREFIX = '_;>>;'
+
+# Value columns of the final DataFrame --> label prefix of the measurement columns eg: 'U1_' <-- U1, U2, ..., UN
+VALUE_COLS = [('MeasValues', 'A'), ('U1_', 'U'), ('L1_', 'L'), ('R_', 'R')]
+
 def e(): return sys.exit(1)
 
 def getMeasGroups(cols, measlabels):
@@ -78,45 +92,47 @@ def getMeasGroups(cols, measlabels):
         measGroups[key] = list(set(re.findall(pattern, cols)))
     return measGroups
 
-def updateKeys(Dict):
-    """
-    this function updates keys of dictionary
-    @param Dict
-    @return updated dictionary
+def stackMeasGroups(DataFrame, numeric_dict, measGroupsDict, measNames_dict, id_cols):
     """
-    groupDict = {}
-
-    for key, value in Dict.items():
-        if 'A' in key:
-            groupDict['MeasValues'] = value
-        elif 'U' in key:
-            groupDict['U1_'] = value
-        elif 'L' in key:
-            groupDict['L1_'] = value
-        elif 'R' in key:
-            groupDict['R_'] = value
-    return groupDict
-
-def getGroupsValuesDF(Series):
-    """
-    This fucntion iterate over each value of Series and each value is a list.
-    Unpack the values from Dataframe['Grouped Values'] in columns as ['MeasValues', 'U1', 'L1', 'R']
-    @param Series
+    This function stacks the measurement column groups of a DataFrame into long format with NumPy arrays.
+    Each measlabel adds one block of rows, in the order of measGroupsDict:
+        - id columns ['HwIds', 'MeasPointIds'] + settings columns are repeated for every block.
+        - 'MeasNames' is the measName of the block eg: 'measuredfrequency'
+        - the id, settings and 'MeasNames' columns are categorical.
+        - 'MeasValues', 'U1_', 'L1_', 'R_' are taken from the columns A1, U1, L1, R1 of the group, or NaN if the
+          group has no such column.
+    @param DataFrame parsed logfile DataFrame, the id and settings columns are taken from it.
+    @param numeric_dict dictionary {label: numeric array} of the measurement columns eg: {'A1': array, 'U1': array}
+    @param measGroupsDict dictionary {'measlabel': GroupedCols}
+    @param measNames_dict dictionary {'measlabel': measName}
+    @param id_cols dictionary {column label: new column name} eg: {'s0':'HwIds', 'm0':'MeasPointIds'}
     @return Dataframe
     """
-    GroupsData = {}
-    for Idx, Dict in Series.items():
-        GroupsData[Idx] = updateKeys(Dict)
-    Dataframe = pd.DataFrame.from_dict(GroupsData, orient='index')
-    # add missing column if any of ['U1_','L1_', 'R1_']
-    missing_col = ['U1_','L1_', 'R_']
-    cols = Dataframe.columns.tolist()
-    for col in missing_col:
-        if col not in cols:
-            Dataframe[col] = np.nan
-
-    return Dataframe
-
+    nrows = len(DataFrame)
+    measlabels = list(measGroupsDict.keys())
+
+    # The id, settings and 'MeasNames' columns are categorical, each distinct string is kept once per logfile.
+    Data = {}
+    for label, name in id_cols.items():
+        Categorical = pd.Categorical(DataFrame[label].values)
+        Data[name] = pd.Categorical.from_codes(np.tile(Categorical.codes, len(measlabels)), Categorical.categories)
+
+    names = np.empty(len(measlabels), dtype=object)
+    names[:] = [measNames_dict[label] for label in measlabels]
+    Categorical = pd.Categorical(names)
+    Data['MeasNames'] = pd.Categorical.from_codes(np.repeat(Categorical.codes, nrows), Categorical.categories)
+
+    for name, prefix in VALUE_COLS:
+        blocks = []
+        for label, GroupedCols in measGroupsDict.items():
+            col = prefix + label[1:]
+            if col in GroupedCols and col in numeric_dict:
+                blocks.append(numeric_dict[col])
+            else:
+                blocks.append(np.full(nrows, np.nan))
+        Data[name] = np.concatenate(blocks) if blocks else np.empty(0)
+
+    return pd.DataFrame(Data, columns=list(Data.keys()))
 
 def processFile(filepath):
 
@@ -134,7 +150,6 @@ def processFile(filepath):
     TestSessionData_key = ['HwIDs', 'HighLevelSerialNumber', 'Vendor', 'PartNumber', 'SerialNumber', 'EdcOracle', 'ManufacturerProductionDate', 'FpgaBundel', 'FpgaRevision']
     TestSessionData = []
 
-    TestData_keys = [KEY_RunNumber, KEY_Usagelines, KEY_Data]
     TestData = []
     ulcount = 0     # ulcount => UsageLine Count
     runNumber = ''
@@ -143,44 +158,41 @@ def processFile(filepath):
 
     with open(filepath, 'r') as ifile:
 
-        for line in ifile.readlines():
-            #print(line)
-            for key in patterns:
-                pattern = patterns[key]
-                m = pattern.match(line)
+        # The file is streamed line by line. Each line is classified by its first characters and sent to its handler.
+        for line in ifile:
 
-                if m is not None:
-                    obj = m.groupdict()
-                    key = list(obj.keys())[0]
+            # Capturing Testdata lines: 'P_;>>;...' or 'F_;>>;...' (pattern_Data)
+            if line[1:6] == DATA_PREFIX and line[:1] in 'PF' and line[6:7] not in ('', '\n'):
+                TestData.append(line.strip().split(';'))
+                continue
 
-                    # Capturing Metadata:
-                    if key in MetaData_keys:
-                        MetaData.update(obj)
+            for key, pattern in linePatterns.get(line[:1], ()):
+                m = pattern.match(line)
+
+                if m is None:
+                    continue
 
-                    # Capturing Testsessiondata:
-                    elif key in TestSessionData_key:
-                        TestSessionData.append(obj)
+                # Capturing Metadata:
+                if key in MetaData_keys:
+                    MetaData.update(m.groupdict())
 
-                    # Capturing Testdata and adding RunNumber:
-                    elif key in TestData_keys:
-                        #print('pass3')
-                        if key == KEY_RunNumber:
-                            runNumber = obj[key]
+                # Capturing Testsessiondata:
+                elif key == KEY_TestSession:
+                    TestSessionData.append(m.groupdict())
 
-                        if key == KEY_Usagelines:
-                            ulcount += 1
+                # Capturing RunNumber:
+                elif key == KEY_RunNumber:
+                    runNumber = m.group(key)
 
-                            if ulcount == 1:
-                                #line += ';RunNumber'
-                                TestData.append(line.strip().replace('_', '').split(';'))
+                # Capturing Usagelines:
+                elif key == KEY_Usagelines:
+                    ulcount += 1
 
-                            if ulcount == 4:
-                                #line += ';RunNumber'
-                                TestData.append(line.strip().split(';'))
+                    if ulcount == 1:
+                        TestData.append(line.strip().replace('_', '').split(';'))
 
-                        if key == KEY_Data:
-                            #line += ';' + runNumber
-                            TestData.append(line.strip().split(';'))
+                    if ulcount == 4:
+                        TestData.append(line.strip().split(';'))
 
     # Check if logfile has all the 4 usage lines. If not then return empty dataframe.
     if ulcount != 4:
@@ -191,6 +203,35 @@ def processFile(filepath):
     selected_cols = re.findall('[mAULRs]{1}[0-9]{1,}', cols)
     return pd.DataFrame(TestData[1:], columns=TestData[0])[selected_cols]
 
+def getLogfileHeader(filepath):
+    """
+    This function reads the header lines of a logfile, the reading stops at the first usage line or data line.
+    The lines are matched with the same patterns as in processFile().
+    @param filepath logfile path
+    @return tuple (MetaData, TestSessionData):
+            MetaData dictionary {'ST_Version', 'RHEL_Version', 'WorkStation', 'TimeStamp', 'Date', 'Time'}, a key is
+            missing if its line is not found.
+            TestSessionData list of dictionaries {'HwIDs', 'HighLevelSerialNumber', 'Vendor', ...}
+    """
+    MetaData = {}
+    TestSessionData = []
+    try:
+        with open(filepath, 'r') as ifile:
+            for line in ifile:
+                if line[:1] == '#' or line[1:6] == DATA_PREFIX:
+                    break
+                for key, pattern in linePatterns.get(line[:1], ()):
+                    m = pattern.match(line)
+                    if m is None:
+                        continue
+                    if key == KEY_TestSession:
+                        TestSessionData.append(m.groupdict())
+                    elif key != KEY_RunNumber:
+                        MetaData.update(m.groupdict())
+    except (OSError, UnicodeDecodeError):
+        pass
+    return MetaData, TestSessionData
+
 # ================================= Perform Transformation on DataFrame ===============================================
 # =====================================================================================================================
 
@@ -199,20 +240,18 @@ def getDataFrame(file):
     This function performs all the heavy lifting. Following are the data transformation steps to get final dataframe:
     - processFile function returns initial DataFrame, only with required data columns.
     - Convert selected columns data to numeric i.e Measurments, Upperlimit, Lowerlimit, Expected Value eg: [A1, U1, L1, R1]
-    - Add grouped columns in DataFrame.
-      Example: Column 'A1', Values: dict {A1:val1, U1:val2, L12:val3, R1:val4},
-              Column 'A2', Values : dict {A2:val5, U2:val6}
-    - Dropping excess columns Upperlimits[U1,U2,..UN], lowerlimits[L1,L2,..,LN], ExpectedValues[R1,R2,..,RN] from DataFrame
-    - Unpivoting DataFrame to four columns as ['s0','m0','MeasNames','Grouped Values'] + settings columns
-    - Unpack the the values from Dataframe['Grouped Values'] into columns as ['MeasValues', 'U1', 'L1', 'R']
-    - Dropping Dataframe['Grouped Values'] column.
-    - Concatenating DataFrame with groupedValues_DF to get final Dataframe
-    - Overwriting measlabels with measNames as {'A1':'measuredfrequency', 'A2':'diffrequency'}
+    - Stack the measurement groups [A1, U1, L1, R1], [A2, U2], ... into long format, one block of rows per group,
+      with the columns ['HwIds', 'MeasPointIds'] + settings columns + ['MeasNames', 'MeasValues', 'U1_', 'L1_', 'R_']
+      The id, settings and 'MeasNames' columns are categorical.
+    - measlabels are replaced by measNames as {'A1':'measuredfrequency', 'A2':'diffrequency'}
 
     @param file its file path
-    @return Dataframe
+    @return Dataframe, empty if the logfile is not found anymore, eg: moved since it was selected.
     """
-    DataFrame = processFile(file)
+    try:
+        DataFrame = processFile(file)
+    except FileNotFoundError:
+        return pd.DataFrame()
 
     # Check if dataframe is empty or not.
     if DataFrame.empty:
@@ -250,7 +289,7 @@ def getDataFrame(file):
         setting = DataFrame.loc[0, i]
         settings_dict[i] = setting
 
-    # Step 2:Add grouped columns in DataFrame
+    # Step 2: Convert measurement columns to numeric
 
     DataFrame.drop(0, inplace=True)
     DataFrame.reset_index(inplace=True, drop=True)
@@ -260,9 +299,12 @@ def getDataFrame(file):
 
     if DEBUG: print('Columns to be converted to float data type:', '\n', numeric_cols, '\n')
 
+    # The converted columns are kept in a dictionary {label: array}, assigning them back to DataFrame one by one
+    # would copy the whole block of string columns for every measurement column.
+    numeric_dict = {}
     for col in numeric_cols:
         try:
-            DataFrame[col] = pd.to_numeric(DataFrame[col]) # , errors='coerce'
+            numeric_dict[col] = pd.to_numeric(DataFrame[col]).values # , errors='coerce'
         except ValueError as error:   # ValueError: Unable to parse string "ok"
             return pd.DataFrame()
             #DataFrame[col] = DataFrame[col].map({'ok': 1.0})
@@ -273,45 +315,29 @@ def getDataFrame(file):
     # In case of other exceptional values, cast them as 1.0.
     #DataFrame.fillna(0.0, inplace=True)
 
+# Step 3: Stacking the measurement groups [A1, U1, L1, R1], [A2, U2], ... into the columns
+#         ['HwIds', 'MeasPointIds'] + settings columns + ['MeasNames', 'MeasValues', 'U1_', 'L1_', 'R_']
 
-    # Add grouped columns in DataFrame
-    # column 'A1', Values: dict {A1:val1, U1:val2, L1:val3, R1:val4}, column 'A2', Values : dict {A2:val5, U2:val6}
-
-    for measlabel, GroupedCols in measGroupsDict.items():
-        DataFrame[measlabel] = DataFrame.loc[:, GroupedCols].to_dict('records')
-
-    # droping excess columns Upperlimits[U1,U2,..UN], lowerlimits[L1,L2,..,LN], ExpectedValues[R1,R2,..,RN]
-    limitsCols = re.findall('[ULR]{1}[0-9]{1,}', cols_str)
-    if DEBUG: print('Limits columns Labels:', '\n', limitsCols, '\n')
-
-    DataFrame.drop(columns=limitsCols,inplace=True)
-
-    rename_cols_dict = {'s0':'HwIds','m0':'MeasPointIds'}
-    rename_cols_dict.update(settings_dict)
-    DataFrame.rename(columns= rename_cols_dict, inplace=True)
-
-# Step 3: Unpivoting DataFrame to four columns as ['s0','m0','MeasNames','Grouped Values'] + settings columns
-
-    DataFrame = pd.melt(DataFrame, id_vars=list(rename_cols_dict.values()), var_name='MeasNames', value_name='Grouped Values')
+    id_cols = {'s0':'HwIds','m0':'MeasPointIds'}
+    id_cols.update(settings_dict)
 
-    # Step 4: Unpack the the values from DataFrame['Grouped Values'] in columns as ['MeasValues', 'U1_idx', 'L1_idx', 'R1_idx']
-
-    Series = DataFrame.loc[:, 'Grouped Values']
-    # Series --> groupedValues_DF --> drop 'Grouped Values' column from DataFrame --> DataFrame = pd.concat(DataFrame + groupedValues_DF)
-
-    groupedValues_DF = getGroupsValuesDF(DataFrame.loc[:, 'Grouped Values'])
-    DataFrame.drop(columns= 'Grouped Values', inplace=True)
-
-    # Overwriting measlabels with measNames as {'A1':'measuredfrequency', 'A2':'diffrequency'}
-    for label, Name in measNames_dict.items():
-        index_lst = DataFrame.index[DataFrame['MeasNames'] == label]
-        DataFrame.loc[index_lst, 'MeasNames'] = Name
-    # Concatenating DataFrame with groupedValues_DF to get final Dataframe
-    DataFrame = pd.concat([DataFrame, groupedValues_DF], axis=1)
+    DataFrame = stackMeasGroups(DataFrame, numeric_dict, measGroupsDict, measNames_dict, id_cols)
     if DEBUG: print(DataFrame.columns.tolist())
 
     return DataFrame
 
+def setSamplesFloat32(DataFrame):
+    """
+    This function stores the 'MeasValues' column of a DataFrame returned by getDataFrame() as float32.
+    It halves the memory of the samples kept until the DataFrames of a testName are merged, the limits columns
+    are not changed. Outliers and histograms are computed in float64 from the float32 samples.
+    @param DataFrame DataFrame returned by getDataFrame()
+    @return DataFrame
+    """
+    if not DataFrame.empty:
+        DataFrame['MeasValues'] = DataFrame['MeasValues'].astype(np.float32)
+    return DataFrame
+
 #Module Testing Script:
 if __name__ == '__main__':
 
@@ -3,6 +3,7 @@
 This module define functions that generate values for parameters i.e table_labels, options.
 These parameters are passed to worksheet.add_table() function in main.py file.
 """
+import io
 import pandas as pd
 import xlsxwriter
 import re
@@ -93,8 +94,106 @@ def Mean_A(groups):
     return formula
 
 
+def getTableFormula(formula):
+    """
+    This function converts a column formula as worksheet.add_table() does before writing it to the table cells
+    eg: '=[@[U_1]]-[@[L_1]]' ---> '[[#This Row],[U_1]]-[[#This Row],[L_1]]'
+    @param formula column formula
+    @return converted formula
+    """
+    if formula.startswith('='):
+        formula = formula.lstrip('=')
+    return formula.replace('@', '[#This Row],')
+
+def writeCachedFormulas(Worksheet, options, StatsDF, firstRow=2):
+    """
+    This function writes the table column formulas again with the computed values as cached results, so the
+    values can be read without Excel recalculating the workbook. It must be called after worksheet.add_table().
+    @param Worksheet xlsxwriter worksheet object.
+    @param options options passed to worksheet.add_table().
+    @param StatsDF Dataframe of computed statistics, see getStatistics().
+    @param firstRow first data row of the table.
+    """
+    for col_num, header in enumerate(options['columns']):
+        if not header.get('formula') or header['header'] not in StatsDF:
+            continue
+        formula = getTableFormula(header['formula'])
+        for row, value in enumerate(StatsDF[header['header']].values, firstRow):
+            if pd.isnull(value): value = ''
+            Worksheet.write_formula(row, col_num, formula, None, value)
+
+def isTableRowsSupported():
+    """
+    This function checks that the installed XlsxWriter has the private worksheet attributes used by writeTableRows(),
+    they are not part of the XlsxWriter API and may change between versions, see requirements.txt.
+    @return True if writeTableRows() can be used, else the workbook must be written without 'constant_memory'.
+    """
+    Workbook = xlsxwriter.Workbook(io.BytesIO(), {'constant_memory': True})
+    try:
+        Worksheet = Workbook.add_worksheet()
+        if getattr(Worksheet, 'constant_memory', None) is not True or \
+                not isinstance(getattr(Worksheet, 'tables', None), list):
+            return False
+        # A one column table written as in writeTableRows().
+        Worksheet.constant_memory = False
+        Worksheet.add_table('A1:A2', {'columns': [{'header': 'A'}]})
+        Worksheet.constant_memory = True
+        Worksheet.tables[-1]['columns'][0]['formula'] = '1'
+        Worksheet.write_string(0, 0, 'A')
+        Worksheet.write_formula(1, 0, '1', None, 1)
+        Workbook.close()
+    except Exception:
+        return False
+    return True
+
+def writeTableRows(Worksheet, table_range, options, finalDF, StatsDF=None):
+    """
+    This function writes a table row by row in a 'constant_memory' workbook, only one row is kept in memory.
+    worksheet.add_table() is not supported in 'constant_memory' mode, so the table is added with its headers only
+    and its column formulas are set afterwards. Then the header row and the data rows are written in order, the
+    cells of formula columns are written with write_formula().
+    This relies on the private Worksheet.constant_memory and Worksheet.tables attributes, isTableRowsSupported()
+    must be checked before using it.
+    The rows above the table must be written before calling this function.
+
+    @param Worksheet xlsxwriter worksheet object of a 'constant_memory' workbook.
+    @param table_range table range eg: A2:L85
+    @param options options returned by getExcelfile() with streaming=True.
+    @param finalDF final Dataframe, it must have the table columns.
+    @param StatsDF Dataframe of computed statistics written as cached formula values, see getStatistics().
+    """
+    columns = options['columns']
+    formulas = {}
+    cached = {}
+    for col_num, header in enumerate(columns):
+        if header.get('formula'):
+            formulas[col_num] = getTableFormula(header['formula'])
+            if StatsDF is not None and header['header'] in StatsDF:
+                cached[col_num] = StatsDF[header['header']].values
+
+    Worksheet.constant_memory = False
+    Worksheet.add_table(table_range, {'columns': [{'header': header['header']} for header in columns]})
+    Worksheet.constant_memory = True
+    for col_num, formula in formulas.items():
+        Worksheet.tables[-1]['columns'][col_num]['formula'] = formula
+
+    # Header row. Writing it flushes the previous row and discards the header cells stored by add_table().
+    header_row = xlsxwriter.utility.xl_cell_to_rowcol(table_range.split(':')[0])[0]
+    for col_num, header in enumerate(columns):
+        Worksheet.write_string(header_row, col_num, header['header'])
+
+    for i, values in enumerate(finalDF.itertuples(index=False, name=None)):
+        row = header_row + 1 + i
+        for col_num, value in enumerate(values):
+            if col_num in formulas:
+                result = cached[col_num][i] if col_num in cached else 0
+                if pd.isnull(result): result = ''
+                Worksheet.write_formula(row, col_num, formulas[col_num], None, result)
+            else:
+                Worksheet.write(row, col_num, value)
+
 # idx = Table number
-def getExcelfile(finalDF, groups, idx):
+def getExcelfile(finalDF, groups, idx, stats_mode='formulas', streaming=False):
     """
     This function take Dataframe as argument and generate the parameters for worksheet.add_table(table_labels, options) as:
         - options = {'data': DATA, 'columns': HEADER}
@@ -103,6 +202,9 @@ def getExcelfile(finalDF, groups, idx):
     @param finalDF It is final merged dataframe.
     @param groups number of groups specified in Configuration file.
     @param idx Table number
+    @param stats_mode 'formulas', 'values' or 'both'. If 'values', statistic columns have no formulas and keep the
+           values of finalDF (see getStatistics()).
+    @param streaming if True, options has no 'data', the rows are written by writeTableRows().
     @return  table_range, options, cpkCells_lst
     """
 
@@ -129,7 +231,8 @@ def getExcelfile(finalDF, groups, idx):
     finalDF.fillna('', inplace=True)
     # Get Data by converting each row in dataframe as list and combine them into list of lists. eg: print(DATA[0]).
 
-    DATA = finalDF.values
+    if not streaming:
+        DATA = finalDF.values
     col_names = finalDF.columns.tolist()
     # print(col_names)
     HEADER = [{'header': x} for x in col_names]
@@ -236,6 +339,11 @@ def getExcelfile(finalDF, groups, idx):
                     stats0_formula = obj['formula']
                     header.update({'formula': stats0_formula})
 
+    # Statistic values are written as data, without the column formulas.
+    if stats_mode == 'values':
+        for header in HEADER:
+            header.pop('formula', None)
+
     # (4) Define a table range by converting column index to excel column labels:
     # excel_col_label = letter+Number eg: A20
     # Notice that xlsxwriter.utility.xl_col_to_name(col_number) uses zero-indexing.
@@ -252,7 +360,10 @@ def getExcelfile(finalDF, groups, idx):
     last_box_label  = getExcelLabel(last_col_index) + lastRow             # ---->  eg: L85
     table_range    = first_box_label + ':' + last_box_label              # --->   eg: A3:L85
 
-    options = {'data': DATA, 'columns': HEADER}
+    if streaming:
+        options = {'columns': HEADER}
+    else:
+        options = {'data': DATA, 'columns': HEADER}
 
     # Get list of Cpk columns indices equivalent to excel labels eg:  ['AA3:AA30', 'BZ3:BZ30']
     cpk_cols = re.findall('Cpk_[1-9]{1,}', str(col_names))
@@ -4,56 +4,202 @@ This module defines functions to parse logfiles name and select them based on pa
 """
 
 
-import re
 import os, sys
 from . import regex
+from .filenameTokenizer import FilenameTokenizer
 from .progressbar import Bar
+from .walkDirs import walkTree, loadFileCounts, saveFileCounts, DEFAULT_COUNTS_FILE
 
 def e(): sys.exit(1)
 
 
-def fileCounter_1(paths):
-
+def getSelector(Filter, exclude_files):
     """
-    This function counts number of files in a specified path
-
-    @param paths root path of directory
-    @return Number of files in a directory, recursively counting files in subdirectories
+    This function generates a function to select a logfile by its name.
+    @param Filter parameters to parse logfile name of a group.
+    @param exclude_files list of patterns, if found in testname then exclude that test name from selection.
+    @return function that takes a file name and returns its testName, or None if the file is not selected.
     """
-    files_count = 0
-    for path in paths:
-        for dir in path:
-            files_count += sum(len(files) for _, _, files in os.walk(dir))
-    return files_count
+    Tokenizer = FilenameTokenizer({'group': Filter}, exclude_files)
+
+    def select(filename):
+        selected = Tokenizer.select(filename)
+        return None if selected is None else selected[0]
 
-def matchFail(testname, excludefiles):
+    return select
+
+def getRootDirs(ROOT_DIRs, Filters):
+    """
+    This function lists the root directories to walk. A root directory of several groups is walked once, its session
+    directories are skipped only if all its groups skip them.
+    @param ROOT_DIRs root directory for log files
+    @param Filters parameters to parse logfile name
+    @return tuple (list of (group, rootPath) in the order of the configuration file,
+                   dictionary {rootPath: (list of groups, dictionary {group: pruneDir}, counts key)})
+    """
+    pairs = []
+    roots = {}
+    for n, dirList in enumerate(ROOT_DIRs, 1):
+        group = 'group' + str(n)
+        for rootPath in dirList:
+            pairs.append((group, rootPath))
+            groups = roots.setdefault(rootPath, [])
+            if group not in groups:
+                groups.append(group)
+
+    rootDirs = {}
+    for rootPath, groups in roots.items():
+        pruneDirs = {group: regex.getDirFilter(Filters[group]) for group in groups}
+        # The counts are kept per root directory and YEAR/MONTH filters, as skipped session directories are not counted.
+        if any(pruneDir is None for pruneDir in pruneDirs.values()):
+            countKey = '|'.join([rootPath, '/'])
+        else:
+            countKey = '|'.join([rootPath] + [value for group in groups for value in
+                                              Filters[group]['YEAR'] + ['/'] + Filters[group]['MONTH']])
+        rootDirs[rootPath] = (groups, pruneDirs, countKey)
+    return pairs, rootDirs
+
+def iterManifest(ROOT_DIRs, Filters, exclude_files, manifest):
+    """
+    This function selects the logfiles from the index of the manifest, no directory is walked. The logfiles which are
+    not found anymore are skipped, see ManifestIndex.getFiles().
+    @param ROOT_DIRs root directory for log files
+    @param Filters parameters to parse logfile name
+    @param exclude_files list of patterns, if found in testname then exclude that test name from selection.
+    @param manifest ManifestIndex object
+    @return generator of tuples (testName, group, filepath)
+    """
+    Bar()
+    selected = []
+    for n, dirList in enumerate(ROOT_DIRs, 1):
+        group = 'group' + str(n)
+        files = manifest.getFiles(dirList, Filters[group], getSelector(Filters[group], exclude_files),
+                                  regex.getDirFilter(Filters[group]))
+        selected.append((group, files))
+
+    total = sum(len(files) for group, files in selected)
     i = 0
-    for x in excludefiles:
-        if x in testname:
+    for group, files in selected:
+        for testName, filepath in files:
             i += 1
-    if i>0:
-        return False
-    else:
-        return True
+            Bar(i, total)
+            yield testName, group, filepath
 
-def getFilenames(ROOT_DIRs, Filters, exclude_files):
+def iterFilenames(ROOT_DIRs, Filters, exclude_files, threads=8, countsFile=DEFAULT_COUNTS_FILE, manifest=None):
 
     """
-    This function select file names based on configuration file
+    This function walks the root directories and yields each selected logfile as soon as it is found.
+    Each root directory is walked only once, also if it is the root directory of several groups: each logfile name is
+    split once and checked for all groups of its root directory by a FilenameTokenizer. The logfiles are yielded in
+    the order of the groups and of their root directories, the logfiles of a group whose root directory was walked
+    for a previous group are yielded when the group is reached.
+    The total for the progress bar is the number of files found in the previous run, it is unknown in the first run.
+    If manifest is given, the logfiles are selected from the manifest index instead, see iterManifest().
 
     @param ROOT_DIRs root directory for log files
     @param Filters parameters to parse logfile name
-    @return list of selected logfiles
+    @param exclude_files list of patterns, if found in testname then exclude that test name from selection.
+    @param threads number of threads used to walk the directory trees.
+    @param countsFile json file to keep the number of files under each root directory between runs.
+    @param manifest ManifestIndex object, or None to walk the root directories.
+    @return generator of tuples (testName, group, filepath)
     """
-    # Exclude files is a list of pattern, if found in testname then exclude that test name from selection.
-    exclude_testnames = exclude_files
+    if manifest is not None:
+        for item in iterManifest(ROOT_DIRs, Filters, exclude_files, manifest):
+            yield item
+        return
+
     # Initializing Variable for progressbar.Bar function i.e (i and Total).
     Bar()
 
-    # fileCounter_1() counts number of files in selected dirs.
-    total = fileCounter_1(ROOT_DIRs)
+    pairs, rootDirs = getRootDirs(ROOT_DIRs, Filters)
+    Tokenizer = FilenameTokenizer(Filters, exclude_files)
+
+    # Number of files found in the previous run. If one of the root directories is new, the total is unknown.
+    previousCounts = loadFileCounts(countsFile)
+    if all(countKey in previousCounts for groups, pruneDirs, countKey in rootDirs.values()):
+        total = sum(previousCounts[countKey] for groups, pruneDirs, countKey in rootDirs.values())
+    else:
+        total = None
+
+    counts = {}
     i = 0
+    walked = set()
+    pending = {}    # {index of (group, rootPath) in pairs: list of (testName, filepath)}
+
+    for idx, (group, rootPath) in enumerate(pairs):
+
+        # The root directory was walked for a previous group.
+        if rootPath in walked:
+            for testName, filepath in pending.pop(idx, []):
+                yield testName, group, filepath
+            continue
+        walked.add(rootPath)
+
+        groups, pruneDirs, countKey = rootDirs[rootPath]
+        # The later (group, rootPath) pairs of the root directory, their logfiles are kept until they are reached.
+        later = {}
+        for j in range(idx + 1, len(pairs)):
+            if pairs[j][1] == rootPath:
+                later.setdefault(pairs[j][0], []).append(j)
+
+        # Session directories which can't hold logfiles of the selected YEAR/MONTH are not walked.
+        if any(pruneDir is None for pruneDir in pruneDirs.values()):
+            pruneDir = None
+        else:
+            pruneDir = lambda dirname: all(skip(dirname) for skip in pruneDirs.values())
+        # Groups of each directory, a group doesn't select the files below a session directory it skips.
+        dirGroups = {rootPath: groups, rootPath.rstrip('/'): groups}
+
+        rootCount = 0
+        for path, files in walkTree(rootPath, threads, pruneDir):
+
+            i += len(files)
+            rootCount += len(files)
+
+            # The previous count is only an estimate, the total is never smaller than the files seen so far.
+            Bar(i, total if total is None else max(total, i, 1))
+
+            if path not in dirGroups:
+                parent, dirname = os.path.split(path)
+                dirGroups[path] = [g for g in dirGroups.get(parent, groups)
+                                   if pruneDirs[g] is None or not pruneDirs[g](dirname)]
+            pathGroups = dirGroups[path]
+            if not pathGroups:
+                continue
+
+            for filename in files:
+
+                selected = Tokenizer.select(filename, pathGroups)
+
+                # if the file is selected the file will be add in testNames_dict.
+                if selected is None:
+                    continue
+                testName, selectedGroups = selected
+                filepath = '{0}/{1}'.format(path, filename)
+                for g in selectedGroups:
+                    if g == group:
+                        yield testName, group, filepath
+                    for j in later.get(g, []):
+                        pending.setdefault(j, []).append((testName, filepath))
+
+        counts[countKey] = rootCount
+
+    saveFileCounts(countsFile, counts)
+
+def getFilenames(ROOT_DIRs, Filters, exclude_files, threads=8, countsFile=DEFAULT_COUNTS_FILE, manifest=None):
 
+    """
+    This function select file names based on configuration file
+
+    @param ROOT_DIRs root directory for log files
+    @param Filters parameters to parse logfile name
+    @param exclude_files list of patterns, if found in testname then exclude that test name from selection.
+    @param threads number of threads used to walk the directory trees.
+    @param countsFile json file to keep the number of files under each root directory between runs.
+    @param manifest ManifestIndex object, or None to walk the root directories.
+    @return list of selected logfiles
+    """
     testNames_dict = {}
     """{ 'testname1':  {group1: [filepath1,filepath2,filepath3,filepath4],  
                         group2: [filepath1,filepath2,filepath3]},
@@ -64,58 +210,16 @@ def getFilenames(ROOT_DIRs, Filters, exclude_files):
     """
 
     filesCount = 0
-    idx = 1
-#   print(ROOT_DIRs)
-
-    for dirList in ROOT_DIRs:
-
-        group = 'group' + str(idx)
-        idx += 1
-        pattern = re.compile(regex.getRegex(Filters[group]))
-
-        for rootPath in dirList:
-            #print(rootPath)
-            for path, dirs, files in os.walk(rootPath):
-
-                i += len(files)
-
-                Bar(i, total)
-                for filename in files:
-
-                    full_path = '{0}/{1}'.format(path, filename)
-
-                    m = pattern.match(filename)
-
-                    if m is None:
-                        #print(filename + " doesn't match pattern")
-                        continue
-
-                    if not os.path.isfile(full_path):
-                        #print(filename + " doesn't exist")
-                        continue
-
-                    if m is not None:
-
-                        testName = filename.split('.201')[0]
-                        #print('\n')
-                        #print(testName)
 
-                        # if the strings in the 'exclude_files list' are in testname, matchFail() function will return false, else return True
-                        include = matchFail(testName, exclude_files)
-                        # if 'include' is True the testname will be add in testNames_dict.
-                        if include:
-                            filesCount += 1
-                            #print(testName)
-                            if filesCount > 0:
-                                if testName not in testNames_dict:
-                                    testNames_dict[testName] = {group: []}
+    for testName, group, full_path in iterFilenames(ROOT_DIRs, Filters, exclude_files, threads, countsFile, manifest):
+        filesCount += 1
 
-                                if group not in testNames_dict[testName]:
-                                    testNames_dict[testName].update({group: []})
+        if testName not in testNames_dict:
+            testNames_dict[testName] = {group: []}
 
-                                testNames_dict[testName][group].append(full_path)
+        if group not in testNames_dict[testName]:
+            testNames_dict[testName].update({group: []})
 
-                    else:
-                        continue
+        testNames_dict[testName][group].append(full_path)
 
     return testNames_dict, filesCount
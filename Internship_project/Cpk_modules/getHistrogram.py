@@ -5,64 +5,66 @@ This function is used mergeDataframes.py file
 """
 
 
+import numpy as np
 import pandas as pd
 
 def getBinsRange(Max, Min, Width, Bins):
     """
-    This function will generate the range of each bin
-    @param Max maximum value in samples
-    @param Min minimum value in samples
-    @param Width width of a bin
+    This function will generate the range of each bin for all IDs at once.
+    The edges are accumulated bin by bin (Min, Min+Width, Min+2*Width, ...), the last edge is set to Max.
+    @param Max array of maximum values in samples
+    @param Min array of minimum values in samples
+    @param Width array of bin widths
     @param Bins number of bins specified in configfile
-    @return list
+    @return array of shape (number of IDs, Bins + 1)
     """
-    BinsRange = [Min]
-    val = Min
+    BinsRange = np.empty((len(Min), Bins + 1))
+    BinsRange[:, 0] = Min
 
     for i in range(Bins):
-        val += Width
-        BinsRange.append(val)
-    BinsRange[-1] = Max
+        BinsRange[:, i + 1] = BinsRange[:, i] + Width
+    BinsRange[:, -1] = Max
     return BinsRange
 
-def getFreqTable(arr, Range, bins, BinsRange, IDX):
+def getFreqTable(values, offsets, bins):
     """
-    This function create a dictionary with key as bin label and value as frequency of values with in that bin range.
-    @param arr list of samples.
-    @param Range range of sample distribution.
+    This function counts the samples of each bin for all IDs in one pass over the concatenated samples.
+    Both ends of a bin are inclusive, a sample on the edge between two bins is counted in both bins.
+    If the range of the samples of an ID is zero, all its bins are zero.
+    @param values array of samples of all IDs, the samples of an ID are contiguous.
+    @param offsets array of start positions of the IDs in values, with len(values) appended. No ID may be empty.
     @param bins number of bins defined in configuration file.
-    @param BinsRange list of maximum value of bins.
-    @param IDX group number.
-    @return freqDict dictionary.
+    @return array of counts with shape (number of IDs, bins)
     """
-    freqDict = {}
+    nIDs = len(offsets) - 1
+    lengths = np.diff(offsets)
+    ids = np.repeat(np.arange(nIDs), lengths)
+
+    Max = np.maximum.reduceat(values, offsets[:-1])
+    Min = np.minimum.reduceat(values, offsets[:-1])
+    Range = Max - Min
+    Width = Range / bins
+    BinsRange = getBinsRange(Max, Min, Width, bins)
+
+    counts = np.zeros((nIDs, bins), dtype=np.int64)
     for i in range(bins):
-        Id = 'B' + str(i + 1) + '_' + IDX
-        if Range == 0.0:
-            count = 0
-        else:
-            count = len([x for x in arr if BinsRange[i] <= x <= BinsRange[i+1]])
-        freqDict[Id] = count
-    return freqDict
+        inBin = (values >= BinsRange[ids, i]) & (values <= BinsRange[ids, i + 1])
+        counts[:, i] = np.bincount(ids[inBin], minlength=nIDs)
+
+    counts[Range == 0.0] = 0
+    return counts
 
-def getHistDataframe(Series, bins, IDX):
+def getHistDataframe(Samples, bins, IDX):
     """
     This function creates a histrogram dataframe.
-    @param Series  pd.Series object.
+    @param Samples RaggedSamples object. Each ID has at least one sample.
     @param bins number of bins defined in configuration file.
     @param IDX group number.
-    @return dataframe object
+    @return dataframe object, index = IDs, columns = [B1_IDX, B2_IDX, ..., Bbins_IDX]
     """
-    HistData = {}
-
-    for ID, arr in Series.items():
-        Max = arr.max()
-        Min = arr.min()
-        Range = Max - Min
-        Width = Range / bins
-        BinsRange = getBinsRange(Max, Min, Width, bins)
-        HistData[ID] = getFreqTable(arr, Range, bins, BinsRange, IDX)
-
-    return pd.DataFrame.from_dict(HistData, orient='index')
-
+    if len(Samples) == 0:
+        return pd.DataFrame()
 
+    counts = getFreqTable(Samples.values, Samples.offsets, bins)
+    columns = ['B' + str(i + 1) + '_' + IDX for i in range(bins)]
+    return pd.DataFrame(counts, index=Samples.index, columns=columns)
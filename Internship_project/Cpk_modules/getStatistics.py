@@ -0,0 +1,158 @@
+"""
+@file getStatistics.py
+This module defines functions that compute the statistic columns of a worksheet table with NumPy.
+The values follow the table formulas defined in getExcelfile.py, so a workbook can hold the values instead of
+(or alongside) the formulas and can be read without Excel recalculating it.
+
+Excel semantics which are kept:
+    - A blank cell is 0 in arithmetic and in comparisons with a value.
+    - COUNTIF, MINIFS, MAXIFS, AVERAGE and AVERAGEIFS ignore blank cells.
+    - The Std array formula counts every cell of the samples range, blank or out of limits cells count as 0.
+    - ROUND() rounds half away from zero.
+    - A formula error (eg: #DIV/0!) is returned as nan.
+"""
+
+from __future__ import division
+import re
+import numpy as np
+import pandas as pd
+
+# Values of the Type_ and Factor_ columns written by the table formulas.
+DEFAULT_TYPE = 1
+DEFAULT_FACTOR = 1
+
+# Valid values of STATS_OUTPUT in configuration file.
+STATS_OUTPUT_MODES = ['formulas', 'values', 'both']
+
+def excelRound(values, digits):
+    """
+    This function rounds the values as Excel ROUND() does, half away from zero.
+    @param values array
+    @param digits number of digits
+    @return array
+    """
+    scale = 10.0 ** digits
+    return np.sign(values) * np.floor(np.abs(values) * scale + 0.5) / scale
+
+def getCpk(Mean, Std, L, U):
+    """
+    This function computes the Cpk as the Cpk_ column: min(|U - Mean|, |Mean - L|) / (3 * Std) rounded to 2 digits.
+    @param Mean, Std, L, U arrays
+    @return array, nan if Std is 0 or nan.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(Std > 0, excelRound(np.minimum(np.abs(U - Mean), np.abs(Mean - L)) / (3 * Std), 2), np.nan)
+
+def getNumeric(finalDF, cols):
+    """
+    This function returns the columns as a float array, blank or text cells are nan.
+    @param finalDF Dataframe
+    @param cols list of column names
+    @return 2D array
+    """
+    return np.column_stack([pd.to_numeric(finalDF[col], errors='coerce').values.astype(float) for col in cols])
+
+def getSamplesCols(col_names, N):
+    """
+    This function returns the samples columns of group N, these are the columns of the formulas range
+    eg: Table1[@[S0_1]:[S13_1]]
+    @param col_names list of table columns
+    @param N group number as str
+    @return list of column names
+    """
+    col_list = [col for col in col_names if re.match('S[0-9]+_' + N + '$', col)]
+    start = col_names.index(col_list[0])
+    end = col_names.index(col_list[-1])
+    return col_names[start:end+1]
+
+def getLimit(Type, Factor, Limit1, Limit2, upper):
+    """
+    This function evaluates the U_/L_ formulas.
+    The limit is taken from L1_/U1_ if Type is 1, else from L2_/U2_ and it is widened by Factor.
+    @param Type, Factor, Limit1, Limit2 arrays
+    @param upper True for U_, False for L_
+    @return array
+    """
+    def scale(Limit):
+        widen = Limit > 0 if upper else Limit < 0
+        return np.where(widen, Limit * Factor, 2 * Limit - Limit * Factor)
+
+    return np.where(Factor > 0, np.where(Type == 1, scale(Limit1), scale(Limit2)), 0.0)
+
+def getGroupStatistics(finalDF, N):
+    """
+    This function computes the statistic columns of group N.
+    @param finalDF final Dataframe of a worksheet.
+    @param N group number as str
+    @return Dataframe with columns [Type_N, Factor_N, U_N, L_N, Range_N, FailsCounts_N, Min_N, Max_N, Mean_N, Std_N,
+            Cp_N, Cpk_N]
+    """
+    col_names = finalDF.columns.tolist()
+    rows = len(finalDF)
+
+    # Blank limits are 0 in Excel.
+    U1, L1, U2, L2 = np.nan_to_num(getNumeric(finalDF, ['U1_'+N, 'L1_'+N, 'U2_'+N, 'L2_'+N])).T
+    X = getNumeric(finalDF, getSamplesCols(col_names, N))
+    valid = np.logical_not(np.isnan(X))
+    width = X.shape[1]
+
+    Type = np.full(rows, DEFAULT_TYPE)
+    Factor = np.full(rows, DEFAULT_FACTOR)
+    U = getLimit(Type, Factor, U1, U2, upper=True)
+    L = getLimit(Type, Factor, L1, L2, upper=False)
+    Range = U - L
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        Fails = (valid & (X > U[:, None])).sum(axis=1) + (valid & (X < L[:, None])).sum(axis=1)
+
+        # MINIFS/MAXIFS/AVERAGEIFS over the samples within [L, U], MINIFS/MAXIFS return 0 if there is none.
+        passed = valid & (X >= L[:, None]) & (X <= U[:, None])
+        passedCount = passed.sum(axis=1)
+        Min = np.where(passedCount > 0, np.where(passed, X, np.inf).min(axis=1), 0.0)
+        Max = np.where(passedCount > 0, np.where(passed, X, -np.inf).max(axis=1), 0.0)
+        validCount = valid.sum(axis=1)
+        Mean = np.where((U == 0) & (L == 0),
+                        np.where(valid, X, 0.0).sum(axis=1) / validCount,
+                        np.where(passed, X, 0.0).sum(axis=1) / passedCount)
+
+        # STDEV.S((IF(L=0,TRUE,range>=L))*(IF(U=0,TRUE,range<=U))*(range))
+        inLimits = ((L == 0)[:, None] | (X >= L[:, None])) & ((U == 0)[:, None] | (X <= U[:, None]))
+        Z = np.where(valid & inLimits, X, 0.0)
+        if width > 1:
+            Std = np.sqrt(((Z - Z.mean(axis=1)[:, None])**2).sum(axis=1) / (width - 1))
+        else:
+            Std = np.full(rows, np.nan)
+
+        Cp = np.where(Std > 0, excelRound(Range / (6 * Std), 2), 0.0)
+        Cpk = np.where(Std > 0, excelRound(np.minimum(np.abs(U - Mean) / (3 * Std), np.abs(Mean - L) / (3 * Std)), 2), 0.0)
+    Cp[np.isnan(Std)] = np.nan
+    Cpk[np.isnan(Std)] = np.nan
+
+    columns = ['Type_', 'Factor_', 'U_', 'L_', 'Range_', 'FailsCounts_', 'Min_', 'Max_', 'Mean_', 'Std_', 'Cp_', 'Cpk_']
+    values = [Type, Factor, U, L, Range, Fails, Min, Max, Mean, Std, Cp, Cpk]
+    StatsDF = pd.DataFrame(dict(zip([col+N for col in columns], values)), index=finalDF.index)
+    return StatsDF[[col+N for col in columns]]
+
+def getStatistics(finalDF, groups):
+    """
+    This function computes the statistic columns of all groups in a worksheet table.
+    If there are two groups, the STATS_0 columns ['Mean_A', 'Mean_R', 'Stdev_R', 'Cpk_R'] are computed as well.
+    @param finalDF final Dataframe of a worksheet.
+    @param groups number of groups in the table.
+    @return Dataframe with the statistic columns, errors are nan.
+    """
+    StatsDFs = [getGroupStatistics(finalDF, str(i+1)) for i in range(groups)]
+    StatsDF = pd.concat(StatsDFs, axis=1)
+
+    if groups == 2:
+        Mean_1, Mean_2 = StatsDF['Mean_1'].values, StatsDF['Mean_2'].values
+        Std_1, Std_2 = StatsDF['Std_1'].values, StatsDF['Std_2'].values
+        Cpk_1, Cpk_2 = StatsDF['Cpk_1'].values, StatsDF['Cpk_2'].values
+        with np.errstate(invalid='ignore', divide='ignore'):
+            StatsDF['Mean_A'] = Mean_1 - Mean_2
+            StatsDF['Mean_R'] = np.abs((Mean_1 - Mean_2) / Mean_1 * 100)
+            StatsDF['Stdev_R'] = np.abs((Std_1 - Std_2) / Std_1 * 100)
+            StatsDF['Cpk_R'] = np.abs((Cpk_1 - Cpk_2) / Cpk_1)
+
+    # Division by zero is an error in Excel.
+    return StatsDF.replace([np.inf, -np.inf], np.nan)
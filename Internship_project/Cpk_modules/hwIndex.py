@@ -0,0 +1,221 @@
+"""
+@file hwIndex.py
+This module defines the HwIndex class that keeps the hardware data of the logfiles (TestSessionData lines: serial
+numbers, part numbers, FPGA revisions of the modules of a test session) in an index file between runs.
+
+The index has one record per logfile and module, it is indexed by logfile and by serial number. A logfile is read again
+only if its size or modification time changed, only its header lines up to the first usage line are read.
+The hardware data is joined to the measurements by the 'HwIds' column eg: the rows of module Slot1 get the serial
+number of the TestSessionData.Slot1 record of their logfile, and the Cpk of each ID is computed per serial number.
+"""
+
+from __future__ import division
+import os
+import pickle
+import tempfile
+import zlib
+import numpy as np
+import pandas as pd
+from .getDataframe import getLogfileHeader
+from .getStatistics import getCpk
+from .mergeDataframes import concatDataFrames, getIDs
+from .parallelParse import CHUNKSIZE
+
+# Increase INDEX_VERSION if the layout of the index file changes.
+INDEX_VERSION = 1
+
+DEFAULT_INDEX_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'Cpk_Tool', 'hwIndex.pkl')
+
+# Fields of a TestSessionData record.
+HW_FIELDS = ['HighLevelSerialNumber', 'Vendor', 'PartNumber', 'SerialNumber', 'EdcOracle',
+             'ManufacturerProductionDate', 'FpgaBundel', 'FpgaRevision']
+
+# Columns of the index records.
+HW_COLUMNS = ['File', 'HwIds'] + HW_FIELDS
+
+def getTestSessionData(filepath):
+    """
+    This function reads the TestSessionData records of a logfile, see getLogfileHeader().
+    @param filepath logfile path
+    @return list of dictionaries {'HwIDs', 'HighLevelSerialNumber', 'Vendor', ...}, records without serial number
+            eg: TestSessionData.Empty="" are skipped.
+    """
+    return [record for record in getLogfileHeader(filepath)[1] if record['HighLevelSerialNumber'] is not None]
+
+
+class HwIndex(object):
+
+    def __init__(self, indexFile=None):
+        """
+        @param indexFile path of the index file, None for an index kept in memory only eg: HwIndex.subset()
+        """
+        self.indexFile = indexFile
+        self.files = {}         # {logfile path: (size, mtime)}
+        self.records = pd.DataFrame(columns=HW_COLUMNS)
+        self.positions = {}     # {column: {value: array of record positions}}, built on first use
+
+    def load(self):
+        """
+        This function reads the index file, the index is empty if there is no valid file.
+        """
+        try:
+            with open(self.indexFile, 'rb') as f:
+                header = pickle.load(f)
+                if header.get('version') != INDEX_VERSION:
+                    return
+                self.files, self.records = pickle.loads(zlib.decompress(f.read()))
+        except (OSError, EOFError, ValueError, AttributeError, pickle.UnpicklingError, zlib.error):
+            return
+        self.positions = {}
+
+    def store(self):
+        """
+        This function writes the index file. The file is written to a temporary file first and renamed.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.indexFile)), exist_ok=True)
+        fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.indexFile)), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump({'version': INDEX_VERSION, 'files': len(self.files)}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.write(zlib.compress(pickle.dumps((self.files, self.records), protocol=pickle.HIGHEST_PROTOCOL), 1))
+        os.replace(tmpPath, self.indexFile)
+
+    def update(self, filesList, executor=None):
+        """
+        This function reads the TestSessionData records of the new and changed logfiles.
+        @param filesList list of logfile paths.
+        @param executor ProcessPoolExecutor object to read the logfiles, or None to read them one by one.
+        @return number of logfiles read
+        """
+        stale = {}
+        for file in filesList:
+            try:
+                stat = os.stat(file)
+            except OSError:
+                continue
+            if self.files.get(file) != (stat.st_size, stat.st_mtime_ns):
+                stale[file] = (stat.st_size, stat.st_mtime_ns)
+        if not stale:
+            return 0
+
+        files = list(stale)
+        if executor is None:
+            results = map(getTestSessionData, files)
+        else:
+            results = executor.map(getTestSessionData, files, chunksize=CHUNKSIZE)
+
+        rows = []
+        for file, records in zip(files, results):
+            for record in records:
+                rows.append([file, record['HwIDs']] + [record[field] for field in HW_FIELDS])
+
+        # The records of the changed logfiles are replaced.
+        kept = self.records[~self.records['File'].isin(stale)]
+        self.records = pd.concat([kept, pd.DataFrame(rows, columns=HW_COLUMNS)], ignore_index=True)
+        self.files.update(stale)
+        self.positions = {}
+        return len(files)
+
+    def getPositions(self, column):
+        """
+        This function returns the positions of the records of each value of a column.
+        @param column column name eg: 'File', 'HighLevelSerialNumber'
+        @return dictionary {value: array of record positions}
+        """
+        if column not in self.positions:
+            codes, uniques = pd.factorize(self.records[column].values)
+            order = np.argsort(codes, kind='mergesort')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self.positions[column] = {value: order[bounds[i]:bounds[i + 1]] for i, value in enumerate(uniques)}
+        return self.positions[column]
+
+    def byFile(self, filepath):
+        """
+        This function returns the hardware records of a logfile.
+        @param filepath logfile path
+        @return DataFrame with the columns HW_COLUMNS
+        """
+        return self.records.iloc[self.getPositions('File').get(filepath, [])]
+
+    def bySerial(self, serial):
+        """
+        This function returns the hardware records of a serial number, it is searched in the HighLevelSerialNumber
+        and SerialNumber fields.
+        @param serial serial number eg: DE12340064
+        @return DataFrame with the columns HW_COLUMNS, in the order of the index.
+        """
+        positions = [self.getPositions(column).get(serial, []) for column in ['HighLevelSerialNumber', 'SerialNumber']]
+        return self.records.iloc[np.unique(np.concatenate(positions).astype(np.int64))]
+
+    def subset(self, filesList):
+        """
+        This function returns an index kept in memory with the records of the given logfiles only,
+        eg: to send the records of a testName to a worker process.
+        @param filesList list of logfile paths.
+        @return HwIndex object
+        """
+        Index = HwIndex()
+        filePositions = self.getPositions('File')
+        positions = [filePositions[file] for file in filesList if file in filePositions]
+        Index.files = {file: self.files[file] for file in filesList if file in self.files}
+        if positions:
+            Index.records = self.records.iloc[np.concatenate(positions)].reset_index(drop=True)
+        return Index
+
+    def getSlices(self, filepath, HwIds, key):
+        """
+        This function joins the hardware records of a logfile to its rows by the 'HwIds' column.
+        The records are looked up once per distinct HwIds value, not once per row.
+        @param filepath logfile path
+        @param HwIds 'HwIds' column of the DataFrame of the logfile.
+        @param key hardware field eg: 'HighLevelSerialNumber'
+        @return array with the key value of each row, '' if the module has no record.
+        """
+        Records = self.byFile(filepath)
+        mapping = dict(zip(Records['HwIds'].values, Records[key].values))
+        Categorical = pd.Categorical(HwIds)
+        # The last value is used for the rows without HwIds (code -1).
+        values = np.empty(len(Categorical.categories) + 1, dtype=object)
+        values[:] = [mapping.get(hw) or '' for hw in Categorical.categories] + ['']
+        return values[Categorical.codes]
+
+def getHwStatistics(DFs_list, filesList, Index, key):
+    """
+    This function computes the Cpk of each ID per hardware, eg: per HighLevelSerialNumber of the module.
+    The statistics are computed from all samples of the ID and hardware, before outliers detection, with the L1_/U1_
+    limits of the first row of the ID as in the worksheet.
+    @param DFs_list list of DataFrames returned by getDataFrame()
+    @param filesList logfile path of each DataFrame.
+    @param Index HwIndex object
+    @param key hardware field eg: 'HighLevelSerialNumber'
+    @return DataFrame with the columns ['IDs', key, 'Count', 'Mean', 'Std', 'L1_', 'U1_', 'Cpk']
+    """
+    merged_DF = concatDataFrames(DFs_list)
+    IDs = getIDs(merged_DF)
+    slices = np.concatenate([Index.getSlices(file, DF['HwIds'], key) for DF, file in zip(DFs_list, filesList)])
+
+    # Limits of each ID, blank limits are 0 as in Excel.
+    firstCodes, firstRows = np.unique(IDs.codes, return_index=True)
+    firstRows = firstRows[firstCodes >= 0]
+    L1 = np.nan_to_num(pd.to_numeric(merged_DF['L1_'], errors='coerce').values[firstRows].astype(float))
+    U1 = np.nan_to_num(pd.to_numeric(merged_DF['U1_'], errors='coerce').values[firstRows].astype(float))
+
+    values = merged_DF['MeasValues'].values.astype(float)
+    valid = (IDs.codes >= 0) & np.logical_not(np.isnan(values))
+    sliceCodes, sliceLabels = pd.factorize(slices[valid], sort=True)
+    keyCodes, keys = pd.factorize(IDs.codes[valid].astype(np.int64) * max(len(sliceLabels), 1) + sliceCodes, sort=True)
+    values = values[valid]
+
+    Count = np.bincount(keyCodes, minlength=len(keys))
+    Mean = np.bincount(keyCodes, weights=values, minlength=len(keys)) / np.maximum(Count, 1)
+    squares = np.bincount(keyCodes, weights=(values - Mean[keyCodes])**2, minlength=len(keys))
+    idCodes = keys // max(len(sliceLabels), 1)
+    L, U = L1[idCodes], U1[idCodes]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        Std = np.where(Count > 1, np.sqrt(squares / (Count - 1)), np.nan)
+    Cpk = getCpk(Mean, Std, L, U)
+
+    return pd.DataFrame({'IDs': np.asarray(IDs.categories, dtype=object)[idCodes],
+                         key: np.asarray(sliceLabels, dtype=object)[keys % max(len(sliceLabels), 1)],
+                         'Count': Count, 'Mean': Mean, 'Std': Std, 'L1_': L, 'U1_': U, 'Cpk': Cpk},
+                        columns=['IDs', key, 'Count', 'Mean', 'Std', 'L1_', 'U1_', 'Cpk'])
@@ -0,0 +1,160 @@
+"""
+@file incrementalState.py
+This module defines a class to keep the state of each testName between runs in INCREMENTAL mode.
+
+The state of a testName holds, for each group, the DataFrame of each logfile already parsed. The outliers need all
+samples of an ID, so the samples themselves are kept rather than aggregates. A run parses only the logfiles which are
+not in the state and merges the DataFrames in the order of discovery, so the worksheet is the same as in a run without
+state. The logfiles of the state which are not found anymore (eg: moved out of the archive) are kept.
+
+A group state is used only if its fingerprint (root directories, filters, excluded files and options that change the
+parsed DataFrames) is unchanged. Logfiles are identified by their path, the size and modification time of each logfile
+are kept with its DataFrame and a logfile is parsed again if one of them changed, eg: it was still being written.
+"""
+
+import os
+import hashlib
+import json
+import pickle
+import shutil
+import tempfile
+import zlib
+
+# Increase STATE_VERSION if the layout of the state files changes.
+STATE_VERSION = 2
+
+# Order of the testNames in the workbook, kept between runs.
+ORDER_FILE = 'testNames.json'
+
+DEFAULT_STATE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'Cpk_Tool', 'State')
+
+def getFingerprint(*args):
+    """
+    This function returns the fingerprint of a group, a sha1 of the JSON representation of the arguments.
+    @param args json serializable values eg: root directories, filter, excluded files
+    @return string
+    """
+    return hashlib.sha1(json.dumps(args, sort_keys=True).encode('utf-8')).hexdigest()
+
+def getFileStat(filepath):
+    """
+    This function returns the size and modification time of a logfile as kept in the state.
+    @param filepath logfile path
+    @return tuple (size, mtime in ns), None if the logfile can't be read.
+    """
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+class IncrementalState():
+    """
+    This class takes the state directory as argument.
+    Each state file is a small pickled header {version, testName, groups: {group: fingerprint}} followed by the
+    zlib compressed pickle of {group: {'fingerprint': string, 'files': {logfile path: DataFrame or None},
+                                       'stats': {logfile path: (size, mtime) or None}}}.
+    """
+
+    def __init__(self, stateDir):
+        self.stateDir = stateDir
+
+    def statePath(self, testName):
+        """
+        This function returns the path of the state file of a testName eg: stateDir/3f5a...e1.pkl
+        """
+        return os.path.join(self.stateDir, hashlib.sha1(testName.encode('utf-8')).hexdigest() + '.pkl')
+
+    def load(self, testName):
+        """
+        This function reads the state of a testName.
+        @param testName testName
+        @return dictionary {group: {'fingerprint', 'files'}}, empty if there is no valid state.
+        """
+        try:
+            with open(self.statePath(testName), 'rb') as f:
+                header = pickle.load(f)
+                if header.get('version') != STATE_VERSION or header.get('testName') != testName:
+                    return {}
+                return pickle.loads(zlib.decompress(f.read()))
+        except (OSError, EOFError, ValueError, AttributeError, pickle.UnpicklingError, zlib.error):
+            return {}
+
+    def store(self, testName, groups):
+        """
+        This function writes the state of a testName. The file is written to a temporary file first and renamed,
+        so an interrupted run keeps the previous state.
+        @param testName testName
+        @param groups dictionary {group: {'fingerprint', 'files'}}
+        """
+        header = {'version': STATE_VERSION, 'testName': testName,
+                  'groups': {group: state['fingerprint'] for group, state in groups.items()}}
+        os.makedirs(self.stateDir, exist_ok=True)
+        fd, tmpPath = tempfile.mkstemp(dir=self.stateDir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.write(zlib.compress(pickle.dumps(groups, protocol=pickle.HIGHEST_PROTOCOL), 1))
+        os.replace(tmpPath, self.statePath(testName))
+
+    def testNames(self):
+        """
+        This function reads the headers of all state files.
+        @return dictionary {testName: {group: fingerprint}}
+        """
+        testNames = {}
+        if not os.path.isdir(self.stateDir):
+            return testNames
+        for entry in sorted(os.listdir(self.stateDir)):
+            if not entry.endswith('.pkl'):
+                continue
+            try:
+                with open(os.path.join(self.stateDir, entry), 'rb') as f:
+                    header = pickle.load(f)
+            except (OSError, EOFError, ValueError, AttributeError, pickle.UnpicklingError):
+                continue
+            if header.get('version') == STATE_VERSION:
+                testNames[header['testName']] = header['groups']
+        return testNames
+
+    def loadOrder(self):
+        """
+        This function reads the order of the testNames of the previous run.
+        @return list of testNames
+        """
+        try:
+            with open(os.path.join(self.stateDir, ORDER_FILE), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def getOrder(self, testNames):
+        """
+        This function returns the testNames in the order of the previous runs, the new testNames are appended in the
+        given order. The worksheets of a workbook computed from the state are in the same order in every run.
+        @param testNames list of testNames
+        @return list of testNames
+        """
+        current = set(testNames)
+        order = [testName for testName in self.loadOrder() if testName in current]
+        known = set(order)
+        return order + [testName for testName in testNames if testName not in known]
+
+    def storeOrder(self, testNames):
+        """
+        This function writes the order of the testNames, the testNames of the previous runs which are not in the list
+        are kept at the end.
+        @param testNames list of testNames
+        """
+        current = set(testNames)
+        order = list(testNames) + [testName for testName in self.loadOrder() if testName not in current]
+        os.makedirs(self.stateDir, exist_ok=True)
+        fd, tmpPath = tempfile.mkstemp(dir=self.stateDir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(order, f, indent=0)
+        os.replace(tmpPath, os.path.join(self.stateDir, ORDER_FILE))
+
+    def clear(self):
+        """
+        This function deletes all state files.
+        """
+        shutil.rmtree(self.stateDir, ignore_errors=True)
@@ -0,0 +1,246 @@
+"""
+@file manifestIndex.py
+This module defines the ManifestIndex class that selects the logfiles from the manifest of the archive, the file which
+lists every path under /MNT_PROD and is updated every three hours, instead of walking the directory trees.
+
+The manifest is parsed once per revision into an index file: each logfile name is split into the fields matched by
+regex.getRegex() (variant, HW, task, transition types, test, year and month of the time stamp), each field is stored
+as integer codes of its sorted values and the rows are sorted by the fields. The filters of a group are resolved by
+lookups of the codes of their values, the group regex only confirms the candidates. A filter whose values are not
+plain words (eg: regular expressions) is not looked up, its field is checked by the group regex alone. The names which
+don't match the pattern of an empty filter are kept without fields, they are candidates of such filters only.
+
+The fields are the dot separated fields of the logfile name. The logfiles are returned in the order of the manifest and
+their paths are joined as in iterFilenames(), so a logfile has the same path in both.
+"""
+
+import os
+import re
+import pickle
+import tempfile
+import zlib
+import numpy as np
+import pandas as pd
+from .regex import getRegex
+
+# Increase INDEX_VERSION if the layout of the index file changes.
+INDEX_VERSION = 1
+
+DEFAULT_MANIFEST_INDEX = os.path.join(os.path.expanduser('~'), '.cache', 'Cpk_Tool', 'manifest.pkl')
+
+# Fields of the logfile names kept in the index: (group of the getRegex() pattern, filter key, pattern of the filter
+# values which are looked up). The transition types are the 'Type1' and 'Type2' keys of the TRANSITION filter.
+MANIFEST_FIELDS = [('Variant', 'VARIANT', '[A-Za-z]+'),
+                   ('HW', 'HW', '[A-Za-z]+'),
+                   ('Task', 'TASK', '[A-Za-z]+'),
+                   ('Type1', 'TRANSITION', '[A-Za-z]+'),
+                   ('Type2', 'TRANSITION', '[A-Za-z]+'),
+                   ('Test', 'TEST', '[A-Za-z][A-Za-z0-9_]*'),
+                   ('Years', 'YEAR', '[0-9]{4}'),
+                   ('Months', 'MONTH', '[0-9]{2}')]
+
+# Filter without values, its pattern matches every logfile name that any filter can select.
+EMPTY_FILTER = {'VARIANT': [], 'HW': [], 'TASK': [], 'TRANSITION': {}, 'TEST': [], 'YEAR': [], 'MONTH': []}
+
+def getFilterValues(Filter, field, key):
+    """
+    This function returns the values of a filter field.
+    @return list of values, empty if the field is not filtered.
+    """
+    try:
+        return list(Filter[key][field] if key == 'TRANSITION' else Filter[key])
+    except (KeyError, TypeError):
+        return []
+
+
+class ManifestIndex(object):
+
+    def __init__(self, manifestFile, indexFile=DEFAULT_MANIFEST_INDEX):
+        """
+        @param manifestFile path of the manifest, one path per line.
+        @param indexFile path of the index file.
+        """
+        self.manifestFile = manifestFile
+        self.indexFile = indexFile
+        self.dirs = np.array([], dtype=object)      # sorted directory paths
+        self.dirCodes = np.array([], dtype=np.int32)
+        self.names = np.array([], dtype=object)     # logfile names
+        self.lines = np.array([], dtype=np.int64)   # line of each row in the manifest
+        self.codes = {}                             # {field: array of codes}, -1 if the name has no such field
+        self.values = {}                            # {field: sorted values}
+        self.missing = {}                           # {filepath: None} of the selected logfiles which are not found
+
+    def getRevision(self):
+        """ @return (size, mtime) of the manifest """
+        stat = os.stat(self.manifestFile)
+        return stat.st_size, stat.st_mtime_ns
+
+    def load(self):
+        """
+        This function reads the index file, the manifest is parsed again and the index file written if the manifest
+        changed.
+        @return True if the manifest was parsed.
+        """
+        revision = self.getRevision()
+        try:
+            with open(self.indexFile, 'rb') as f:
+                header = pickle.load(f)
+                if (header.get('version') == INDEX_VERSION and header.get('manifest') == self.manifestFile and
+                        header.get('revision') == revision):
+                    (self.dirs, self.dirCodes, self.names, self.lines,
+                     self.codes, self.values) = pickle.loads(zlib.decompress(f.read()))
+                    return False
+        except (OSError, EOFError, ValueError, AttributeError, pickle.UnpicklingError, zlib.error):
+            pass
+        self.parse()
+        self.store(revision)
+        return True
+
+    def store(self, revision):
+        """
+        This function writes the index file. The file is written to a temporary file first and renamed.
+        @param revision (size, mtime) of the parsed manifest.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.indexFile)), exist_ok=True)
+        fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.indexFile)), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump({'version': INDEX_VERSION, 'manifest': self.manifestFile, 'revision': revision,
+                         'files': len(self.names)}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.write(zlib.compress(pickle.dumps((self.dirs, self.dirCodes, self.names, self.lines, self.codes,
+                                                self.values), protocol=pickle.HIGHEST_PROTOCOL), 1))
+        os.replace(tmpPath, self.indexFile)
+
+    def parse(self):
+        """
+        This function parses the manifest. The names which don't match the pattern of EMPTY_FILTER are kept with the
+        code -1 in all fields if they can be a logfile name, ie 'log' is found after the first character.
+        """
+        pattern = re.compile(getRegex(EMPTY_FILTER))
+        fields = [field for field, key, valuePattern in MANIFEST_FIELDS]
+        dirs, names, lines = [], [], []
+        rows = {field: [] for field in fields}
+        with open(self.manifestFile, 'r', errors='replace') as ifile:
+            for n, line in enumerate(ifile):
+                path = line.strip()
+                dirpath, _, filename = path.rpartition('/')
+                m = pattern.match(filename)
+                if m is None and 'log' not in filename[1:]:
+                    continue
+                dirs.append(dirpath)
+                names.append(filename)
+                lines.append(n)
+                for field in fields:
+                    rows[field].append(None if m is None else m.group(field) or '')
+
+        # Codes of the sorted values of each field.
+        for field in fields:
+            codes, values = pd.factorize(np.array(rows[field], dtype=object), sort=True)
+            self.codes[field] = codes.astype(np.int32)
+            self.values[field] = np.asarray(values, dtype=object)
+        dirCodes, self.dirs = pd.factorize(np.array(dirs, dtype=object), sort=True)
+        self.dirs = np.asarray(self.dirs, dtype=object)
+
+        # Sorting the rows by the fields, the first field is looked up by binary search.
+        order = np.lexsort([self.codes[field] for field in reversed(fields)])
+        for field in fields:
+            self.codes[field] = self.codes[field][order]
+        self.dirCodes = dirCodes.astype(np.int32)[order]
+        self.names = np.array(names, dtype=object)[order]
+        self.lines = np.array(lines, dtype=np.int64)[order]
+
+    def lookup(self, Filter):
+        """
+        This function returns the rows of the index whose fields match the filter values.
+        @param Filter filter of a group, see ConfigFile.filenameFilter().
+        @return array of row positions
+        """
+        positions = None
+        exact = True
+        for field, key, valuePattern in MANIFEST_FIELDS:
+            values = getFilterValues(Filter, field, key)
+            if len(values) == 0:
+                continue
+            if not all(re.fullmatch(valuePattern, value) for value in values):
+                # The field is checked by the group regex, which may select names without fields.
+                exact = False
+                continue
+            wanted = np.searchsorted(self.values[field], values)
+            wanted = np.array([code for code, value in zip(wanted, values)
+                               if code < len(self.values[field]) and self.values[field][code] == value], dtype=np.int32)
+            if positions is None and field == MANIFEST_FIELDS[0][0]:
+                # The rows are sorted by the first field, each value is a contiguous range of rows.
+                codes = self.codes[field]
+                positions = np.concatenate([np.arange(np.searchsorted(codes, code, 'left'),
+                                                      np.searchsorted(codes, code, 'right')) for code in wanted]
+                                           + [np.array([], dtype=np.int64)]).astype(np.int64)
+            else:
+                if positions is None:
+                    positions = np.arange(len(self.names), dtype=np.int64)
+                positions = positions[np.isin(self.codes[field][positions], wanted)]
+        if positions is None:
+            positions = np.arange(len(self.names), dtype=np.int64)
+        elif not exact:
+            # The names without fields have the code -1, they are the first rows.
+            unparsed = np.arange(np.searchsorted(self.codes[MANIFEST_FIELDS[0][0]], 0), dtype=np.int64)
+            positions = np.union1d(unparsed, positions)
+        return positions
+
+    def getDirPaths(self, rootPath, pruneDir=None):
+        """
+        This function maps the directories of the index under a root directory to their paths as in the directory walk,
+        eg: rootPath '/data/' and directory '/data/Wave' give '/data/Wave'.
+        @param rootPath root directory of a group.
+        @param pruneDir function that takes a directory name and returns True if the directory has to be skipped.
+        @return array of paths, one per directory of the index, None if the directory is not under rootPath.
+        """
+        root = rootPath.rstrip('/')
+        paths = np.empty(len(self.dirs), dtype=object)
+        # The directories are sorted, the directories under root are in a contiguous range which also holds the
+        # siblings whose names start with the name of root, eg: '/data.old'.
+        first, last = np.searchsorted(self.dirs, [root, root + '/\uffff'])
+        for code in range(first, last):
+            dirpath = self.dirs[code]
+            if dirpath == root:
+                paths[code] = rootPath
+            elif dirpath.startswith(root + '/'):
+                relPath = dirpath[len(root) + 1:]
+                if pruneDir is not None and any(pruneDir(name) for name in relPath.split('/')):
+                    continue
+                paths[code] = os.path.join(rootPath, relPath)
+        return paths
+
+    def getFiles(self, dirList, Filter, select, pruneDir=None):
+        """
+        This function selects the logfiles of a group.
+        @param dirList root directories of the group.
+        @param Filter filter of the group, see ConfigFile.filenameFilter().
+        @param select function returned by getSelector(), it confirms each candidate.
+        @param pruneDir function returned by regex.getDirFilter(), or None.
+        @return list of tuples (testName, filepath), the logfiles of each root directory in the order of the manifest.
+                The logfiles which are not found anymore, eg: moved since the manifest was updated, are skipped and
+                added to self.missing.
+        """
+        positions = self.lookup(Filter)
+        positions = positions[np.argsort(self.lines[positions], kind='mergesort')]
+        selected = []
+        for rootPath in dirList:
+            dirPaths = self.getDirPaths(rootPath, pruneDir)
+            for position in positions:
+                dirpath = dirPaths[self.dirCodes[position]]
+                if dirpath is None:
+                    continue
+                testName = select(self.names[position])
+                if testName is None:
+                    continue
+                filepath = '{0}/{1}'.format(dirpath, self.names[position])
+                try:
+                    os.stat(filepath)
+                except OSError:
+                    self.missing[filepath] = None
+                    continue
+                selected.append((testName, filepath))
+        return selected
+
+    def __len__(self):
+        """ @return number of logfile names in the index """
+        return len(self.names)
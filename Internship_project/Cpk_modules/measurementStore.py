@@ -0,0 +1,264 @@
+"""
+@file measurementStore.py
+This module defines the MeasurementStore class that keeps every parsed measurement row in a local SQLite database, so
+the statistics of any slice of the archive (dates, workstations, hardware) can be queried without parsing the logfiles.
+
+The database has three tables:
+    - logfiles: one row per logfile and group with its testName, size, modification time and metadata (date, time,
+      workstation, ST and RHEL versions). Indexed by testName and date, and by workstation.
+    - ids: one row per measurement ID 'HwIds|MeasPointIds|MeasNames' with its three columns. Indexed by HwIds.
+    - measurements: one row per sample with its logfile, ID, value and limits. Indexed by ID and by logfile.
+A logfile is ingested again only if its size or modification time changed. The settings columns are not stored.
+The DataFrames are written as they are parsed for the worksheets, see addParsed(). ingest() parses only the logfiles
+which were not written this way, eg: taken from the INCREMENTAL state or parsed in TESTNAME_WORKERS processes.
+"""
+
+from __future__ import division
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from .getDataframe import getDataFrame
+from .getStatistics import getCpk
+from .mergeDataframes import getIDs
+from .parallelParse import iterDataFrames
+from .runMetrics import TimedParser
+
+# Increase STORE_VERSION if the layout of the database changes, the tables of an older version are dropped.
+STORE_VERSION = 1
+
+DEFAULT_STORE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'Cpk_Tool', 'measurements.db')
+
+# Logfiles ingested in one transaction.
+COMMIT_FILES = 200
+
+# Maximum number of parameters of an SQLite statement.
+MAX_PARAMS = 900
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logfiles (
+    id INTEGER PRIMARY KEY, path TEXT NOT NULL, grp TEXT NOT NULL, testName TEXT NOT NULL,
+    size INTEGER, mtime INTEGER, date TEXT, time TEXT, workstation TEXT, st_version TEXT, rhel_version TEXT,
+    UNIQUE (path, grp));
+CREATE TABLE IF NOT EXISTS ids (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, HwIds TEXT, MeasPointIds TEXT, MeasNames TEXT);
+CREATE TABLE IF NOT EXISTS measurements (
+    logfile INTEGER NOT NULL, id INTEGER NOT NULL, value REAL, lower REAL, upper REAL, expected REAL);
+CREATE INDEX IF NOT EXISTS logfiles_testName ON logfiles (testName, date);
+CREATE INDEX IF NOT EXISTS logfiles_date ON logfiles (date);
+CREATE INDEX IF NOT EXISTS logfiles_workstation ON logfiles (workstation);
+CREATE INDEX IF NOT EXISTS ids_HwIds ON ids (HwIds);
+CREATE INDEX IF NOT EXISTS measurements_id ON measurements (id);
+CREATE INDEX IF NOT EXISTS measurements_logfile ON measurements (logfile);
+"""
+
+# Columns of the statistics returned by MeasurementStore.getStatistics().
+STORE_STATS_COLUMNS = ['IDs', 'Count', 'Mean', 'Std', 'L1_', 'U1_', 'Cpk']
+
+def getColumn(DataFrame, col):
+    """ @return column of DataFrame as a float array, nan if the column is missing. """
+    if col not in DataFrame:
+        return np.full(len(DataFrame), np.nan)
+    return pd.to_numeric(DataFrame[col], errors='coerce').values.astype(float)
+
+
+class MeasurementStore(object):
+
+    def __init__(self, storeFile):
+        """
+        The database is created if it doesn't exist.
+        @param storeFile path of the SQLite database.
+        """
+        self.storeFile = storeFile
+        os.makedirs(os.path.dirname(os.path.abspath(storeFile)), exist_ok=True)
+        self.connection = sqlite3.connect(storeFile)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != STORE_VERSION:
+            self.connection.executescript('DROP TABLE IF EXISTS measurements; DROP TABLE IF EXISTS ids; '
+                                          'DROP TABLE IF EXISTS logfiles;')
+            self.connection.execute('PRAGMA user_version = {0}'.format(STORE_VERSION))
+        self.connection.executescript(SCHEMA)
+        self.idCodes = dict(self.connection.execute('SELECT name, id FROM ids'))     # {ID: id}
+        self.uncommitted = 0    # logfiles written by addParsed() since the last commit
+
+    def close(self):
+        self.connection.close()
+
+    def getIdCodes(self, names, HwIds, MeasPointIds, MeasNames):
+        """
+        This function returns the id of each measurement ID, the new IDs are inserted.
+        @param names array of IDs 'HwIds|MeasPointIds|MeasNames', HwIds, MeasPointIds, MeasNames arrays of its columns.
+        @return array of ids
+        """
+        new = [(name, hw, point, meas) for name, hw, point, meas in zip(names, HwIds, MeasPointIds, MeasNames)
+               if name not in self.idCodes]
+        if new:
+            self.connection.executemany('INSERT INTO ids (name, HwIds, MeasPointIds, MeasNames) VALUES (?, ?, ?, ?)', new)
+            for i in range(0, len(new), MAX_PARAMS):
+                chunk = [row[0] for row in new[i:i + MAX_PARAMS]]
+                self.idCodes.update(self.connection.execute(
+                    'SELECT name, id FROM ids WHERE name IN ({0})'.format(','.join('?' * len(chunk))), chunk))
+        return np.array([self.idCodes[name] for name in names], dtype=np.int64)
+
+    def addLogfile(self, entries, filepath, stat, DataFrame, MetaData):
+        """
+        This function writes the rows of a logfile for each of its groups, the rows of a previous ingest are replaced.
+        @param entries list of tuples (testName, group) of the logfile.
+        @param filepath logfile path
+        @param stat (size, mtime) of the logfile.
+        @param DataFrame DataFrame returned by getDataFrame(), the logfile has no measurement row if it is empty.
+        @param MetaData dictionary returned by getLogfileHeader().
+        @return number of measurement rows written
+        """
+        rows = None
+        if not DataFrame.empty:
+            IDs = getIDs(DataFrame)
+            valid = IDs.codes >= 0
+            names = np.asarray(IDs.categories, dtype=object)
+            parts = [name.split('|', 2) for name in names]
+            ids = self.getIdCodes(names, [p[0] for p in parts], [p[1] for p in parts], [p[2] for p in parts])
+            # sqlite3 writes nan values as NULL, they are not counted by the aggregate functions.
+            rows = [ids[IDs.codes[valid]].tolist(), getColumn(DataFrame, 'MeasValues')[valid].tolist(),
+                    getColumn(DataFrame, 'L1_')[valid].tolist(), getColumn(DataFrame, 'U1_')[valid].tolist(),
+                    getColumn(DataFrame, 'R_')[valid].tolist()]
+
+        count = 0
+        for testName, group in entries:
+            self.connection.execute('DELETE FROM measurements WHERE logfile IN '
+                                    '(SELECT id FROM logfiles WHERE path = ? AND grp = ?)', (filepath, group))
+            self.connection.execute('DELETE FROM logfiles WHERE path = ? AND grp = ?', (filepath, group))
+            cursor = self.connection.execute(
+                'INSERT INTO logfiles (path, grp, testName, size, mtime, date, time, workstation, st_version, '
+                'rhel_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (filepath, group, testName, stat[0], stat[1], MetaData.get('Date'), MetaData.get('Time'),
+                 MetaData.get('WorkStation'), MetaData.get('ST_Version'), MetaData.get('RHEL_Version')))
+            if rows is not None:
+                logfile = [cursor.lastrowid] * len(rows[0])
+                self.connection.executemany('INSERT INTO measurements VALUES (?, ?, ?, ?, ?, ?)', zip(logfile, *rows))
+                count += len(logfile)
+        return count
+
+    def addParsed(self, entries, filepath, DataFrame, MetaData):
+        """
+        This function writes the rows of a logfile parsed for the worksheets, see addLogfile(). The rows are committed
+        every COMMIT_FILES logfiles and by ingest().
+        @return number of measurement rows written
+        """
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return 0
+        rows = self.addLogfile(entries, filepath, (stat.st_size, stat.st_mtime_ns), DataFrame, MetaData)
+        self.uncommitted += 1
+        if self.uncommitted >= COMMIT_FILES:
+            self.connection.commit()
+            self.uncommitted = 0
+        return rows
+
+    def ingest(self, fileEntries, executor=None, parser=TimedParser(getDataFrame, header=True), metrics=None,
+               progress=None):
+        """
+        This function writes the measurement rows of the new and changed logfiles.
+        @param fileEntries list of tuples (testName, group, filepath)
+        @param executor ProcessPoolExecutor object to parse the logfiles, or None to parse them one by one.
+        @param parser TimedParser object which reads the header, eg: TimedParser(DataFrameCache.getDataFrame, True)
+        @param metrics RunMetrics object, it records the parse time of each logfile, or None.
+        @param progress function called as progress(1, filename) after each logfile, the unchanged logfiles are counted
+                        at once.
+        @return tuple (number of logfiles ingested, number of measurement rows written)
+        """
+        known = {(path, group): (size, mtime) for path, group, size, mtime
+                 in self.connection.execute('SELECT path, grp, size, mtime FROM logfiles')}
+        stale = {}     # {filepath: [(testName, group), ...]}
+        stats = {}     # {filepath: (size, mtime)}
+        for testName, group, filepath in fileEntries:
+            if filepath not in stats:
+                try:
+                    stat = os.stat(filepath)
+                except OSError:
+                    continue
+                stats[filepath] = (stat.st_size, stat.st_mtime_ns)
+            if known.get((filepath, group)) != stats[filepath]:
+                stale.setdefault(filepath, []).append((testName, group))
+
+        files = list(stale)
+        if progress is not None and len(files) < len(stats):
+            progress(len(stats) - len(files), '')
+        rows = 0
+        for n, (file, result) in enumerate(iterDataFrames(files, executor, parser), 1):
+            DataFrame = result[0] if metrics is None else metrics.recordParse(file, result)
+            rows += self.addLogfile(stale[file], file, stats[file], DataFrame, result[3])
+            if n % COMMIT_FILES == 0:
+                self.connection.commit()
+            if progress is not None:
+                progress(1, file.split('/')[-1])
+        self.connection.commit()
+        self.uncommitted = 0
+        return len(files), rows
+
+    def getSlice(self, testName=None, group=None, dateFrom=None, dateTo=None, workstation=None, HwIds=None, ID=None):
+        """
+        This function returns the SQL condition of a slice, the arguments which are None are not used.
+        @param testName, group, workstation, HwIds exact values, ID 'HwIds|MeasPointIds|MeasNames' or SQL LIKE pattern.
+        @param dateFrom, dateTo first and last date 'YYYY-MM-DD' of the logfiles.
+        @return tuple (condition, list of parameters)
+        """
+        conditions = ['1']
+        params = []
+        for column, op, value in [('l.testName', '=', testName), ('l.grp', '=', group), ('l.date', '>=', dateFrom),
+                                  ('l.date', '<=', dateTo), ('l.workstation', '=', workstation),
+                                  ('i.HwIds', '=', HwIds), ('i.name', 'LIKE', ID)]:
+            if value is not None:
+                conditions.append('{0} {1} ?'.format(column, op))
+                params.append(value)
+        return ' AND '.join(conditions), params
+
+    def getStatistics(self, **slice):
+        """
+        This function computes the Cpk of each ID of a slice from the indexed tables, see getSlice() for the arguments.
+        The statistics are computed from all samples of the slice, before outliers detection, with the L1_/U1_ limits
+        of the first row of the ID as in the worksheet.
+        @return DataFrame with the columns STORE_STATS_COLUMNS, sorted by ID.
+        """
+        condition, params = self.getSlice(**slice)
+        # The squared deviations are summed in a second pass from the mean of each ID, summing the squared values would
+        # lose the precision of values with a large offset eg: frequencies.
+        rows = self.connection.execute(
+            'WITH s AS (SELECT m.id AS id, COUNT(m.value) AS n, AVG(m.value) AS mean, MIN(m.rowid) AS first '
+            'FROM measurements m JOIN logfiles l ON l.id = m.logfile JOIN ids i ON i.id = m.id '
+            'WHERE {0} GROUP BY m.id) '
+            'SELECT i.name, s.n, s.mean, SUM((m.value - s.mean) * (m.value - s.mean)), f.lower, f.upper '
+            'FROM s JOIN measurements m ON m.id = s.id JOIN logfiles l ON l.id = m.logfile JOIN ids i ON i.id = s.id '
+            'JOIN measurements f ON f.rowid = s.first '
+            'WHERE {0} GROUP BY s.id ORDER BY i.name'.format(condition), params + params).fetchall()
+        if not rows:
+            return pd.DataFrame(columns=STORE_STATS_COLUMNS)
+
+        names, Count, Mean, squares, L, U = zip(*rows)
+        Count = np.array(Count, dtype=float)
+        Mean = np.array(Mean, dtype=float)
+        squares = np.array(squares, dtype=float)
+        # Limits of the first row of each ID, blank limits are 0 as in Excel.
+        L = np.array([lower or 0.0 for lower in L])
+        U = np.array([upper or 0.0 for upper in U])
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            Std = np.where(Count > 1, np.sqrt(squares / (Count - 1)), np.nan)
+        Cpk = getCpk(Mean, Std, L, U)
+
+        return pd.DataFrame({'IDs': list(names), 'Count': Count.astype(np.int64), 'Mean': Mean, 'Std': Std,
+                             'L1_': L, 'U1_': U, 'Cpk': Cpk}, columns=STORE_STATS_COLUMNS)
+
+    def getTestNames(self, **slice):
+        """
+        This function lists the testNames of a slice, see getSlice() for the arguments.
+        @return DataFrame with the columns ['testName', 'Logfiles', 'First', 'Last']
+        """
+        # The ID columns are not used, the logfiles table alone is read.
+        condition, params = self.getSlice(**dict(slice, HwIds=None, ID=None))
+        rows = self.connection.execute(
+            'SELECT l.testName, COUNT(DISTINCT l.path), MIN(l.date), MAX(l.date) FROM logfiles l '
+            'WHERE {0} GROUP BY l.testName ORDER BY l.testName'.format(condition),
+            params).fetchall()
+        return pd.DataFrame(rows, columns=['testName', 'Logfiles', 'First', 'Last'])
@@ -7,8 +7,11 @@ import sys
 import pandas as pd
 import numpy as np
 import natsort
+from pandas.api.types import union_categoricals
 from .getHistrogram import getHistDataframe
 from .outliersDetection import getOutliersDataframe
+from .raggedSamples import RaggedSamples
+from .runMetrics import getStage
 
 
 DEBUG = False
@@ -24,17 +27,22 @@ def applyIDX(lst, IDX):
 
 # ======================================= split merged DataFrame function =============================================
 
-def split_Dataframe(mergedDF, settings_cols, IDX):
+def split_Dataframe(mergedDF, IDs, settings_cols, IDX):
     """
     This function splits the merged Dataframe into Ids_DF, Limits_DF, Settings_DF.
     @param mergedDF Merged Dataframe
+    @param IDs Categorical of the ID of each row of mergedDF, see getIDs().
     @param settings_cols list of setting's column names
     @param IDX  group number
     @return Dataframes as  Ids_DF, Limits_DF, Settings_DF
     """
-    # first drop duplicate rows based on "IDs" column, then drop "MeasValues" column,
-    # finally change default index of mergedDF with 'IDs' column.
-    DataFrame =mergedDF.reset_index().drop_duplicates(subset='IDs').drop(['MeasValues'], axis=1).set_index('IDs')
+    # first keep the first row of each ID, then drop "MeasValues" column,
+    # finally change default index of mergedDF with the IDs.
+    firstRows = np.sort(np.unique(IDs.codes, return_index=True)[1])
+    DataFrame = mergedDF.iloc[firstRows].drop(['MeasValues'], axis=1)
+    DataFrame.index = pd.Index(np.asarray(IDs[firstRows], dtype=object), name='IDs')
+    # The Dataframes have one row per ID, the categorical columns are converted back to strings.
+    DataFrame = DataFrame.astype({col: object for col in DataFrame.columns if DataFrame[col].dtype.name == 'category'})
 
     # DataFrameCols = ['HwIds', 'MeasNames', 'MeasPointIds', 'R_', 'L1_', 'U1_', 'index', 'setupFrequency']
     # rename limits columns
@@ -47,52 +55,97 @@ def split_Dataframe(mergedDF, settings_cols, IDX):
     Settings_DF = DataFrame[settings_cols]
     return Ids_DF, Limits_DF, Settings_DF
 
-# ======================================= Samples DataFrame functions ==================================================
+# ======================================= Categorical columns functions ================================================
 
-def getSamplesdict(arr, IDX):
+def concatDataFrames(DFs_list):
     """
-    This function takes an array as argument and returns dictionary object as:
-    samplesdict = {'S0_1':232323, 'S1_1':232323, 'S2_1':232323,.... }
-
-    @param arr array of samples values.
-    @param IDX group number
-    @return dictionay object
+    This function concatenates the DataFrames of the logfiles as pd.concat(DFs_list, ignore_index=True) does, but the
+    categorical columns stay categorical: their categories are united with union_categoricals(). pd.concat()
+    converts categorical columns with different categories to strings.
+    Columns missing in a DataFrame are nan.
+    @param DFs_list list of DataFrames returned by getDataFrame()
+    @return DataFrame
+    """
+    columns = pd.concat([DF.iloc[:0] for DF in DFs_list], ignore_index=True).columns
+    categorical_cols = [col for col in columns
+                        if any(col in DF and DF[col].dtype.name == 'category' for DF in DFs_list)]
+
+    merged_DF = pd.concat([DF.drop([col for col in categorical_cols if col in DF], axis=1) for DF in DFs_list],
+                          ignore_index=True)
+    for col in categorical_cols:
+        pieces = []
+        for DF in DFs_list:
+            if col not in DF:
+                pieces.append(pd.Categorical.from_codes(np.full(len(DF), -1), pd.Index([], dtype=object)))
+            else:
+                pieces.append(pd.Categorical(DF[col]))
+        merged_DF[col] = union_categoricals(pieces)
+    return merged_DF[columns]
+
+def getIDs(DataFrame):
     """
-    samplesdict = {}
-    for idx, val in enumerate(arr):
-        Id = 'S' + str(idx) + '_' + IDX
-        samplesdict[Id] = val
-    return samplesdict
+    This function composes the ID of each row as 'HwIds|MeasPointIds|MeasNames'.
+    The codes of the three columns are combined into one integer per row, the ID string is built once for each
+    distinct combination instead of once per row.
+    @param DataFrame merged Dataframe
+    @return Categorical with the sorted IDs as categories. Rows with a missing HwIds, MeasPointIds or MeasNames
+            have no ID (code -1).
+    """
+    key = np.zeros(len(DataFrame), dtype=np.int64)
+    missing = np.zeros(len(DataFrame), dtype=bool)
+    id_cols = []
+    for col in ['HwIds', 'MeasPointIds', 'MeasNames']:
+        Categorical = pd.Categorical(DataFrame[col])
+        categories = np.asarray(Categorical.categories, dtype=object)
+        codes = Categorical.codes.astype(np.int64)
+        missing |= codes < 0
+        key = key * max(len(categories), 1) + codes
+        id_cols.append(categories)
+
+    keyCodes, keys = pd.factorize(key[~missing])
+
+    # Splitting the combined codes of each distinct key into the codes of the columns.
+    parts = []
+    for categories in reversed(id_cols):
+        radix = max(len(categories), 1)
+        parts.append(categories[keys % radix])
+        keys = keys // radix
+    HwIds, MeasPointIds, MeasNames = reversed(parts)
+    idCodes, idLabels = pd.factorize(HwIds + '|' + MeasPointIds + '|' + MeasNames, sort=True)
+
+    codes = np.full(len(DataFrame), -1, dtype=np.int64)
+    codes[~missing] = idCodes[keyCodes]
+    return pd.Categorical.from_codes(codes, idLabels)
+
+# ======================================= Samples DataFrame functions ==================================================
 
-def getSamplesDataframe(Series, IDX):
+def getSamplesDataframe(Samples, IDX):
     """
-    This function iterates over the Series. Each value is an array of sample values.
-    Array values are unpacked to get the Samples Dataframe.
-    @param Series pandas Series object.
+    This function unpacks the samples of each ID in to the Samples Dataframe, IDs with less samples are padded with nan.
+    @param Samples RaggedSamples object.
     @param IDX group number.
-    @return Samples Dataframe.
+    @return Samples Dataframe, index = IDs, columns = [S0_IDX, S1_IDX, ..., SN_IDX]
     """
-    SamplesData = {}
-    for ID, arr in Series.items():
-        SamplesData[ID] = getSamplesdict(arr, IDX)
-    return pd.DataFrame.from_dict(SamplesData, orient='index')
+    matrix = Samples.getMatrix()
+    columns = ['S' + str(i) + '_' + IDX for i in range(matrix.shape[1])]
+    return pd.DataFrame(matrix, index=Samples.index, columns=columns)
 
 # ======================================= Merged DataFrame function ====================================================
 
-def mergeDataFrames(DFs_list, Bins, Outliers, keep_hist, IDX):
+def mergeDataFrames(DFs_list, Bins, Outliers, keep_hist, IDX, metrics=None):
     """
     This function merges list of Dataframes and performs multiple transformations before returning a final merged dataframe.
     The transform steps are as following:
-        - Concatenate Dataframes from list of Dataframe along column as merged_DF.
-        - Adding a new 'ID' column in 'merged_DF' by combining HwIds, MeasPointIds, MeasNames columns.
+        - Concatenate Dataframes from list of Dataframe along column as merged_DF, categorical columns stay categorical.
+        - Getting the ID of each row of 'merged_DF' by combining the codes of HwIds, MeasPointIds, MeasNames columns.
         - Split merged_DF into Ids_DF, Settings_DF, Limits_DF
-        - Grouping the "MeasValues" with similar "index values" in an array. This will give a pd.Series object.
+        - Grouping the "MeasValues" with similar "index values". This will give a RaggedSamples object.
         - Getting default limits
         - Getting Outlier DataFrame as index = IDs & Columns = [L2, U2]
           After outlier detection new Upperlimit = U2 & new Lowerlimit = L2
         - Adding dummy columns to OutlierDF.
             i.e ['Type_', 'Factor_', 'L_', 'U_', 'Range_', 'FailsCounts_', 'Min_', 'Max_', 'Mean_', 'Std_', 'Cp_', 'Cpk_']
-        - Drop IDs from UpdatedSeries where len(ARR) = 0
+        - Drop IDs without samples from UpdatedSamples
         - Getting Samples DataFrame as  index=IDs, Columns=[S0_1,S1_1,S2_1,S3_1......SN_1]
         - Getting Histrogram DataFrame as index= IDs, Columns= [B1_1,B2_1,.....BN_1]
         - Combine IDsDF, SampleDF, HistrogramDF, OutlierDF as FinalDF
@@ -104,15 +157,37 @@ def mergeDataFrames(DFs_list, Bins, Outliers, keep_hist, IDX):
     @param Outliers is the percentage of outliers to detect.
     @param keep_hist boolean(True/False)
     @param IDX number of groups
+    @param metrics RunMetrics object, the outliers and histogram stages are measured if given.
     @return a merged DataFrame. This DataFrame is passed to getExcelfile() function in main.py file.
     """
 
     # concatenating dataframes along columns
-    merged_DF = pd.concat(DFs_list, ignore_index=True)
-    # Adding a new 'ID' column in 'merged_DF' ________________________________________________________________________:
+    merged_DF = concatDataFrames(DFs_list)
+    # Getting the ID of each row of 'merged_DF' ______________________________________________________________________:
+
+    IDs = getIDs(merged_DF)
+    IDs_DF, Limits_DF, Settings_DF = getIdsDataframes(merged_DF, IDs, IDX)
+
+    # Grouping the "MeasValues" with similar "index values". This will give a RaggedSamples object.
+    Samples = RaggedSamples.fromCategorical(IDs, merged_DF['MeasValues'].values)
+
+    # Getting default limits:
+    default_limits = applyIDX(['L1_', 'U1_'], IDX)
+    Default_limitDict = Limits_DF[default_limits].to_dict('index')
 
-    merged_DF['IDs'] = merged_DF['HwIds'] + '|' + merged_DF['MeasPointIds'] + '|' + merged_DF['MeasNames']
-    merged_DF.set_index('IDs', inplace=True)
+    OutlierDF, SamplesDF, HistrogramDF = getSamplesResults(Samples, Default_limitDict, Bins, Outliers, keep_hist,
+                                                           IDX, metrics)
+    FinalDF = getFinalDataframe(Limits_DF, OutlierDF, SamplesDF, HistrogramDF, IDX)
+    return FinalDF, IDs_DF, Settings_DF
+
+def getIdsDataframes(merged_DF, IDs, IDX):
+    """
+    This function returns the Ids_DF, Limits_DF and Settings_DF of a merged Dataframe, one row per ID.
+    @param merged_DF merged Dataframe
+    @param IDs Categorical of the ID of each row of merged_DF, see getIDs().
+    @param IDX group number.
+    @return Dataframes as Ids_DF, Limits_DF, Settings_DF
+    """
     all_cols = merged_DF.columns.tolist()
 
     # Get setting columns:
@@ -125,19 +200,52 @@ def mergeDataFrames(DFs_list, Bins, Outliers, keep_hist, IDX):
     # Limits_DF = ['R_', 'L1_', 'U1_']
     # Settings_DF = ['index', 'setupFrequency']
 
-    IDs_DF, Limits_DF, Settings_DF  = split_Dataframe(merged_DF, settings_cols, IDX)
+    IDs_DF, Limits_DF, Settings_DF  = split_Dataframe(merged_DF, IDs, settings_cols, IDX)
     Settings_DF['SETTINGS'] = ''
     Settings_DF = Settings_DF[['SETTINGS']+settings_cols]
+    return IDs_DF, Limits_DF, Settings_DF
+
+def getSamplesResults(Samples, Default_limitDict, Bins, Outliers, keep_hist, IDX, metrics=None):
+    """
+    This function computes the outlier limits, the samples and the histogram of the IDs of a RaggedSamples object.
+    The result of an ID doesn't depend on the other IDs, so the IDs can be processed in parts.
+    @param Samples RaggedSamples object.
+    @param Default_limitDict dictionary {ID: {'L1_IDX': value, 'U1_IDX': value}}
+    @param Bins is the number of columns to generate for Histrogram Dataframe.
+    @param Outliers is the percentage of outliers to detect.
+    @param keep_hist boolean(True/False)
+    @param IDX group number.
+    @param metrics RunMetrics object, the outliers and histogram stages are measured if given.
+    @return tuple (OutlierDF, SamplesDF, HistrogramDF), HistrogramDF is None if keep_hist is False.
+    """
+    # Getting Outlier DataFrame: index: IDs, Columns: [L2, U2]    ---> After outlier detection new Upperlimit = U2 & new Lowerlimit = L2
+    with getStage(metrics, 'outliers', items=len(Samples)):
+        OutlierDF, UpdatedSamples = getOutliersDataframe(Samples, Default_limitDict, Outliers, IDX)
 
-    # Grouping the "MeasValues" with similar "index values" in an array. This will give a pd.Series object.
-    Series = merged_DF.groupby([merged_DF.index])['MeasValues'].apply(np.array)
+    # Drop IDs from UpdatedSamples without samples.
+    UpdatedSamples = UpdatedSamples.nonEmpty()
 
-    # Getting default limits:
-    default_limits = applyIDX(['L1_', 'U1_'], IDX)
-    Default_limitDict = Limits_DF[default_limits].to_dict('index')
+    # Getting Samples DataFrame: index: IDs, Columns: eg : [S0_1,S1_1,S2_1,S3_1......SN_1]
+    SamplesDF = getSamplesDataframe(UpdatedSamples, IDX)
 
-    # Getting Outlier DataFrame: index: IDs, Columns: [L2, U2]    ---> After outlier detection new Upperlimit = U2 & new Lowerlimit = L2
-    OutlierDF, UpdatedSeries = getOutliersDataframe(Series, Default_limitDict, Outliers, IDX)
+    # Getting Histrogram DataFrame: index: IDs, Columns: eg: [B1_1,B2_1,.....BN_1]
+    HistrogramDF = None
+    if keep_hist:
+        with getStage(metrics, 'histogram', items=len(UpdatedSamples)):
+            HistrogramDF = getHistDataframe(UpdatedSamples, Bins , IDX)
+    return OutlierDF, SamplesDF, HistrogramDF
+
+def getFinalDataframe(Limits_DF, OutlierDF, SamplesDF, HistrogramDF, IDX):
+    """
+    This function combines the limits, outliers, histogram and samples Dataframes of a group as FinalDF.
+    @param Limits_DF Dataframe of default limits, index = IDs
+    @param OutlierDF Dataframe of new limits, index = IDs, columns = [L2, U2]
+    @param SamplesDF Dataframe of samples, index = IDs
+    @param HistrogramDF Dataframe of histogram, index = IDs, or None if the histogram is hidden.
+    @param IDX group number.
+    @return FinalDF
+    """
+    keep_hist = HistrogramDF is not None
 
     # Adding dummy columns to OutlierDF.
     func_cols = ['Type_', 'Factor_', 'L_', 'U_', 'Range_', 'FailsCounts_', 'Min_', 'Max_', 'Mean_', 'Std_', 'Cp_', 'Cpk_']
@@ -146,12 +254,6 @@ def mergeDataFrames(DFs_list, Bins, Outliers, keep_hist, IDX):
         OutlierDF[col] = ''
     #print(OutlierDF.columns.tolist())
 
-    # Drop IDs from UpdatedSeries where len(ARR) = 0.
-    UpdatedSeries = UpdatedSeries[UpdatedSeries.map(len) > 0]
-    #print(UpdatedSeries)
-
-    # Getting Samples DataFrame: index: IDs, Columns: eg : [S0_1,S1_1,S2_1,S3_1......SN_1]
-    SamplesDF = getSamplesDataframe(UpdatedSeries, IDX)
     # If there are no columns in SamplesDF return empty dataframe
 
     SamplesDF_cols = natsort.natsorted(SamplesDF.columns.tolist())
@@ -161,9 +263,7 @@ def mergeDataFrames(DFs_list, Bins, Outliers, keep_hist, IDX):
     if DEBUG: print(SamplesDF.columns.tolist())
     #print(SamplesDF_cols)
 
-    # Getting Histrogram DataFrame: index: IDs, Columns: eg: [B1_1,B2_1,.....BN_1]
     if keep_hist:
-        HistrogramDF = getHistDataframe(UpdatedSeries, Bins , IDX)
         HistrogramDF_cols = natsort.natsorted(HistrogramDF.columns.tolist())
         HistrogramDF = HistrogramDF[HistrogramDF_cols]
         #print(HistrogramDF_cols)
@@ -204,10 +304,8 @@ def mergeDataFrames(DFs_list, Bins, Outliers, keep_hist, IDX):
     else: ColsList = LIMIT_cols + STATS_cols + SAMPLES_cols
     FinalDF = FinalDF[ColsList]
     #print(FinalDF.columns.tolist())
-    #print(IDs_DF.columns.tolist())
-    #print(Settings_DF.columns.tolist())
 
-    return FinalDF, IDs_DF, Settings_DF
+    return FinalDF
 
 
 
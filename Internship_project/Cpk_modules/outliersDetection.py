@@ -1,95 +1,223 @@
 """
 @file outliersDetection.py
 This module defines function that uses generalized ESD algorithm to detect outliers.
+The test is run for a batch of IDs at once on sorted sample arrays, the mean and variance are updated
+incrementally each time an extreme value is removed. It gives the same result as pyasl.generalizedESD().
 
 """
 
 from __future__ import print_function, division
 import numpy as np
 import pandas as pd
-from PyAstronomy import pyasl
+from scipy.stats import t as student_t
 
+# Significance of the generalized ESD test.
+ALPHA = 0.05
 
+# Maximum number of cells (IDs x outliers) handled in one batch.
+BATCH_CELLS = 1 << 20
 
-def getOutliersDataframe(Series, Default_limitsDict, Outliers_percentage, IDX):
+# Relative difference of the deviations of both ends below which the step is recomputed with masked arrays.
+TIE_TOLERANCE = 1e-6
+
+def getCriticalValues(n, i, alpha):
+    """
+    This function returns the critical values (lambda) of step i of the generalized ESD test.
+    @param n array of number of samples per ID.
+    @param i step, number of values already removed.
+    @param alpha significance.
+    @return array of critical values, nan if there are not enough samples left.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = 1.0 - alpha / (2.0 * (n - i))
+        perPoint = student_t.ppf(p, n - i - 2)
+        return (n - i - 1) * perPoint / np.sqrt((n - i - 2 + perPoint**2) * (n - i))
+
+def getMaskedDeviations(ARR, removedPositions, loValue, hiValue):
+    """
+    This function computes the deviations of both ends as pyasl.generalizedESD() does, with a masked array.
+    It is used when both ends are almost equally far from the mean, so rounding decides which value is removed.
+    @param ARR array of samples of one ID.
+    @param removedPositions positions of the values already removed.
+    @param loValue, hiValue lowest and highest remaining values.
+    @return tuple of deviations (low end, high end).
+    """
+    xm = np.ma.array(ARR)
+    xm[removedPositions] = np.ma.masked
+    xmean = xm.mean()
+    xstd = xm.std()
+    return abs((loValue - xmean) / xstd), abs((hiValue - xmean) / xstd)
+
+def generalizedESD(values, offsets, maxOLs, alpha=ALPHA):
     """
-    This function iterates over a Series. Each value is an array of sample values.
-    The array is passed to algorithm to detect outliers and new Upper and lower limits are evaluated is any.
+    This function runs the generalized ESD test for a batch of IDs.
+    The samples of each ID are sorted, so the most extreme remaining value is always at one of the two ends of the
+    window [lo, hi). If both ends are equally far from the mean, the value that comes first in the original array is
+    removed, as np.argmax() does in pyasl.generalizedESD().
+
+    @param values array of samples of all IDs, the samples of an ID are contiguous and without nan values.
+    @param offsets array of start positions of the IDs in values, with len(values) appended.
+    @param maxOLs array of maximum number of outliers per ID (>= 1).
+    @param alpha significance.
+    @return tuple (numOutliers, removed, minPassed, maxPassed) where removed is an array (IDs x max(maxOLs)) of the
+            removed values in the order of removal and minPassed/maxPassed are the limits of the values which are
+            not outliers.
+    """
+    nIDs = len(offsets) - 1
+    starts = offsets[:-1]
+    n = np.diff(offsets)
+    ids = np.repeat(np.arange(nIDs), n)
+
+    # Sorting the samples of each ID, equal values keep their original order.
+    order = np.lexsort((values, ids))
+    sortedValues = values[order]
+    position = order - starts[ids]     # position of each sorted value in the original array of its ID
+
+    # Runs of equal values: first and last+1 position of the run of each sorted value.
+    newRun = np.ones(len(values), dtype=bool)
+    newRun[1:] = (sortedValues[1:] != sortedValues[:-1]) | (ids[1:] != ids[:-1])
+    runIndex = np.cumsum(newRun) - 1
+    runStarts = np.flatnonzero(newRun)
+    runEnds = np.append(runStarts[1:], len(values))
+    runStart = runStarts[runIndex]
+    runEnd = runEnds[runIndex]
+
+    maxSteps = int(maxOLs.max()) if nIDs > 0 else 0
+    removed = np.full((nIDs, maxSteps), np.nan)
+    removedPositions = np.zeros((nIDs, maxSteps), dtype=np.int64)
+    outlierStep = np.full(nIDs, -1)
+    loHist = np.empty((nIDs, maxSteps + 1), dtype=np.int64)
+    hiHist = np.empty((nIDs, maxSteps + 1), dtype=np.int64)
+
+    lo = starts.copy()
+    hi = offsets[1:].copy()
+    count = n.astype(float)
+    total = np.add.reduceat(values, starts)
+    mean = total / count
+    M2 = np.add.reduceat((values - mean[ids])**2, starts)
+
+    for i in range(maxSteps):
+        loHist[:, i] = lo
+        hiHist[:, i] = hi
+        active = i < maxOLs
+
+        loValue = sortedValues[lo]
+        hiValue = sortedValues[hi - 1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(M2 / count)
+            rLo = np.abs((loValue - mean) / std)
+            rHi = np.abs((hiValue - mean) / std)
+
+        # First occurrence of the end values among the remaining samples. The values of a run are removed in their
+        # original order, so the first remaining one of the high end run is (runEnd - hi) places after runStart.
+        firstLo = position[lo]
+        firstHi = position[runStart[hi - 1] + runEnd[hi - 1] - hi]
+
+        with np.errstate(invalid='ignore'):
+            nearTie = active & (loValue != hiValue) & (np.abs(rHi - rLo) <= TIE_TOLERANCE * np.maximum(rHi, rLo))
+        for k in np.flatnonzero(nearTie):
+            ARR = values[starts[k]:offsets[k + 1]]
+            rLo[k], rHi[k] = getMaskedDeviations(ARR, removedPositions[k, :i], loValue[k], hiValue[k])
+
+        takeHi = (rHi > rLo) | ((rHi == rLo) & (firstHi < firstLo))
+
+        R = np.where(takeHi, rHi, rLo)
+        # If all remaining values are equal the deviation is undefined, no more outliers can be found.
+        R[loValue == hiValue] = -np.inf
+        Lambda = getCriticalValues(n, i, alpha)
+        with np.errstate(invalid='ignore'):
+            outlierStep[active & (R > Lambda)] = i
+
+        x = np.where(takeHi, hiValue, loValue)
+        removed[:, i] = np.where(active, x, np.nan)
+        removedPositions[:, i] = np.where(takeHi, firstHi, firstLo)
+
+        # Removing x from the window and updating mean and variance (Welford).
+        move = active & (loValue != hiValue)
+        hi = np.where(move & takeHi, hi - 1, hi)
+        lo = np.where(move & ~takeHi, lo + 1, lo)
+        count = np.where(move, count - 1, count)
+        total = np.where(move, total - x, total)
+        newMean = total / count
+        M2 = np.where(move, np.maximum(M2 - (x - mean) * (x - newMean), 0.0), M2)
+        mean = newMean
+
+    loHist[:, maxSteps] = lo
+    hiHist[:, maxSteps] = hi
+
+    numOutliers = outlierStep + 1
+    rows = np.arange(nIDs)
+    minPassed = sortedValues[loHist[rows, numOutliers]]
+    maxPassed = sortedValues[hiHist[rows, numOutliers] - 1]
+    return numOutliers, removed, minPassed, maxPassed
+
+def getNewLimits(numOutliers, removed, minPassed, maxPassed, Lowerlimit, Upperlimit):
+    """
+    This function evaluates the new limits from the outliers:
+    the first outlier below the passed values is the new lower limit if it is above the default lower limit and
+    the first outlier above the passed values is the new upper limit if it is below the default upper limit.
+    @return arrays L, U
+    """
+    isOutlier = np.arange(removed.shape[1]) < numOutliers[:, None]
+    with np.errstate(invalid='ignore'):
+        below = isOutlier & (removed < minPassed[:, None])
+        above = isOutlier & (removed > maxPassed[:, None])
+        OL = np.where(below, removed, -np.inf).max(axis=1)    # First Outlier to the left of values_passed.
+        OU = np.where(above, removed, np.inf).min(axis=1)     # First Outlier to the right of values_passed.
+        L = np.where(below.any(axis=1) & (OL > Lowerlimit), OL, Lowerlimit)
+        U = np.where(above.any(axis=1) & (OU < Upperlimit), OU, Upperlimit)
+    return L, U
+
+def getOutliersDataframe(Samples, Default_limitsDict, Outliers_percentage, IDX):
+    """
+    This function runs the outliers detection for the samples of each ID.
+    The samples are passed to algorithm to detect outliers and new Upper and lower limits are evaluated is any.
     Finally converts the new limit values to a Dataframe.
 
-    @param Series pandas series object.
+    @param Samples RaggedSamples object.
     @param Default_limitsDict Dictionary object.
     @param Outliers_percentage  to calculate maximum no of outliers to detect.
     @param IDX group number.
-    @return Dataframe and Series without nan values.
+    @return Dataframe and RaggedSamples without nan values.
     """
-    OutliersDict = {}
     U1 = 'U1_'+IDX
     L1 = 'L1_'+IDX
     U2 = 'U2_'+IDX
     L2 = 'L2_'+IDX
 
-    for ID, ARR in Series.items():
-
-        Upperlimit = Default_limitsDict[ID][U1]
-        Lowerlimit = Default_limitsDict[ID][L1]
-
-        # Removing all nan values from the array
-        ARR = ARR[np.logical_not(np.isnan(ARR))]
-        Series[ID] = ARR[:]
-        maxOLs = int(len(ARR) * Outliers_percentage/100)           # Maximum Outliers
-        # Case 1 : If the standard deviation > 0.0 then use the algorithm to find outliers.
-        if len(set(ARR)) > 1 and len(ARR) > maxOLs:
-            # pyasl.generalizedESD will return a tuple of length  2 as eg:  r = (r[0],r[1])
-            # r[0] --> Number of outliers
-            # r[1] --> Indices of outliers
-            if maxOLs < 1:
-                maxOLs = 2
-
-            r = pyasl.generalizedESD(ARR, maxOLs, 0.05)
-
-            NumOutliers = r[0]
-            # Case 1(a) : If there is any outlier then find new Upper/lower limits
-            if NumOutliers > 0:
-                outliers = [ARR[idx] for idx in r[1]]
-
-                #print('List of Outliers', outliers )
-                #print("   R(G_value)    Lambda(G_critical)")
-                #for i in range(len(r[2])):
-                #print("%2d  %8.5f  %8.5f" % ((i+1), r[2][i], r[3][i]))
-
-                values_passed  = np.array([x for idx, x in enumerate(ARR) if idx not in r[1]])
-
-                outliers_below_values_passed = [x for x in outliers if x < min(values_passed)]
-
-                outliers_above_values_passed = [x for x in outliers if x > max(values_passed)]
-
-                # if there is any outlier to the left of values_passed:
-                if len(outliers_below_values_passed) > 0:
-                    OL = max(outliers_below_values_passed) # First Outlier to the left of values_passed.
-                    if OL > Lowerlimit: L = OL
-                    else: L = Lowerlimit
-
-                else: L = Lowerlimit
-
-                # if there is any outlier to the right of data points
-                if len(outliers_above_values_passed) > 0:
-                    OU = min(outliers_above_values_passed)  # First Outlier to the right of values_passed.
-                    if OU < Upperlimit: U = OU
-                    else: U = Upperlimit
-
-                else: U = Upperlimit
-
-
-            else:
-                L = Lowerlimit
-                U = Upperlimit
-        else:
-            L = Lowerlimit
-            U = Upperlimit
-
-        OutliersDict[ID] = {L2: L, U2: U}
-
-    OutliersDF  = pd.DataFrame.from_dict(OutliersDict, orient='index')
-    OutliersDF = OutliersDF[[L2,U2]]   # ---> rearranging OutliersDF columns
-    return OutliersDF, Series
+    IDs = Samples.index
+    Upperlimit = np.array([Default_limitsDict[ID][U1] for ID in IDs], dtype=float)
+    Lowerlimit = np.array([Default_limitsDict[ID][L1] for ID in IDs], dtype=float)
+
+    # Removing all nan values from the samples
+    Samples = Samples.dropna()
+
+    lengths = Samples.lengths()
+    maxOLs = (lengths * Outliers_percentage / 100).astype(np.int64)           # Maximum Outliers
+
+    # Case 1 : If the standard deviation > 0.0 then use the algorithm to find outliers.
+    distinct = np.zeros(len(Samples), dtype=bool)
+    nonEmpty = np.flatnonzero(lengths > 0)
+    if len(nonEmpty):
+        starts = Samples.offsets[nonEmpty]
+        distinct[nonEmpty] = np.minimum.reduceat(Samples.values, starts) != np.maximum.reduceat(Samples.values, starts)
+    selected = np.flatnonzero(distinct & (lengths > maxOLs))
+    maxOLs[maxOLs < 1] = 2
+
+    L = Lowerlimit.copy()
+    U = Upperlimit.copy()
+
+    # IDs are processed in batches of similar maxOLs.
+    selected = selected[np.argsort(maxOLs[selected], kind='stable')]
+    start = 0
+    while start < len(selected):
+        stop = start + max(1, BATCH_CELLS // max(int(maxOLs[selected[start]]), 1))
+        batch = selected[start:stop]
+        start += len(batch)
+
+        Batch = Samples.take(batch)
+        numOutliers, removed, minPassed, maxPassed = generalizedESD(Batch.values, Batch.offsets, maxOLs[batch])
+        L[batch], U[batch] = getNewLimits(numOutliers, removed, minPassed, maxPassed, Lowerlimit[batch], Upperlimit[batch])
+
+    OutliersDF = pd.DataFrame({L2: L, U2: U}, index=IDs, columns=[L2, U2])   # ---> rearranging OutliersDF columns
+    return OutliersDF, Samples
@@ -0,0 +1,100 @@
+"""
+@file parallelParse.py
+This module defines functions to parse logfiles concurrently in a pool of worker processes.
+The parent process keeps the order of the files, so the DataFrames come back in the same order as the file list.
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from .getDataframe import getDataFrame
+
+# Number of files handed to a worker process at once.
+CHUNKSIZE = 4
+
+def getExecutor(workers):
+    """
+    This function creates a pool of worker processes to parse logfiles.
+    @param workers number of worker processes specified in configuration file.
+    @return ProcessPoolExecutor object, or None if only one worker is requested.
+    """
+    if workers <= 1:
+        return None
+    # main.py is a plain script without a __main__ guard, 'fork' keeps the workers from executing it again.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+
+def iterDataFrames(filesList, executor=None, parser=getDataFrame):
+    """
+    This function parses the logfiles and yields the results in the order of filesList.
+    If executor is None the files are parsed one by one in the calling process.
+    @param filesList list of logfile paths.
+    @param executor ProcessPoolExecutor object returned by getExecutor().
+    @param parser function that takes a logfile path and returns a DataFrame eg: DataFrameCache.getDataFrame
+    @return generator of tuples (filepath, DataFrame)
+    """
+    if executor is None:
+        results = map(parser, filesList)
+    else:
+        # executor.map() returns the results in the order of the input list.
+        results = executor.map(parser, filesList, chunksize=CHUNKSIZE)
+
+    for file, DataFrame in zip(filesList, results):
+        yield file, DataFrame
+
+def submitFilenames(fileEvents, executor, parser=getDataFrame, budget=None):
+    """
+    This function submits each logfile to the executor as soon as it is discovered, so the directory walk and
+    the parsing overlap. The results are regrouped per testName and group in the order of discovery.
+    A logfile selected by several groups is submitted once, its groups share the Future.
+    The parsed DataFrames are kept until their testName is processed, so the logfiles are submitted only until their
+    total size reaches budget. The next logfiles get no Future, they are parsed with their group by iterFutures().
+    @param fileEvents generator of tuples (testName, group, filepath) eg: iterFilenames()
+    @param executor ProcessPoolExecutor or ThreadPoolExecutor object.
+    @param parser function that takes a logfile path and returns a DataFrame.
+    @param budget total size in bytes of the logfiles submitted during the discovery, None for no limit.
+    @return testNames_dict {testName: {group: [(filepath, Future or None), ...]}} and number of files
+    """
+    testNames_dict = {}
+    filesCount = 0
+    futures = {}
+    submitted = 0
+
+    for testName, group, filepath in fileEvents:
+        future = futures.get(filepath)
+        if future is None and (budget is None or submitted < budget):
+            future = futures[filepath] = executor.submit(parser, filepath)
+            if budget is not None:
+                try:
+                    submitted += os.path.getsize(filepath)
+                except OSError:
+                    pass
+        testNames_dict.setdefault(testName, {}).setdefault(group, []).append((filepath, future))
+        filesCount += 1
+
+    return testNames_dict, filesCount
+
+def iterFutures(filesList, executor=None, parser=getDataFrame, skip=None):
+    """
+    This function yields the parsed DataFrames of a list returned by submitFilenames() in the order of the list.
+    The logfiles without Future are submitted to the executor first, or parsed one by one if executor is None.
+    @param filesList list of tuples (filepath, Future or None)
+    @param executor ProcessPoolExecutor or ThreadPoolExecutor object.
+    @param parser function that takes a logfile path and returns a DataFrame.
+    @param skip list of booleans, True for the logfiles which are not parsed, their DataFrame is None.
+    @return generator of tuples (filepath, DataFrame)
+    """
+    if skip is None:
+        skip = [False]*len(filesList)
+    if executor is not None:
+        for idx, (file, future) in enumerate(filesList):
+            if future is None and not skip[idx]:
+                filesList[idx] = (file, executor.submit(parser, file))
+
+    for idx, (file, future) in enumerate(filesList):
+        if skip[idx]:
+            DataFrame = None
+        else:
+            DataFrame = parser(file) if future is None else future.result()
+        # Releasing the Future, so the DataFrame is only kept by the caller.
+        filesList[idx] = (file, None)
+        yield file, DataFrame
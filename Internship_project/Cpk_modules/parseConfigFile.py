@@ -33,6 +33,70 @@ class ConfigFile():
     def exclude_files(self):
         return self.cfg['EXCLUDE_FILES']
 
+    def workers(self):
+        return self.cfg.get('WORKERS', 1)
+
+    def testname_workers(self):
+        return self.cfg.get('TESTNAME_WORKERS', 1)
+
+    def walk_threads(self):
+        return self.cfg.get('WALK_THREADS', 8)
+
+    def streaming(self):
+        return self.cfg.get('STREAMING', False)
+
+    def streaming_budget(self):
+        return self.cfg.get('STREAMING_BUDGET_MB', 512)
+
+    def metrics(self):
+        metrics = self.cfg.get('METRICS', {})
+        return metrics.get('Report', True), metrics.get('SlowestFiles', 10)
+
+    def output_formats(self):
+        return self.cfg.get('OUTPUT_FORMATS', ['xlsx'])
+
+    def samples_float32(self):
+        return self.cfg.get('SAMPLES_FLOAT32', False)
+
+    def constant_memory(self):
+        return self.cfg.get('CONSTANT_MEMORY', False)
+
+    def stats_output(self):
+        return self.cfg.get('STATS_OUTPUT', 'formulas')
+
+    def spill_merge(self):
+        spill = self.cfg.get('SPILL_MERGE', {})
+        return spill.get('Enable', False), spill.get('Dir', ''), spill.get('MemoryMB', 1024)
+
+    def incremental(self):
+        incremental = self.cfg.get('INCREMENTAL', {})
+        return incremental.get('Enable', False), incremental.get('Dir', '')
+
+    def hw_index(self):
+        hw = self.cfg.get('HW_INDEX', {})
+        return hw.get('Enable', False), hw.get('File', ''), hw.get('SliceBy', 'HighLevelSerialNumber')
+
+    def manifest(self):
+        manifest = self.cfg.get('MANIFEST', {})
+        return manifest.get('Enable', False), manifest.get('File', '')
+
+    def dedup(self):
+        dedup = self.cfg.get('DEDUP', {})
+        return dedup.get('Enable', False), dedup.get('BlockKB', 64)
+
+    def measurement_store(self):
+        store = self.cfg.get('MEASUREMENT_STORE', {})
+        return store.get('Enable', False), store.get('File', '')
+
+    def watch(self):
+        watch = self.cfg.get('WATCH', {})
+        return (watch.get('Enable', False), watch.get('IntervalS', 300), watch.get('HotHours', 48),
+                watch.get('SettleS', 60))
+
+    def cache(self):
+        cache = self.cfg.get('CACHE', {})
+        return cache.get('Enable', True), cache.get('Dir', ''), cache.get('MaxSizeMB', 2048)
+
     def rootDir(self):
         paths_list = [group['Path'] for group in self.cfg['GROUPS']]
         return paths_list
@@ -49,6 +113,8 @@ class ConfigFile():
             idx += 1
             for k in 'VARIANT HW TASK TRANSITION TEST YEAR MONTH'.split():
                 obj[key][k] = groupDict[k]
+            if 'SESSION_DAYS' in groupDict:
+                obj[key]['SESSION_DAYS'] = groupDict['SESSION_DAYS']
         return obj
 
 # Load config.json file into python dict object
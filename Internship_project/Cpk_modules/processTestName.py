@@ -0,0 +1,301 @@
+"""
+@file processTestName.py
+This module defines the functions that turn the logfiles of a testName into the final DataFrame of its worksheet:
+the logfiles of each group are parsed and merged, the merged DataFrames of the groups are combined with the ids and
+settings columns.
+
+Each testName is independent until its worksheet is written, so whole testNames can be processed in worker processes
+(TESTNAME_WORKERS). The largest testNames are submitted first, the results are returned in the order of the
+testNames dictionary so the worksheets are always written in the same order.
+"""
+
+from collections import deque
+import pandas as pd
+from .getDataframe import setSamplesFloat32
+from .parallelParse import iterDataFrames, iterFutures
+from .mergeDataframes import mergeDataFrames
+from .spillMerge import SpillMerge, getInputSize
+from .getStatistics import getStatistics
+from .hwIndex import getHwStatistics
+from .incrementalState import getFileStat
+from .runMetrics import RunMetrics, getStage
+
+DEBUG = False
+
+def processTestName(testName, groupsDict, options, parser, metrics, executor=None, streaming=False, progress=None):
+    """
+    This function parses and merges the logfiles of a testName.
+    @param testName testName eg: Centipede.Awg.Driver.Verification.Regular.Gain.Check
+    @param groupsDict dictionary {group: list of logfile paths}, or lists of (filepath, Future) in streaming mode.
+    @param options dictionary {'bins', 'outliers', 'keep_hist', 'keep_settings', 'float32', 'spill', 'spill_dir',
+                               'spill_memory', 'statistics', 'state', 'fingerprints', 'hw_index', 'hw_key', 'store'} from
+                   the configuration file. 'state' is an IncrementalState object or None, 'fingerprints' is
+                   {group: fingerprint}, 'hw_index' is a HwIndex object or None, 'store' is None or a function called
+                   as store(list of (testName, group), filepath, DataFrame, MetaData) for each parsed logfile, eg:
+                   MeasurementStore.addParsed, the parser then returns the MetaData, see TimedParser.
+    @param parser TimedParser object.
+    @param metrics RunMetrics object, it records the parse time of each logfile and the stages.
+    @param executor ProcessPoolExecutor object to parse the logfiles, or None to parse them one by one.
+    @param streaming True if groupsDict holds the Futures returned by submitFilenames().
+    @param progress function called as progress(1, filename) after each logfile.
+    @return tuple (FinalDF, number of groups, StatsDF, HwDF). FinalDF is None if no logfile has data, StatsDF is None
+            if options['statistics'] is False. HwDF is the Cpk of each ID per hardware of each group, see
+            getHwStatistics(), None if options['hw_index'] is None.
+    """
+    """
+    testNames_dict:
+        {'testname1': {group1: [filepath1, filepath2, filepath3, filepath4], --->mergedDF1 --> finalMergedDF for excel worksheet
+                       group2: [filepath1, filepath2, filepath3]             --->mergedDF2 -->
+                       },
+
+         'testname2': {group1: [filepath1, filepath2, filepath3, filepath4], --->mergedDF1 --> finalMergedDF for excel worksheet
+                       group2: [filepath1, filepath2]                        --->mergedDF2 -->
+                       }
+        }
+    """
+
+    Number_of_groups = len(groupsDict)
+    mergedDF_lst = []
+    IDs_Settings_DFs = []
+    Index = options.get('hw_index')
+    HwDFs = []
+
+    # In INCREMENTAL mode the DataFrames of the logfiles parsed in the previous runs are read from the state, only
+    # the new and changed logfiles are parsed.
+    State = options.get('state')
+    storedGroups = {}
+    if State is not None:
+        with metrics.stage('state load'):
+            storedGroups = State.load(testName)
+    newGroups = {}
+    changed = False
+
+    # The logfiles selected by several groups are parsed once, their DataFrames are kept until their last group.
+    fileGroups = {}     # {filepath: list of groups}
+    for group, filesList in groupsDict.items():
+        for file in filesList:
+            groups = fileGroups.setdefault(file if isinstance(file, str) else file[0], [])
+            if group not in groups:
+                groups.append(group)
+    remaining = {file: len(groups) for file, groups in fileGroups.items() if len(groups) > 1}
+    shared = {}
+    store = options.get('store')
+
+    idx = 0  # Number of groups to compare
+    for group, filesList in groupsDict.items():
+        # In SPILL_MERGE mode the DataFrames are written to disk by a SpillMerge object instead of kept in a list.
+        if options['spill']:
+            DFs_list = SpillMerge(options['spill_dir'], options['spill_memory'], getInputSize(filesList))
+        else:
+            DFs_list = []
+        try:
+            # Logfile path of each DataFrame of DFs_list.
+            DFs_files = []
+
+            if State is not None:
+                stored = storedGroups.get(group)
+                if stored is None or stored['fingerprint'] != options['fingerprints'][group]:
+                    stored = {'fingerprint': options['fingerprints'][group], 'files': {}, 'stats': {}}
+                    changed = True
+                # DataFrame of each logfile, None if it has no data. The logfiles of the state which are not found
+                # anymore are kept first, then the logfiles in the order of discovery as in a run without state.
+                parsedFiles = stored['files']
+                currentFiles = set(filesList)
+                orderedFiles = [file for file in parsedFiles if file not in currentFiles] + list(filesList)
+                # The new logfiles and the logfiles whose size or modification time changed since they were parsed.
+                fileStats = stored['stats']
+                currentStats = {file: getFileStat(file) for file in filesList}
+                newFiles = [file for file in filesList
+                            if file not in parsedFiles or fileStats.get(file) != currentStats[file]]
+                for file in newFiles:
+                    parsedFiles[file] = None
+                    fileStats[file] = currentStats[file]
+                    changed = True
+                if progress is not None and len(newFiles) < len(filesList):
+                    progress(len(filesList) - len(newFiles), testName)
+                filesList = newFiles
+
+            # Reading logfiles and parsing and manipulating data as DataFrames: ----------> processing files in Executor
+            # In streaming mode filesList holds (filepath, Future) tuples submitted during step 2, the Future is None
+            # for the logfiles discovered after the STREAMING_BUDGET_MB.
+            # The DataFrames parsed for a previous group are reused.
+            paths = [file[0] for file in filesList] if streaming else filesList
+            reused = [file in shared for file in paths]
+            if streaming:
+                results = iterFutures(filesList, executor, parser, skip=reused)
+            else:
+                parsed = iterDataFrames([file for file, reuse in zip(filesList, reused) if not reuse], executor, parser)
+                results = ((file, None) if reuse else next(parsed) for file, reuse in zip(filesList, reused))
+
+            for (file, result), reuse in zip(results, reused):
+                if reuse:
+                    result = shared[file]
+                else:
+                    metrics.recordParse(file, result)
+                    # The measurement rows are written once for all groups of the logfile, before the float32
+                    # conversion.
+                    if store is not None:
+                        with metrics.stage('store ingest', items=1):
+                            store([(testName, g) for g in fileGroups[file]], file, result[0], result[3])
+                if file in remaining:
+                    shared[file] = result
+                TestData_df = result[0]
+                if DEBUG: print(file)
+                # Updating the progress bar
+                if progress is not None:
+                    progress(1, file.split('/')[-1])
+
+                # Append DataFrames in DF_list.
+                # if TestData_df is not empty append TestData_df to DFs_list else skip
+                if DEBUG: print(testName, '\n', 'Number of Datafames in DFs_list: ', len(DFs_list), '\n')
+                if not TestData_df.empty:
+                    if options['float32']: TestData_df = setSamplesFloat32(TestData_df)
+                    if State is not None:
+                        parsedFiles[file] = TestData_df
+                        changed = True
+                    elif options['spill']:
+                        with metrics.stage('spill'):
+                            DFs_list.add(TestData_df)
+                    else:
+                        DFs_list.append(TestData_df)
+                        DFs_files.append(file)
+
+            for file in set(paths):
+                if file in remaining:
+                    remaining[file] -= 1
+                    if remaining[file] == 0:
+                        shared.pop(file, None)
+
+            # The new state of the group, its DataFrames are merged in the order of orderedFiles.
+            if State is not None:
+                newGroups[group] = {'fingerprint': stored['fingerprint'],
+                                    'files': {file: parsedFiles[file] for file in orderedFiles},
+                                    'stats': {file: fileStats.get(file) for file in orderedFiles}}
+                DFs_files = [file for file in orderedFiles if parsedFiles[file] is not None]
+                DFs_list = [parsedFiles[file] for file in DFs_files]
+
+            # Concate/mergeing Dataframes and perform transformation
+            # Check if DFs_list is not empty
+            if len(DFs_list) != 0:
+                idx += 1
+                # Cpk of each ID per hardware, the hardware records are joined to the rows by logfile and 'HwIds'.
+                if Index is not None:
+                    with metrics.stage('hw statistics'):
+                        HwDF = getHwStatistics(DFs_list, DFs_files, Index, options['hw_key'])
+                    HwDF.insert(0, 'Group', idx)
+                    HwDFs.append(HwDF)
+                with metrics.stage('merge', items=len(DFs_list)):
+                    if options['spill']:
+                        mergedDF, IdsDF, settingDF = DFs_list.merge(options['bins'], options['outliers'],
+                                                                    options['keep_hist'], IDX = str(idx),
+                                                                    metrics=metrics)
+                    else:
+                        mergedDF, IdsDF, settingDF = mergeDataFrames(DFs_list, options['bins'], options['outliers'],
+                                                                     options['keep_hist'], IDX = str(idx),
+                                                                     metrics=metrics)
+                mergedDF_lst.append(mergedDF)
+
+                # IdsDF and settingDF is set common for specific test name group(Worksheet)
+                if len(IDs_Settings_DFs) == 0:
+                    # STATS_0 columns appear in Output file if there are atleast two groups in Config file.
+                    if Number_of_groups > 1:
+                        # Add empty STATS_0 columns
+                        STATS_0 = ['STATS_0', 'Mean_A', 'Mean_R', 'Stdev_R', 'Cpk_R']
+                        for col in STATS_0: IdsDF[col] = ''
+
+                    # Appending IdsDF, settingsDF in to IDs_Settings_DFs list
+                    IDs_Settings_DFs.append(IdsDF)
+                    # If keep_settings is True, settings columns will appear in final excel output
+                    if options['keep_settings']:
+                        IDs_Settings_DFs.append(settingDF)
+        finally:
+            # The spill directory is deleted after the merge, for a group without DataFrames and when a logfile or
+            # the merge raises.
+            if options['spill']:
+                DFs_list.close()
+
+    if State is not None and changed:
+        with metrics.stage('state store'):
+            State.store(testName, newGroups)
+
+    # Concatenate Dataframes from mergedDF_lst to get finalDF,
+    if len(mergedDF_lst) == 0:
+        return None, 0, None, None
+
+    finalDF = pd.concat(mergedDF_lst, axis=1, join='inner')
+
+    # Concatenating IDs + finalDF + Settings in to FinalDF for Excel workbook.
+    if options['keep_settings']:
+        FinalDF = pd.concat([IDs_Settings_DFs[0], finalDF, IDs_Settings_DFs[1]], axis=1, join='inner')
+    else:
+        FinalDF = pd.concat([IDs_Settings_DFs[0], finalDF], axis=1, join='inner')
+
+    FinalDF.reset_index(inplace=True)
+    FinalDF.fillna('', inplace=True)
+
+    # Computing the statistic columns, they are written as table data in 'values' mode and exported.
+    StatsDF = None
+    if options['statistics']:
+        with metrics.stage('statistics', items=len(FinalDF)):
+            StatsDF = getStatistics(FinalDF, idx)
+
+    HwDF = pd.concat(HwDFs, ignore_index=True) if HwDFs else None
+
+    return FinalDF, idx, StatsDF, HwDF
+
+def processTestNameTask(testName, groupsDict, options, parser):
+    """
+    This function runs processTestName() in a worker process, the logfiles are parsed one by one.
+    @return tuple (FinalDF, number of groups, StatsDF, HwDF, RunMetrics object of the worker)
+    """
+    metrics = RunMetrics()
+    FinalDF, groups, StatsDF, HwDF = processTestName(testName, groupsDict, options, parser, metrics)
+    return FinalDF, groups, StatsDF, HwDF, metrics
+
+def iterTestNames(testNames_dict, executor, options, parser, metrics, progress=None, inflight=None):
+    """
+    This function processes the testNames in worker processes and yields the results in the order of testNames_dict.
+    The testNames are submitted by decreasing size of their logfiles, so the largest testName starts first and
+    doesn't end last. The results are kept until they are yielded, so at most inflight testNames are submitted and not
+    yet yielded, the next testName to yield is always submitted.
+    @param testNames_dict dictionary {testName: {group: list of logfile paths}}
+    @param executor ProcessPoolExecutor object returned by getExecutor().
+    @param options dictionary of options, see processTestName().
+    @param parser TimedParser object.
+    @param metrics RunMetrics object, the metrics of the workers are added to it.
+    @param progress function called as progress(number of logfiles, testName) after each testName.
+    @param inflight maximum number of testNames submitted and not yet yielded eg: TESTNAME_WORKERS + 2, None for all.
+    @return generator of tuples (testName, (FinalDF, number of groups, StatsDF, HwDF))
+    """
+    sizes = {testName: sum(getInputSize(filesList) for filesList in groupsDict.values())
+             for testName, groupsDict in testNames_dict.items()}
+    queue = deque(sorted(testNames_dict, key=lambda testName: -sizes[testName]))
+    if inflight is None:
+        inflight = len(queue)
+    futures = {}
+    submitted = set()
+
+    def submit(testName):
+        groupsDict = testNames_dict[testName]
+        # Only the hardware records of the logfiles of the testName are sent to its worker.
+        taskOptions = options
+        if options.get('hw_index') is not None:
+            taskOptions = dict(options, hw_index=options['hw_index'].subset(
+                [file for filesList in groupsDict.values() for file in filesList]))
+        futures[testName] = executor.submit(processTestNameTask, testName, groupsDict, taskOptions, parser)
+        submitted.add(testName)
+
+    for testName, groupsDict in testNames_dict.items():
+        if testName not in submitted:
+            submit(testName)
+        # The largest testNames which are not submitted yet fill the free places.
+        while queue and len(futures) < inflight:
+            largest = queue.popleft()
+            if largest not in submitted:
+                submit(largest)
+        with getStage(metrics, 'wait workers'):
+            FinalDF, groups, StatsDF, HwDF, workerMetrics = futures.pop(testName).result()
+        metrics.merge(workerMetrics)
+        if progress is not None:
+            progress(sum(len(filesList) for filesList in groupsDict.values()), testName)
+        yield testName, (FinalDF, groups, StatsDF, HwDF)
@@ -18,6 +18,12 @@ def Bar(i=0, total=1, text= '', size= 10):
     @param size it is the size of bar. The default value is 50 characters.
     @return progress bar
     """
+    # If the total is unknown, only the counter is printed.
+    if total is None:
+        sys.stdout.write("\r" + str(i).rjust(8, ' ') + ' files ' + text.ljust(135))
+        sys.stdout.flush()
+        return
+
     percent = float(i) / float(total)
     sys.stdout.write( "\r" + str(int(percent*100)).rjust(3, ' ') +"%"  +' [' + '='*math.ceil(percent*size) +' '  *math.floor((1-percent)*size)+']'  + ' 100%' + ' ' + text.ljust(135))
     sys.stdout.flush()
@@ -0,0 +1,135 @@
+"""
+@file raggedSamples.py
+This module defines the RaggedSamples class, the samples of all IDs of a group in one array.
+The samples of an ID are contiguous and keep the order of the logfiles, the IDs are sorted. The start of the samples
+of each ID is stored in an offsets array, so no Python object is created per ID or per sample.
+
+    index   = ['ID_a', 'ID_b', 'ID_c']
+    values  = [a0, a1, a2, b0, c0, c1]
+    offsets = [0, 3, 4, 6]                ---> samples of ID_b = values[offsets[1]:offsets[2]]
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class RaggedSamples(object):
+
+    def __init__(self, index, values, offsets):
+        """
+        @param index pd.Index of IDs.
+        @param values array of samples of all IDs.
+        @param offsets array of start positions of the IDs in values, with len(values) appended.
+        """
+        self.index = index
+        self.values = values
+        self.offsets = offsets
+
+    @classmethod
+    def fromGroups(cls, keys, values):
+        """
+        This function groups the values by key, as Series.groupby(keys).apply(np.array) does:
+        the keys are sorted, nan keys are dropped and the values of a key keep their order.
+        @param keys array of IDs, one per value.
+        @param values array of sample values.
+        @return RaggedSamples object
+        """
+        codes, uniques = pd.factorize(keys, sort=True)
+        return cls.fromCodes(codes, uniques, values)
+
+    @classmethod
+    def fromCategorical(cls, keys, values):
+        """
+        This function groups the values by the categories of a Categorical, as fromGroups() does.
+        @param keys Categorical of IDs with sorted categories, one per value. Values with code -1 are dropped.
+        @param values array of sample values.
+        @return RaggedSamples object
+        """
+        return cls.fromCodes(keys.codes, keys.categories, values)
+
+    @classmethod
+    def fromCodes(cls, codes, uniques, values):
+        """
+        @param codes array of positions in uniques, one per value. Values with code -1 are dropped.
+        @param uniques sorted IDs.
+        @param values array of sample values.
+        @return RaggedSamples object
+        """
+        valid = codes >= 0
+        codes = codes[valid]
+        order = np.argsort(codes, kind='mergesort')
+        offsets = np.zeros(len(uniques) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(codes, minlength=len(uniques)))
+        values = np.asarray(values, dtype=float)[valid][order]
+        return cls(pd.Index(uniques), values, offsets)
+
+    @classmethod
+    def fromArrays(cls, index, arrays):
+        """
+        This function builds the samples from one array per ID.
+        @param index list of IDs.
+        @param arrays list of arrays of sample values.
+        @return RaggedSamples object
+        """
+        offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(arr) for arr in arrays])
+        values = np.concatenate(arrays).astype(float) if len(arrays) else np.empty(0)
+        return cls(pd.Index(index), values, offsets)
+
+    def __len__(self):
+        return len(self.index)
+
+    def lengths(self):
+        """ @return array of number of samples per ID """
+        return np.diff(self.offsets)
+
+    def ids(self):
+        """ @return array of the ID position of each value """
+        return np.repeat(np.arange(len(self.index)), self.lengths())
+
+    def getArray(self, i):
+        """ @return array of samples of the ID at position i """
+        return self.values[self.offsets[i]:self.offsets[i+1]]
+
+    def take(self, positions):
+        """
+        This function returns the samples of the IDs at the given positions.
+        @param positions array of ID positions
+        @return RaggedSamples object
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        lengths = self.lengths()[positions]
+        offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(lengths)
+        # Position of each selected value in self.values.
+        gather = np.repeat(self.offsets[positions] - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return RaggedSamples(self.index[positions], self.values[gather], offsets)
+
+    def dropna(self):
+        """
+        This function removes nan values, IDs without samples are kept.
+        @return RaggedSamples object
+        """
+        valid = np.logical_not(np.isnan(self.values))
+        # Number of valid values before each position.
+        validBefore = np.zeros(len(valid) + 1, dtype=np.int64)
+        validBefore[1:] = np.cumsum(valid)
+        return RaggedSamples(self.index, self.values[valid], validBefore[self.offsets])
+
+    def nonEmpty(self):
+        """
+        This function drops the IDs without samples.
+        @return RaggedSamples object
+        """
+        return self.take(np.flatnonzero(self.lengths() > 0))
+
+    def getMatrix(self):
+        """
+        This function returns the samples as a 2D array (IDs x maximum number of samples), padded with nan.
+        """
+        lengths = self.lengths()
+        width = int(lengths.max()) if len(lengths) else 0
+        matrix = np.full((len(self.index), width), np.nan)
+        ids = self.ids()
+        matrix[ids, np.arange(len(self.values)) - self.offsets[ids]] = self.values
+        return matrix
@@ -3,7 +3,17 @@
 This module defines a function to generate a regular expression based on configuration file.
 
 """
+import re
 import sys
+import logging
+from datetime import date, timedelta
+
+# Test session directories are named after the start time of the session, eg: 2018081412h52m35s_bbac6091
+pattern_SessionDir = re.compile('(?P<Year>[0-9]{4})(?P<Month>[0-9]{2})(?P<Day>[0-9]{2})[0-9]{2}h[0-9]{2}m[0-9]{2}s_')
+
+# A session may run past midnight, its logfiles can be time stamped up to SESSION_DAYS days after the directory name.
+# SESSION_DAYS of a group in configuration file, the default covers the sessions of up to a month.
+SESSION_SPAN_DAYS = 31
 
 def Transition_len(Filter, Type):
     try:
@@ -43,6 +53,47 @@ def getRegex(Filter):
     return regex
 
 
+def getDirFilter(Filter):
+    """
+    This function generates a function to skip test session directories during the directory walk.
+    A session directory is skipped if none of the months of the days it can span matches the YEAR and MONTH filters,
+    the span is the SESSION_DAYS of the group. The skipped session directories are logged once.
+    Directories which are not named like a session are never skipped.
+    @param Filter Dictionary object.
+    @return function that takes a directory name and returns True to skip it, or None if there is no YEAR/MONTH filter.
+    """
+    if len(Filter['YEAR']) == 0 and len(Filter['MONTH']) == 0:
+        return None
+
+    Year  = re.compile('[0-9]{4}' if len(Filter['YEAR']) == 0 else '(' + '|'.join(Filter['YEAR']) + ')')
+    Month = re.compile('[0-9]{2}' if len(Filter['MONTH']) == 0 else '(' + '|'.join(Filter['MONTH']) + ')')
+    span = timedelta(days=Filter.get('SESSION_DAYS', SESSION_SPAN_DAYS))
+    logged = set()
+
+    def pruneDir(dirname):
+        m = pattern_SessionDir.match(dirname)
+        if m is None:
+            return False
+        try:
+            start = date(int(m.group('Year')), int(m.group('Month')), int(m.group('Day')))
+        except ValueError:
+            return False
+
+        end = start + span
+        year, month = start.year, start.month
+        while (year, month) <= (end.year, end.month):
+            if Year.fullmatch('%04d' % year) and Month.fullmatch('%02d' % month):
+                return False
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+        if dirname not in logged:
+            logged.add(dirname)
+            logging.info('Session directory skipped by the YEAR/MONTH filters: ' + dirname)
+        return True
+
+    return pruneDir
+
+
 def logfilenames():
     regex = '(?P<Variant>[A-Za-z]+).(?P<HW>[A-Za-z]+).(?P<Task>.+).(?P<Transition>(?P<Type1>(Diagnostic|Calibration|Reference|Verification|Misc)).(?P<Type2>(AtSpeed|Connect|DefaultData|Factory|Init|Regular|Reset|TroubleShooting))).?(?P<Test>(?:[A-Za-z]+)(?:.+)?)?.(?:(?P<Timestamp>(?P<Date>[0-9.]{10}).(?P<Time>[a-z0-9]{9}))).(?P<Undefined>([a-z0-9]+)).log'
     return regex
@@ -0,0 +1,180 @@
+"""
+@file runMetrics.py
+This module defines the RunMetrics class that records the wall time, CPU time and number of items of each processing
+stage (discovery, parse, merge, outliers, histogram, statistics, excel ...) and the parse latency of each logfile.
+The metrics are written as a JSON run report next to the Excel output file.
+
+Stages can be nested, the time of a nested stage is not counted in the enclosing stage. CPU time is the time of the
+thread running the stage, the parse times are measured in the worker processes by TimedParser.
+"""
+
+from __future__ import division
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+from .getDataframe import getLogfileHeader
+
+# CPU time of the calling thread.
+cpuTime = getattr(time, 'thread_time', time.process_time)
+
+# Default number of slowest logfiles in the report.
+SLOWEST_FILES = 10
+
+@contextmanager
+def noStage():
+    yield
+
+def getStage(metrics, name, items=0):
+    """
+    This function returns metrics.stage(name, items), or a context that measures nothing if metrics is None.
+    """
+    if metrics is None:
+        return noStage()
+    return metrics.stage(name, items)
+
+class TimedParser(object):
+    """
+    This class wraps a parser function and measures the wall and CPU time of each call.
+    It can be passed to a ProcessPoolExecutor, the times are returned with the DataFrame.
+    """
+
+    def __init__(self, parser, header=False):
+        """
+        @param parser function that takes a logfile path and returns a DataFrame.
+        @param header if True, the MetaData of the logfile header is read with the DataFrame, see getLogfileHeader().
+        """
+        self.parser = parser
+        self.header = header
+
+    def __call__(self, file):
+        """ @return tuple (DataFrame, wall time, CPU time), with the MetaData dictionary as fourth item if header is True """
+        wall = time.time()
+        cpu = cpuTime()
+        DataFrame = self.parser(file)
+        if self.header:
+            MetaData = getLogfileHeader(file)[0]
+            return DataFrame, time.time() - wall, cpuTime() - cpu, MetaData
+        return DataFrame, time.time() - wall, cpuTime() - cpu
+
+
+class RunMetrics(object):
+
+    def __init__(self, slowest=SLOWEST_FILES):
+        """ @param slowest number of slowest logfiles kept in the report. """
+        self.slowest = slowest
+        self.started = datetime.now()
+        self.startWall = time.time()
+        self.startCpu = time.process_time()
+        self.stages = {}
+        self.order = []
+        self.stack = []
+        self.parseTimes = []
+        self.parseFiles = []
+        self.info = {}
+
+    def getStage(self, name):
+        if name not in self.stages:
+            self.stages[name] = {'wall': 0.0, 'cpu': 0.0, 'items': 0, 'calls': 0}
+            self.order.append(name)
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name, items=0):
+        """
+        This function measures the enclosed code as a stage, eg:
+            with Metrics.stage('merge', items=len(DFs_list)):
+                ...
+        @param name stage name
+        @param items number of items processed
+        """
+        wall = time.time()
+        cpu = cpuTime()
+        # [nested wall time, nested CPU time]
+        self.stack.append([0.0, 0.0])
+        try:
+            yield
+        finally:
+            wall = time.time() - wall
+            cpu = cpuTime() - cpu
+            nestedWall, nestedCpu = self.stack.pop()
+            if self.stack:
+                self.stack[-1][0] += wall
+                self.stack[-1][1] += cpu
+            stage = self.getStage(name)
+            stage['wall'] += wall - nestedWall
+            stage['cpu'] += cpu - nestedCpu
+            stage['items'] += items
+            stage['calls'] += 1
+
+    def addItems(self, name, items):
+        """ This function adds items to a stage, eg: when the number is only known at the end of the stage. """
+        self.getStage(name)['items'] += items
+
+    def recordParse(self, file, result):
+        """
+        This function records the parse time of a logfile.
+        @param file logfile path
+        @param result tuple (DataFrame, wall time, CPU time[, MetaData]) returned by TimedParser.
+        @return DataFrame
+        """
+        DataFrame, wall, cpu = result[:3]
+        stage = self.getStage('parse')
+        stage['wall'] += wall
+        stage['cpu'] += cpu
+        stage['items'] += 1
+        stage['calls'] += 1
+        self.parseTimes.append(wall)
+        self.parseFiles.append(file)
+        return DataFrame
+
+    def merge(self, other):
+        """
+        This function adds the stages and parse times recorded by another RunMetrics object, eg: in a worker process.
+        The times of the stages of several workers are summed.
+        @param other RunMetrics object
+        """
+        for name in other.order:
+            stage = self.getStage(name)
+            for key in ('wall', 'cpu', 'items', 'calls'):
+                stage[key] += other.stages[name][key]
+        self.parseTimes.extend(other.parseTimes)
+        self.parseFiles.extend(other.parseFiles)
+
+    def getReport(self):
+        """
+        This function returns the run report as a dictionary.
+        """
+        stages = []
+        for name in self.order:
+            stage = dict(self.stages[name], name=name)
+            stage['items_per_s'] = stage['items'] / stage['wall'] if stage['wall'] > 0 else None
+            stages.append(stage)
+
+        parse = {'files': len(self.parseTimes)}
+        if self.parseTimes:
+            times = np.array(self.parseTimes)
+            parse.update({'total': float(times.sum()), 'mean': float(times.mean()), 'max': float(times.max())})
+            for p in (50, 90, 99):
+                parse['p%d' % p] = float(np.percentile(times, p))
+            slowest = np.argsort(-times, kind='mergesort')[:self.slowest]
+            parse['slowest'] = [{'file': self.parseFiles[i], 'seconds': float(times[i])} for i in slowest]
+
+        return {'started': self.started.isoformat(),
+                'wall': time.time() - self.startWall,
+                'cpu': time.process_time() - self.startCpu,
+                'info': self.info,
+                'stages': stages,
+                'parse': parse}
+
+    def writeReport(self, path):
+        """
+        This function writes the run report as a JSON file.
+        @param path file path eg: OutputDir/fileName_TimeStamp_report.json
+        """
+        tmpPath = path + '.tmp'
+        with open(tmpPath, 'w') as f:
+            json.dump(self.getReport(), f, indent=2)
+        os.rename(tmpPath, path)
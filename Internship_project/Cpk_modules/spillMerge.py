@@ -0,0 +1,198 @@
+"""
+@file spillMerge.py
+This module defines the SpillMerge class, an out of core replacement of the DFs_list + mergeDataFrames() step for
+groups whose logfiles don't fit in memory.
+
+The rows of each parsed DataFrame are written to partition files on disk, the partition of a row is crc32(ID) modulo
+the number of partitions, so all samples of an ID are in the same partition. Only the first row of each ID (ids,
+limits and settings) is kept in memory. After the last logfile, the outliers, histogram and samples are computed
+one partition at a time and the results are combined as mergeDataFrames() does.
+
+The number of partitions is chosen from the size of the logfiles of the group and the memory budget, a partition holds
+about MemoryMB of logfile text.
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import zlib
+import numpy as np
+import pandas as pd
+from .mergeDataframes import concatDataFrames, getIDs, getIdsDataframes, getSamplesResults, getFinalDataframe, applyIDX
+from .raggedSamples import RaggedSamples
+from .runMetrics import getStage
+
+# Maximum number of partitions of a group, each partition keeps a file open while the logfiles are parsed.
+MAX_PARTITIONS = 256
+
+def getPartitionsCount(inputSize, memoryBudget):
+    """
+    This function returns the number of partitions of a group.
+    @param inputSize total size of the logfiles of the group in bytes.
+    @param memoryBudget memory budget in bytes.
+    @return number of partitions
+    """
+    return int(min(MAX_PARTITIONS, max(1, -(-inputSize // max(memoryBudget, 1)))))
+
+def getInputSize(filesList):
+    """
+    This function returns the total size of the logfiles of a group.
+    @param filesList list of logfile paths or (filepath, Future) tuples.
+    @return size in bytes
+    """
+    size = 0
+    for file in filesList:
+        try:
+            size += os.path.getsize(file if isinstance(file, str) else file[0])
+        except OSError:
+            pass
+    return size
+
+def getPartitions(IDs, partitions):
+    """
+    This function returns the partition of each ID of a Categorical.
+    @param IDs Categorical of IDs, see getIDs().
+    @param partitions number of partitions
+    @return array of partition numbers, -1 for rows without ID
+    """
+    categoryPartitions = np.array([zlib.crc32(ID.encode('utf-8')) % partitions for ID in IDs.categories],
+                                  dtype=np.int64)
+    codes = IDs.codes
+    rowPartitions = np.full(len(codes), -1, dtype=np.int64)
+    valid = codes >= 0
+    rowPartitions[valid] = categoryPartitions[codes[valid]]
+    return rowPartitions
+
+
+class SpillMerge(object):
+
+    def __init__(self, spillDir, memoryBudget, inputSize):
+        """
+        @param spillDir directory of the partition files, a temporary directory is created in it.
+        @param memoryBudget memory budget in bytes.
+        @param inputSize total size of the logfiles of the group in bytes.
+        """
+        os.makedirs(spillDir, exist_ok=True)
+        self.tmpDir = tempfile.mkdtemp(prefix='Cpk_spill_', dir=spillDir)
+        self.partitions = getPartitionsCount(inputSize, memoryBudget)
+        self.files = [None] * self.partitions
+        self.seen = set()
+        self.seenMissing = False
+        self.firstRows = []
+        self.count = 0
+
+    def __len__(self):
+        """ @return number of DataFrames added """
+        return self.count
+
+    def partitionPath(self, partition):
+        return os.path.join(self.tmpDir, 'part{0:03d}.pkl'.format(partition))
+
+    def add(self, DataFrame):
+        """
+        This function spills the samples of a DataFrame returned by getDataFrame() to the partition files.
+        The first row of each new ID is kept in memory.
+        @param DataFrame DataFrame of a logfile
+        """
+        self.count += 1
+        IDs = getIDs(DataFrame)
+        codes = IDs.codes
+
+        # First row of each ID of the DataFrame, only the IDs not seen in the previous DataFrames are kept.
+        # Rows without ID are kept once, as drop_duplicates() does.
+        uniqueCodes, firstRows = np.unique(codes, return_index=True)
+        keep = np.array([code >= 0 and IDs.categories[code] not in self.seen for code in uniqueCodes], dtype=bool)
+        if not self.seenMissing and len(uniqueCodes) and uniqueCodes[0] < 0:
+            keep[0] = True
+            self.seenMissing = True
+        self.seen.update(IDs.categories[uniqueCodes[keep & (uniqueCodes >= 0)]])
+        # The DataFrame is kept even without new IDs, so the column order is the same as pd.concat(DFs_list).
+        self.firstRows.append(DataFrame.iloc[np.sort(firstRows[keep])])
+
+        # Writing the samples of each partition: (IDs, codes, values)
+        rowPartitions = getPartitions(IDs, self.partitions)
+        order = np.argsort(rowPartitions, kind='mergesort')
+        bounds = np.searchsorted(rowPartitions[order], np.arange(self.partitions + 1))
+        values = DataFrame['MeasValues'].values
+        for partition in range(self.partitions):
+            rows = order[bounds[partition]:bounds[partition + 1]]
+            if len(rows) == 0:
+                continue
+            Partition = IDs[rows].remove_unused_categories()
+            if self.files[partition] is None:
+                self.files[partition] = open(self.partitionPath(partition), 'wb')
+            pickle.dump((np.asarray(Partition.categories, dtype=object), Partition.codes, values[rows]),
+                        self.files[partition], protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loadPartition(self, partition):
+        """
+        This function reads the samples of a partition.
+        @param partition partition number
+        @return RaggedSamples object
+        """
+        chunks = []
+        with open(self.partitionPath(partition), 'rb') as f:
+            while True:
+                try:
+                    chunks.append(pickle.load(f))
+                except EOFError:
+                    break
+
+        # The IDs of all chunks are sorted, the codes of each chunk are mapped to the sorted IDs.
+        uniques = pd.Index(np.unique(np.concatenate([categories for categories, codes, values in chunks])))
+        codes = np.concatenate([uniques.get_indexer(categories)[codes] for categories, codes, values in chunks])
+        values = np.concatenate([values for categories, codes, values in chunks])
+        return RaggedSamples.fromCodes(codes, uniques, values)
+
+    def merge(self, Bins, Outliers, keep_hist, IDX, metrics=None):
+        """
+        This function computes the results of the group one partition at a time. The spilled files are deleted.
+        @param Bins is the number of columns to generate for Histrogram Dataframe.
+        @param Outliers is the percentage of outliers to detect.
+        @param keep_hist boolean(True/False)
+        @param IDX group number.
+        @param metrics RunMetrics object, the outliers and histogram stages are measured if given.
+        @return FinalDF, IDs_DF, Settings_DF as mergeDataFrames()
+        """
+        try:
+            for f in self.files:
+                if f is not None: f.close()
+
+            first_DF = concatDataFrames(self.firstRows)
+            self.firstRows = []
+            IDs_DF, Limits_DF, Settings_DF = getIdsDataframes(first_DF, getIDs(first_DF), IDX)
+
+            # Getting default limits:
+            default_limits = applyIDX(['L1_', 'U1_'], IDX)
+            Default_limitDict = Limits_DF[default_limits].to_dict('index')
+
+            results = []
+            for partition in range(self.partitions):
+                if self.files[partition] is None:
+                    continue
+                with getStage(metrics, 'spill load'):
+                    Samples = self.loadPartition(partition)
+                results.append(getSamplesResults(Samples, Default_limitDict, Bins, Outliers, keep_hist, IDX, metrics))
+                os.remove(self.partitionPath(partition))
+
+            if not results:
+                results.append(getSamplesResults(RaggedSamples.fromArrays([], []), Default_limitDict, Bins, Outliers,
+                                                 keep_hist, IDX, metrics))
+
+            # The IDs are sorted, as in the RaggedSamples object of all samples.
+            OutlierDF, SamplesDF, HistrogramDF = [pd.concat(frames).sort_index() if frames[0] is not None else None
+                                                  for frames in zip(*results)]
+            FinalDF = getFinalDataframe(Limits_DF, OutlierDF, SamplesDF, HistrogramDF, IDX)
+            return FinalDF, IDs_DF, Settings_DF
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        This function closes and deletes the partition files.
+        """
+        for f in self.files:
+            if f is not None: f.close()
+        self.files = [None] * self.partitions
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
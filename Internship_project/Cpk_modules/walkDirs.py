@@ -0,0 +1,123 @@
+"""
+@file walkDirs.py
+This module defines functions to walk directory trees with os.scandir().
+The file type of each entry is taken from the DirEntry object, so no extra stat() call is needed per file.
+Subtrees are listed in parallel threads, but the results are returned in the same order as os.walk().
+"""
+
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of files found under each root directory in the previous run. Used as total for the progress bar.
+DEFAULT_COUNTS_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'Cpk_Tool', 'fileCounts.json')
+
+def scanDir(path):
+    """
+    This function lists a single directory.
+    Like os.walk(), symbolic links to directories are not followed and unreadable directories are skipped.
+    @param path directory path
+    @return tuple (dirs, files), names of the subdirectories and names of the regular files in the directory.
+    """
+    dirs = []
+    files = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            dirs.append(entry.name)
+                    elif entry.is_file():
+                        files.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return dirs, files
+
+def listTree(path, pruneDir=None):
+    """
+    This function lists a directory tree in a single thread.
+    @param path root directory of the tree
+    @param pruneDir function that takes a directory name and returns True if the directory has to be skipped.
+    @return list of tuples (dirpath, files) in os.walk() order.
+    """
+    tree = []
+    stack = [path]
+    while stack:
+        dirpath = stack.pop()
+        dirs, files = scanDir(dirpath)
+        if pruneDir is not None:
+            dirs = [d for d in dirs if not pruneDir(d)]
+        tree.append((dirpath, files))
+        # Reversed, so the subdirectories are popped in listing order.
+        stack.extend(os.path.join(dirpath, d) for d in reversed(dirs))
+    return tree
+
+def walkTree(rootPath, threads=8, pruneDir=None):
+    """
+    This function walks a directory tree and yields the files of each directory in os.walk() order.
+    The top levels of the tree are listed first until there are enough subtrees to keep the threads busy,
+    then every subtree is listed in a thread of its own.
+    @param rootPath root directory
+    @param threads number of threads used to list the directories.
+    @param pruneDir function that takes a directory name and returns True if the directory has to be skipped.
+    @return generator of tuples (dirpath, files)
+    """
+    listed = {}
+    frontier = [rootPath]
+
+    with ThreadPoolExecutor(max_workers=max(threads, 1)) as pool:
+
+        # Expanding the tree level by level. The directories of a level are listed in parallel.
+        while frontier and len(frontier) < threads * 4:
+            nextLevel = []
+            for dirpath, (dirs, files) in zip(frontier, pool.map(scanDir, frontier)):
+                if pruneDir is not None:
+                    dirs = [d for d in dirs if not pruneDir(d)]
+                listed[dirpath] = (dirs, files)
+                nextLevel.extend(os.path.join(dirpath, d) for d in dirs)
+            frontier = nextLevel
+
+        # Listing every remaining subtree in a thread.
+        subtrees = {dirpath: pool.submit(listTree, dirpath, pruneDir) for dirpath in frontier}
+
+        # Yielding the directories in os.walk() order.
+        stack = [rootPath]
+        while stack:
+            dirpath = stack.pop()
+            if dirpath in subtrees:
+                for item in subtrees.pop(dirpath).result():
+                    yield item
+                continue
+            dirs, files = listed[dirpath]
+            yield dirpath, files
+            stack.extend(os.path.join(dirpath, d) for d in reversed(dirs))
+
+def loadFileCounts(countsFile):
+    """
+    This function reads the number of files found under each root directory in the previous run.
+    @param countsFile path of the json file
+    @return dictionary {rootPath: filesCount}
+    """
+    try:
+        with open(countsFile, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def saveFileCounts(countsFile, counts):
+    """
+    This function saves the number of files found under each root directory.
+    @param countsFile path of the json file
+    @param counts dictionary {rootPath: filesCount}
+    """
+    try:
+        os.makedirs(os.path.dirname(countsFile), exist_ok=True)
+        previous = loadFileCounts(countsFile)
+        previous.update(counts)
+        with open(countsFile, 'w') as f:
+            json.dump(previous, f)
+    except OSError:
+        pass
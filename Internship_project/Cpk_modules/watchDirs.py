@@ -0,0 +1,175 @@
+"""
+@file watchDirs.py
+This module defines the DirWatcher class that finds the logfiles added to the root directories of a group in WATCH
+mode, without walking the whole archive again.
+
+The directories above the test session directories (eg: root/data/WaveScale/N2601-66601_000001) are containers, the
+session directories are named after their start time (see regex.pattern_SessionDir). A poll does:
+    - stat() every container, a container is listed again only if its modification time changed, eg: a new session
+      directory was created in it. New session directories are walked completely.
+    - walk the hot session directories again. A session is hot for HotHours after its start time, its creation or the
+      last new logfile found in it. Older sessions are closed and never listed again.
+The cost of a poll is the number of containers plus the size of the hot sessions, it doesn't grow with the archive.
+A new logfile may still be written, it is returned only when it is settled: its size and modification time didn't
+change since the previous poll, or it was not modified for SettleS seconds. Until then it is pending and checked again
+by the next polls.
+The file paths are joined as in iterFilenames(), so a logfile has the same path in both.
+Directory trees without session directories are containers only, each directory is then stat() in every poll.
+"""
+
+import os
+import time
+from datetime import datetime
+from .walkDirs import scanDir, listTree
+from .regex import pattern_SessionDir, getDirFilter
+from .getFilenames import getSelector
+from .incrementalState import getFileStat
+
+def getSessionTime(dirname):
+    """
+    This function returns the start time of a test session directory eg: 2018081412h52m35s_bbac6091
+    @param dirname directory name
+    @return time in seconds since the epoch, or None if the directory is not named like a session.
+    """
+    if pattern_SessionDir.match(dirname) is None:
+        return None
+    try:
+        return time.mktime(datetime.strptime(dirname[:17], '%Y%m%d%Hh%Mm%Ss').timetuple())
+    except ValueError:
+        return None
+
+def getMtime(path):
+    """ @return modification time of a directory, None if it can't be read. """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class DirWatcher(object):
+
+    def __init__(self, dirList, Filter, exclude_files, group, hotSeconds, settleSeconds=60):
+        """
+        The containers of the root directories are listed once, the logfiles found at this point are known and not
+        returned by poll(). The watcher is created before the first discovery, so no logfile is missed in between.
+        @param dirList root directories of the group.
+        @param Filter filter of the group, see ConfigFile.filenameFilter().
+        @param exclude_files list of patterns, if found in testname then exclude that test name from selection.
+        @param group group name eg: group1
+        @param hotSeconds time a session directory stays hot.
+        @param settleSeconds time without modification after which a new logfile is settled.
+        """
+        self.group = group
+        self.hotSeconds = hotSeconds
+        self.settleSeconds = settleSeconds
+        self.select = getSelector(Filter, exclude_files)
+        # Session directories which can't hold logfiles of the selected YEAR/MONTH are never watched.
+        self.pruneDir = getDirFilter(Filter)
+        self.containers = {}    # {dirpath: (mtime, set of subdirectory names, set of file names)}
+        self.sessions = {}      # {dirpath: (hot until, set of file paths)}
+        self.pending = {}       # {file path: (testName, (size, mtime) at the previous poll)} of the unsettled logfiles
+
+        now = time.time()
+        for rootPath in dirList:
+            self.addContainer(rootPath, now, [], initial=True)
+
+    def addContainer(self, dirpath, now, found, initial=False):
+        """
+        This function lists a new container and its subdirectories.
+        @param found list of file paths, the files of the new directories are appended.
+        @param initial if True, only the sessions started less than HotHours ago are walked and added as hot,
+                       else all sessions of the container are new and walked.
+        """
+        stack = [dirpath]
+        while stack:
+            dirpath = stack.pop()
+            mtime = getMtime(dirpath)
+            dirs, files = scanDir(dirpath)
+            if self.pruneDir is not None:
+                dirs = [d for d in dirs if not self.pruneDir(d)]
+            self.containers[dirpath] = (mtime, set(dirs), set(files))
+            found.extend('{0}/{1}'.format(dirpath, f) for f in files)
+            for d in dirs:
+                path = os.path.join(dirpath, d)
+                started = getSessionTime(d)
+                if started is None:
+                    stack.append(path)
+                elif not initial:
+                    self.addSession(path, now, found)
+                elif now - started < self.hotSeconds:
+                    self.addSession(path, started, found)
+
+    def addSession(self, dirpath, hotSince, found):
+        """
+        This function walks a session directory and adds it to the hot sessions.
+        @param hotSince the session is hot until hotSince + HotHours.
+        @param found list of file paths, the files of the session are appended.
+        """
+        files = set()
+        for path, names in listTree(dirpath):
+            files.update('{0}/{1}'.format(path, name) for name in names)
+        self.sessions[dirpath] = (hotSince + self.hotSeconds, files)
+        found.extend(sorted(files))
+
+    def poll(self):
+        """
+        This function finds the logfiles added since the previous poll and returns the new logfiles which are settled.
+        @return list of tuples (testName, group, filepath) of the selected new logfiles.
+        """
+        now = time.time()
+        found = []
+
+        # Containers whose modification time changed are listed again.
+        for dirpath in list(self.containers):
+            mtime, knownDirs, knownFiles = self.containers[dirpath]
+            newMtime = getMtime(dirpath)
+            if newMtime == mtime:
+                continue
+            dirs, files = scanDir(dirpath)
+            if self.pruneDir is not None:
+                dirs = [d for d in dirs if not self.pruneDir(d)]
+            self.containers[dirpath] = (newMtime, knownDirs | set(dirs), knownFiles | set(files))
+            found.extend('{0}/{1}'.format(dirpath, f) for f in files if f not in knownFiles)
+            for d in dirs:
+                if d in knownDirs:
+                    continue
+                path = os.path.join(dirpath, d)
+                if getSessionTime(d) is None:
+                    self.addContainer(path, now, found)
+                else:
+                    self.addSession(path, now, found)
+
+        # Hot sessions are walked again, a session with new logfiles stays hot.
+        for dirpath in list(self.sessions):
+            hotUntil, knownFiles = self.sessions[dirpath]
+            files = set()
+            for path, names in listTree(dirpath):
+                files.update('{0}/{1}'.format(path, name) for name in names)
+            newFiles = files - knownFiles
+            if newFiles:
+                found.extend(sorted(newFiles))
+                self.sessions[dirpath] = (now + self.hotSeconds, files)
+            elif now >= hotUntil:
+                del self.sessions[dirpath]
+
+        for filepath in found:
+            testName = self.select(os.path.basename(filepath))
+            if testName is not None:
+                self.pending[filepath] = (testName, None)
+
+        # The pending logfiles are returned when they are settled, a logfile which was deleted is dropped.
+        selected = []
+        for filepath, (testName, previous) in list(self.pending.items()):
+            stat = getFileStat(filepath)
+            if stat is None:
+                del self.pending[filepath]
+            elif stat == previous or now - stat[1]/1e9 >= self.settleSeconds:
+                del self.pending[filepath]
+                selected.append((testName, self.group, filepath))
+            else:
+                self.pending[filepath] = (testName, stat)
+        return selected
+
+    def __len__(self):
+        """ @return number of hot session directories """
+        return len(self.sessions)
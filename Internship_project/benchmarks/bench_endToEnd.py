@@ -0,0 +1,159 @@
+"""
+@file bench_endToEnd.py
+End to end benchmark of main.py on synthetic logfile archives (see generateLogfiles.py).
+For each scale (number of logfiles) an archive is generated once under the work directory, main.py is run on it with
+the cache disabled and the stage timings are read from the JSON run report. The results are exported as CSV files,
+a checksum of each exported file is kept to check that a change doesn't modify the results.
+
+The timings and checksums are compared to a saved baseline. With --save the results are saved as the new baseline.
+
+Usage: python benchmarks/bench_endToEnd.py [--scales 1000 10000 100000] [--rows 40] [--workers 4]
+                                           [--workdir /tmp/Cpk_bench] [--baseline file.json] [--save]
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from generateLogfiles import writeArchive
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_endToEnd.json')
+
+# Stages slower than the baseline by more than this ratio are flagged.
+SLOWDOWN_RATIO = 1.2
+
+def getArchive(workdir, files, rows):
+    """
+    This function returns the root directory of the archive of the given scale, it is generated if it doesn't exist.
+    """
+    root = os.path.join(workdir, 'archive_{0}_{1}'.format(files, rows))
+    done = os.path.join(root, '.complete')
+    if not os.path.isfile(done):
+        shutil.rmtree(root, ignore_errors=True)
+        start = time.time()
+        writeArchive(root, files, rows)
+        open(done, 'w').close()
+        print('Generated {0} logfiles in {1:.1f} s'.format(files, time.time() - start))
+    return root
+
+def getConfig(root, outputDir, workers):
+    """
+    This function returns the configuration of a benchmark run.
+    """
+    return {"FILE_NAME": "Bench",
+            "OUTPUT_DIR": outputDir,
+            "BINS": 5,
+            "%OUTLIERS": 15,
+            "WORKERS": workers,
+            "STREAMING": False,
+            "WALK_THREADS": 8,
+            "CACHE": {"Enable": False, "Dir": "", "MaxSizeMB": 2048},
+            "STATS_OUTPUT": "formulas",
+            "CONSTANT_MEMORY": False,
+            "OUTPUT_FORMATS": ["xlsx", "csv"],
+            "METRICS": {"Report": True, "SlowestFiles": 10},
+            "HIDE_GROUPS": {"Hist": True, "Settings": False},
+            "EXCLUDE_FILES": ["Testprocessor"],
+            "GROUPS": [{"Path": [root], "VARIANT": [], "HW": [], "TASK": [], "TRANSITION": {}, "TEST": [],
+                        "YEAR": [], "MONTH": [], "path_pattern": []}]}
+
+def getChecksums(exportDir):
+    """
+    This function returns the sha1 of each exported file of a run.
+    """
+    checksums = {}
+    for path in sorted(glob.glob(os.path.join(exportDir, '*.csv'))):
+        with open(path, 'rb') as f:
+            checksums[os.path.basename(path)] = hashlib.sha1(f.read()).hexdigest()
+    return checksums
+
+def runScale(workdir, files, rows, workers):
+    """
+    This function runs main.py on the archive of the given scale.
+    @return dictionary {'wall': seconds, 'stages': {name: wall seconds}, 'checksums': {file: sha1}}
+    """
+    root = getArchive(workdir, files, rows)
+    outputDir = os.path.join(workdir, 'output_{0}_{1}'.format(files, rows)) + '/'
+    shutil.rmtree(outputDir, ignore_errors=True)
+    os.makedirs(outputDir)
+    cfgFile = os.path.join(workdir, 'config_{0}_{1}.json'.format(files, rows))
+    with open(cfgFile, 'w') as f:
+        json.dump(getConfig(root, outputDir, workers), f, indent=2)
+
+    start = time.time()
+    with open(os.path.join(outputDir, 'main.log'), 'w') as log:
+        subprocess.check_call([sys.executable, MAIN, cfgFile, '--no-cache'], stdout=log, stderr=subprocess.STDOUT)
+    wall = time.time() - start
+
+    reportFile = glob.glob(os.path.join(outputDir, '*_report.json'))[0]
+    with open(reportFile) as f:
+        report = json.load(f)
+    exportDir = reportFile[:-len('_report.json')]
+    return {'wall': wall,
+            'stages': {stage['name']: stage['wall'] for stage in report['stages']},
+            'checksums': getChecksums(exportDir)}
+
+def compare(name, result, baseline):
+    """
+    This function prints the timings of a scale next to the baseline and checks the checksums.
+    @return True if the results are identical to the baseline
+    """
+    print('{0:>20} {1:>10} {2:>10} {3:>8}'.format(name, 'seconds', 'baseline', 'ratio'))
+    rows = [('total', result['wall'], baseline.get('wall') if baseline else None)]
+    rows += [(stage, wall, baseline['stages'].get(stage) if baseline else None) for stage, wall in result['stages'].items()]
+    for stage, wall, base in rows:
+        if base:
+            ratio = wall / base
+            flag = '  slower' if ratio > SLOWDOWN_RATIO else ''
+            print('{0:>20} {1:>10.3f} {2:>10.3f} {3:>8.2f}{4}'.format(stage, wall, base, ratio, flag))
+        else:
+            print('{0:>20} {1:>10.3f} {2:>10} {3:>8}'.format(stage, wall, '-', '-'))
+
+    if not baseline:
+        return True
+    if result['checksums'] != baseline['checksums']:
+        changed = sorted(set(result['checksums'].items()) ^ set(baseline['checksums'].items()))
+        print('Results differ from the baseline: ' + ', '.join(sorted(set(f for f, h in changed))))
+        return False
+    print('Results are identical to the baseline')
+    return True
+
+
+if __name__ == '__main__':
+    argParser = argparse.ArgumentParser(description='End to end benchmark of the Cpk Analyzer Tool')
+    argParser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000, 100000], help='numbers of logfiles')
+    argParser.add_argument('--rows', type=int, default=40, help='maximum number of data rows of a logfile')
+    argParser.add_argument('--workers', type=int, default=4, help='WORKERS of the configuration file')
+    argParser.add_argument('--workdir', default=os.path.join('/tmp', 'Cpk_bench'), help='directory of the archives')
+    argParser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline results (.json)')
+    argParser.add_argument('--save', action='store_true', help='save the results as the new baseline')
+    args = argParser.parse_args()
+
+    baselines = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    results = {}
+    identical = True
+    for files in args.scales:
+        name = '{0} files'.format(files)
+        key = '{0}_{1}'.format(files, args.rows)
+        results[key] = runScale(args.workdir, files, args.rows, args.workers)
+        identical = compare(name, results[key], baselines.get(key)) and identical
+        print('')
+
+    if args.save:
+        baselines.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print('Baseline saved to ' + args.baseline)
+    sys.exit(0 if identical else 1)
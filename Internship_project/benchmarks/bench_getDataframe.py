@@ -0,0 +1,116 @@
+"""
+@file bench_getDataframe.py
+Microbenchmark of the reshaping step in getDataFrame().
+A wide logfile with many A/U/L/R column groups is written to a temporary directory. The file is reshaped by
+getDataFrame() and by the former implementation (per row dicts + melt), kept below as legacyGetDataFrame().
+Both results are compared before the timings are printed.
+
+Usage: python benchmarks/bench_getDataframe.py [groups] [rows] [repeat]
+"""
+
+import os
+import re
+import sys
+import tempfile
+import timeit
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Cpk_modules.getDataframe import getDataFrame, processFile, getMeasGroups
+
+def writeWideLogfile(path, groups, rows):
+    """
+    This function writes a logfile with one setting column and 'groups' measurement groups [An, Un, Ln, Rn].
+    @param path logfile path
+    @param groups number of measurement groups
+    @param rows number of data rows
+    """
+    rng = np.random.RandomState(0)
+    labels = ['s0', 'm0', 's1']
+    names = ['HwId', 'MeasPointId', 'setupFrequency']
+    for g in range(1, groups + 1):
+        labels += ['A%d' % g, 'U%d' % g, 'L%d' % g, 'R%d' % g]
+        names += ['meas%d' % g, 'upper', 'lower', 'expected']
+
+    with open(path, 'w') as f:
+        f.write('#1:_;>>;' + ';'.join(labels) + '\n#2: -\n#3: -\n#4:;>>;' + ';'.join(names) + '\n')
+        values = rng.normal(1.0, 0.1, size=(rows, groups))
+        for r in range(rows):
+            row = ['Slot%d' % (r % 8), 'MP%d' % (r // 8), '100']
+            for g in range(groups):
+                row += ['%.6f' % values[r, g], '2', '0', '1']
+            f.write('P_;>>;' + ';'.join(row) + '\n')
+
+def legacyGetDataFrame(file):
+    """
+    Former implementation of getDataFrame(): one dict per row and measurement, melted and unpacked again.
+    """
+    def updateKeys(Dict):
+        groupDict = {}
+        for key, value in Dict.items():
+            if 'A' in key: groupDict['MeasValues'] = value
+            elif 'U' in key: groupDict['U1_'] = value
+            elif 'L' in key: groupDict['L1_'] = value
+            elif 'R' in key: groupDict['R_'] = value
+        return groupDict
+
+    DataFrame = processFile(file)
+    cols_list = DataFrame.columns.tolist()
+    cols_str = str(cols_list)
+    measlabels = re.findall('[A]{1}[0-9]{1,}', cols_str)
+    measNames_dict = {i: DataFrame.loc[0, i] for i in measlabels}
+    measGroupsDict = getMeasGroups(cols_str, measlabels)
+    non_settingsLabels_set = set(re.findall('[AULRm]{1}[0-9]{1,}|s0', cols_str))
+    settingsLabels = list(set(cols_list).difference(non_settingsLabels_set))
+    settings_dict = {i: DataFrame.loc[0, i] for i in settingsLabels}
+
+    DataFrame.drop(0, inplace=True)
+    DataFrame.reset_index(inplace=True, drop=True)
+    for col in re.findall('[AULR]{1}[0-9]{1,}', cols_str):
+        DataFrame[col] = pd.to_numeric(DataFrame[col])
+
+    for measlabel, GroupedCols in measGroupsDict.items():
+        DataFrame[measlabel] = DataFrame.loc[:, GroupedCols].to_dict('records')
+    DataFrame.drop(columns=re.findall('[ULR]{1}[0-9]{1,}', cols_str), inplace=True)
+
+    rename_cols_dict = {'s0':'HwIds','m0':'MeasPointIds'}
+    rename_cols_dict.update(settings_dict)
+    DataFrame.rename(columns=rename_cols_dict, inplace=True)
+    DataFrame = pd.melt(DataFrame, id_vars=list(rename_cols_dict.values()), var_name='MeasNames', value_name='Grouped Values')
+
+    groupedValues_DF = pd.DataFrame.from_dict({Idx: updateKeys(Dict) for Idx, Dict in DataFrame['Grouped Values'].items()}, orient='index')
+    for col in ['U1_','L1_', 'R_']:
+        if col not in groupedValues_DF.columns:
+            groupedValues_DF[col] = np.nan
+    DataFrame.drop(columns='Grouped Values', inplace=True)
+    for label, Name in measNames_dict.items():
+        index_lst = DataFrame.index[DataFrame['MeasNames'] == label]
+        DataFrame.loc[index_lst, 'MeasNames'] = Name
+    return pd.concat([DataFrame, groupedValues_DF], axis=1)
+
+if __name__ == '__main__':
+    groups = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'wide.log')
+        writeWideLogfile(path, groups, rows)
+
+        new = getDataFrame(path)
+        old = legacyGetDataFrame(path)
+        # The legacy column order of ['MeasValues', 'U1_', 'L1_', 'R_'] depends on set ordering, values must match.
+        # The categorical columns of getDataFrame() are compared as strings.
+        strings = new.astype({col: object for col in new.columns if new[col].dtype.name == 'category'})
+        assert new.shape == old.shape and strings.equals(old[new.columns.tolist()]), 'getDataFrame() output differs'
+
+        parse = min(timeit.repeat(lambda: processFile(path), number=1, repeat=repeat))
+        t_new = min(timeit.repeat(lambda: getDataFrame(path), number=1, repeat=repeat))
+        t_old = min(timeit.repeat(lambda: legacyGetDataFrame(path), number=1, repeat=repeat))
+
+    print('Logfile: {0} groups x {1} rows --> {2} rows'.format(groups, rows, len(new)))
+    print('processFile        : {0:8.3f} s'.format(parse))
+    print('legacy getDataFrame: {0:8.3f} s  (reshape {1:8.3f} s)'.format(t_old, t_old - parse))
+    print('getDataFrame       : {0:8.3f} s  (reshape {1:8.3f} s)'.format(t_new, t_new - parse))
+    print('reshape speedup    : {0:8.1f} x'.format((t_old - parse) / max(t_new - parse, 1e-9)))
@@ -0,0 +1,110 @@
+"""
+@file bench_outliers.py
+Regression check and benchmark of getOutliersDataframe().
+A corpus of sample arrays is generated (normal, integer valued with ties, constant, short, with outliers and nan).
+If PyAstronomy is installed, the new limits are compared to the per ID pyasl.generalizedESD() loop which was used
+before, kept below as legacyGetOutliersDataframe().
+
+Usage: python benchmarks/bench_outliers.py [IDs] [percentage]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Cpk_modules.outliersDetection import getOutliersDataframe
+from Cpk_modules.raggedSamples import RaggedSamples
+
+try:
+    from PyAstronomy import pyasl
+except ImportError:
+    pyasl = None
+
+def getCorpus(IDs, seed=0):
+    """
+    This function returns a Series of sample arrays and the default limits dictionary.
+    @param IDs number of IDs
+    @param seed random seed
+    """
+    rng = np.random.RandomState(seed)
+    arrays = {}
+    limits = {}
+    for k in range(IDs):
+        n = int(rng.choice([1, 2, 3, 5, 10, 40, 200, 1000]))
+        kind = k % 6
+        if kind == 0:
+            ARR = rng.normal(5.0, 0.2, n)
+        elif kind == 1:
+            ARR = rng.randint(0, 4, n).astype(float)
+        elif kind == 2:
+            ARR = np.full(n, 3.0)
+        elif kind == 3:
+            ARR = rng.normal(0.0, 1.0, n)
+            ARR[rng.rand(n) < 0.05] = rng.normal(0.0, 20.0)
+        elif kind == 4:
+            ARR = np.round(rng.normal(10.0, 1.0, n), 1)
+        else:
+            ARR = rng.normal(1e6, 1e-3, n)
+            ARR[rng.rand(n) < 0.1] = np.nan
+        ID = 'ID{0}'.format(k)
+        arrays[ID] = ARR
+        passed = ARR[np.logical_not(np.isnan(ARR))]
+        Max, Min = (passed.max(), passed.min()) if len(passed) else (0.0, 0.0)
+        limits[ID] = {'U1_1': Max + rng.choice([0.0, 1.0]), 'L1_1': Min - rng.choice([0.0, 1.0])}
+    return pd.Series(arrays), limits
+
+def legacyGetOutliersDataframe(Series, Default_limitsDict, Outliers_percentage, IDX):
+    """ Former implementation, one pyasl.generalizedESD() call per ID. """
+    OutliersDict = {}
+    U1, L1, U2, L2 = 'U1_'+IDX, 'L1_'+IDX, 'U2_'+IDX, 'L2_'+IDX
+    for ID, ARR in Series.items():
+        Upperlimit = Default_limitsDict[ID][U1]
+        Lowerlimit = Default_limitsDict[ID][L1]
+        ARR = ARR[np.logical_not(np.isnan(ARR))]
+        L, U = Lowerlimit, Upperlimit
+        maxOLs = int(len(ARR) * Outliers_percentage/100)
+        if len(set(ARR)) > 1 and len(ARR) > maxOLs:
+            if maxOLs < 1:
+                maxOLs = 2
+            r = pyasl.generalizedESD(ARR, maxOLs, 0.05)
+            if r[0] > 0:
+                outliers = [ARR[idx] for idx in r[1]]
+                values_passed = np.array([x for idx, x in enumerate(ARR) if idx not in r[1]])
+                below = [x for x in outliers if x < min(values_passed)]
+                above = [x for x in outliers if x > max(values_passed)]
+                if below and max(below) > Lowerlimit: L = max(below)
+                if above and min(above) < Upperlimit: U = min(above)
+        OutliersDict[ID] = {L2: L, U2: U}
+    return pd.DataFrame.from_dict(OutliersDict, orient='index')[[L2, U2]]
+
+if __name__ == '__main__':
+    IDs = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    percentage = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    Series, limits = getCorpus(IDs)
+
+    start = time.time()
+    new, _ = getOutliersDataframe(RaggedSamples.fromArrays(Series.index, list(Series.values)), limits, percentage, '1')
+    t_new = time.time() - start
+    print('getOutliersDataframe       : {0:8.3f} s  ({1} IDs)'.format(t_new, IDs))
+
+    if pyasl is None:
+        print('PyAstronomy is not installed, regression check skipped.')
+        sys.exit(0)
+
+    start = time.time()
+    old = legacyGetOutliersDataframe(Series.copy(), limits, percentage, '1')
+    t_old = time.time() - start
+    print('legacy getOutliersDataframe: {0:8.3f} s'.format(t_old))
+    print('speedup                    : {0:8.1f} x'.format(t_old / max(t_new, 1e-9)))
+
+    diff = ~(np.isclose(new.values, old.loc[new.index].values, rtol=0, atol=0) |
+             (np.isnan(new.values) & np.isnan(old.loc[new.index].values)))
+    if diff.any():
+        print('Limits differ for {0} IDs:'.format(diff.any(axis=1).sum()))
+        print(pd.concat([new, old], axis=1)[diff.any(axis=1)].head(20))
+        sys.exit(1)
+    print('Limits are identical.')
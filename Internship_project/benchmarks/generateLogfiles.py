@@ -0,0 +1,158 @@
+"""
+@file generateLogfiles.py
+This module writes synthetic logfiles into a directory tree laid out like the logfile archive:
+
+    root/data/WaveScale/N2601-66601_000001/2018081412h52m35s_bbac6091/PS1600/
+        Centipede.Awg.Driver.Verification.Regular.Gain.Check.2018.08.14.12h52m35s.th1234.log
+
+The logfiles have the header lines read by processFile() (ST Version, RHEL version, Workstation, TestSessionData.*,
+Run Number), the four usage lines #1..#4 and 'P_;>>;' / 'F_;>>;' data rows with A/U/L/R column groups.
+The columns of a testName are the same in all its logfiles, the measurements are normal with a few outliers.
+The tree is the same for the same arguments.
+
+Usage: python benchmarks/generateLogfiles.py root [files] [rows] [groups] [settings] [seed]
+"""
+
+import os
+import random
+import sys
+import zlib
+
+# testNames of the archive: (Variant, HW, Task, Type1, Type2, Test)
+TESTNAMES = [('Centipede', 'Channel', 'Receiver', 'Misc', 'Reset', 'Apply'),
+             ('Centipede', 'Awg', 'Driver', 'Verification', 'Regular', 'Gain.Check'),
+             ('Centipede', 'Awg', 'Driver', 'Verification', 'Regular', 'Offset.Check'),
+             ('Wave', 'Dig', 'Sampler', 'Calibration', 'Factory', 'Offset'),
+             ('Wave', 'Dig', 'Sampler', 'Calibration', 'Factory', 'linearity'),
+             ('Wave', 'Dig', 'Sampler', 'Verification', 'Regular', 'Noise')]
+
+# Hardware modules of a session without data rows, one TestSessionData line each. The slots of the data rows follow.
+HW_MODULES = ['Mainframe']
+
+# Column of the #4 usage line for each column type.
+COLUMN_NAMES = {'A': 'meas', 'U': 'upper', 'L': 'lower', 'R': 'expected'}
+
+def getColumns(testRng, groups, settings):
+    """
+    This function returns the columns of the #1 and #4 usage lines of a testName.
+    Each measurement group has A, U and L columns and an optional R column.
+    @param testRng random.Random seeded with the testName.
+    @param groups number of measurement groups
+    @param settings number of setting columns
+    @return tuple (labels, names, list of column types of each group)
+    """
+    labels = ['s0', 'm0'] + ['s' + str(i + 1) for i in range(settings)]
+    names = ['HwId', 'MeasPointId'] + ['setting' + str(i + 1) for i in range(settings)]
+    measGroups = []
+    for g in range(1, groups + 1):
+        cols = ['A', 'U', 'L'] + (['R'] if testRng.random() < 0.7 else [])
+        measGroups.append(cols)
+        for c in cols:
+            labels.append(c + str(g))
+            names.append(COLUMN_NAMES[c] + str(g) if c == 'A' else COLUMN_NAMES[c])
+    return labels, names, measGroups
+
+def getHwIds(hwIds):
+    """ @return HwIds of the data rows eg: ['Slot0', 'Slot1', 'Slot2', 'Slot3'] """
+    return ['Slot' + str(n) for n in range(hwIds)]
+
+def getLogText(testRng, rng, timeStamp, rows=20, groups=3, settings=2, hwIds=4):
+    """
+    This function returns the text of a logfile.
+    @param testRng random.Random seeded with the testName, it sets the columns and limits of the testName.
+    @param rng random.Random of the logfile, it sets the measurements and the session data.
+    @param timeStamp session start time eg: 2018-08-14 12:52:35
+    @param rows number of data rows
+    @param groups number of measurement groups
+    @param settings number of setting columns
+    @param hwIds number of HwId values, the rows cycle through the HwIds of each measurement point. Each HwId has a
+           TestSessionData line.
+    @return string
+    """
+    labels, names, measGroups = getColumns(testRng, groups, settings)
+    limits = [(testRng.choice([1.3, 2.0]), testRng.choice([0.0, 0.7])) for g in measGroups]
+    slots = getHwIds(hwIds)
+
+    lines = ['Test session log\n',
+             '  ST Version: 5.1.{0}\n'.format(rng.randint(0, 3)),
+             'RHEL version: 7.{0}\n'.format(rng.randint(2, 6)),
+             ' Workstation: ws-{0}\n'.format(rng.randint(1, 9)),
+             'TestSessionData.StartTimeStamp="{0}.{1:02d}"\n'.format(timeStamp, rng.randint(0, 99))]
+    for hw in HW_MODULES + slots:
+        lines.append('TestSessionData.{0}="HighLevelSerialNumber = DE{1:08d}, Vendor = AB, PartNumber = N2601-6660{2}, '
+                     'SerialNumber = {3}, EdcOracle = {4}, ManufacturerProductionDate = {5}, FpgaRevision = 1.{6}.0"\n'
+                     .format(hw, rng.randint(0, 9999), rng.randint(1, 3), rng.randint(1, 9999), rng.randint(1, 99),
+                             rng.randint(100, 999), rng.randint(0, 9)))
+    lines.append('*** Run Number: {0}\n'.format(rng.randint(1, 9)))
+    lines.append('#1:_;>>;' + ';'.join(labels) + '\n')
+    lines.append('#2: measurement usage\n')
+    lines.append('#3: limits usage\n')
+    lines.append('#4:;>>;' + ';'.join(names) + '\n')
+
+    for r in range(rows):
+        vals = [slots[r % hwIds], 'MP' + str(r // hwIds)] + [str(100 * (i + 1)) for i in range(settings)]
+        for cols, (upper, lower) in zip(measGroups, limits):
+            for c in cols:
+                if c == 'A':
+                    v = rng.gauss(1.0, 0.1) if rng.random() > 0.03 else rng.gauss(5.0, 1.0)
+                elif c == 'U':
+                    v = upper
+                elif c == 'L':
+                    v = lower
+                else:
+                    v = 1.0
+                vals.append(repr(round(v, 6)))
+        lines.append(('P_' if rng.random() > 0.1 else 'F_') + ';>>;' + ';'.join(vals) + '\n')
+    lines.append('Test session done\n')
+    return ''.join(lines)
+
+def writeArchive(root, files, rows=40, groups=3, settings=2, seed=1, sessionFiles=4):
+    """
+    This function writes the logfiles into root/data/WaveScale/<serial>/<session>/PS1600/.
+    The testNames are used in turn, the number of rows of a logfile is between rows/2 and rows.
+    @param root root directory
+    @param files number of logfiles
+    @param rows maximum number of data rows of a logfile
+    @param groups maximum number of measurement groups of a testName
+    @param settings maximum number of setting columns of a testName
+    @param seed random seed
+    @param sessionFiles number of logfiles in a session directory
+    @return list of logfile paths
+    """
+    rng = random.Random(seed)
+    paths = []
+    sessionDir = None
+    for k in range(files):
+        if k % sessionFiles == 0:
+            year, month, day, hour = rng.choice([2017, 2018]), rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23)
+            minute, second = rng.randint(0, 59), rng.randint(0, 59)
+            session = '{0:04d}{1:02d}{2:02d}{3:02d}h{4:02d}m{5:02d}s_{6:08x}'.format(year, month, day, hour, minute,
+                                                                                   second, rng.getrandbits(32))
+            serial = 'N2601-66601_{0:06d}'.format(rng.randint(1, 3))
+            sessionDir = os.path.join(root, 'data', 'WaveScale', serial, session, 'PS1600')
+            os.makedirs(sessionDir, exist_ok=True)
+            timeStamp = '{0:04d}-{1:02d}-{2:02d} {3:02d}:{4:02d}:{5:02d}'.format(year, month, day, hour, minute, second)
+
+        testName = TESTNAMES[k % len(TESTNAMES)]
+        testSeed = zlib.crc32('.'.join(testName).encode())
+        minute = (minute + 1) % 60
+        fileName = '.'.join(testName) + '.{0:04d}.{1:02d}.{2:02d}.{3:02d}h{4:02d}m{5:02d}s.th{6}.log'.format(
+            year, month, day, hour, minute, second, rng.randint(1000, 99999))
+        text = getLogText(random.Random(testSeed), random.Random(seed * 1000003 + k), timeStamp,
+                          rows=rng.randint(max(1, rows // 2), rows),
+                          groups=1 + testSeed % groups,
+                          settings=1 + testSeed % settings)
+        path = os.path.join(sessionDir, fileName)
+        with open(path, 'w') as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    args = [int(a) for a in sys.argv[2:]]
+    paths = writeArchive(sys.argv[1], *args)
+    print('{0} logfiles written to {1}'.format(len(paths), sys.argv[1]))
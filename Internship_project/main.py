@@ -10,19 +10,35 @@ from os import sys, path
 from datetime import datetime
 import json
 import logging
+import argparse
+import tempfile
+import time
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
 
 # Installed liberaries
 import xlsxwriter
-import pandas as pd
 
 os.environ['LANG'] = 'de_DE.utf-8'
 
 # Imported Cpk modules
-from Cpk_modules import getFilenames
+from Cpk_modules import getFilenames, iterFilenames
 from Cpk_modules import getDataFrame
-from Cpk_modules import mergeDataFrames
+from Cpk_modules import getExecutor, submitFilenames
+from Cpk_modules import DataFrameCache, DEFAULT_CACHE_DIR
+from Cpk_modules import processTestName, iterTestNames
+from Cpk_modules import IncrementalState, getFingerprint, DEFAULT_STATE_DIR
+from Cpk_modules import DirWatcher
+from Cpk_modules import ManifestIndex
+from Cpk_modules import FileDeduplicator
+from Cpk_modules import HwIndex, HW_FIELDS, DEFAULT_INDEX_FILE
+from Cpk_modules import MeasurementStore, DEFAULT_STORE_FILE
 from Cpk_modules import Bar
-from Cpk_modules import getExcelfile, getSheetName, getgroupedCells
+from Cpk_modules import getExcelfile, getSheetName, getgroupedCells, writeCachedFormulas, writeTableRows, \
+    isTableRowsSupported
+from Cpk_modules import STATS_OUTPUT_MODES
+from Cpk_modules import checkExportFormats, getExportDataframe, getExportPath, writeExport, EXPORT_FORMATS
+from Cpk_modules import RunMetrics, TimedParser
 from Cpk_modules import ConfigFile, valueCheck, loadConfigfile
 
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(name)s - %(levelname)s - %(message)s',
@@ -31,13 +47,8 @@ logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(name)s - %(leve
 
 DEBUG = False
 
-# Not in use so far
-SN_dict = {}            # key : 'SN' and value: [list of HW_info_DF]
-                     # eg: {'001085': [HWData_DF1, HWData_DF2]}
-
-# Not implemented yet.
 # 'default_path' is the path of a file which is being updated every three hr.
-# This file has all the files paths available in /MNT_PROD directory.
+# This file has all the files paths available in /MNT_PROD directory. It is the default MANIFEST File.
 default_path = '..........'
 
 def e(): return sys.exit(1)
@@ -51,7 +62,17 @@ startTime_total = datetime.now()
 
 # Step 1: Config file initialization ________________________________________________________________________________:
 
-jsonObj = sys.argv[1]
+argParser = argparse.ArgumentParser(description='Cpk Analyzer Tool')
+argParser.add_argument('config', help='configuration file (.json)')
+argParser.add_argument('--no-cache', action='store_true', help='parse all logfiles again without reading or writing the cache')
+argParser.add_argument('--clear-cache', action='store_true', help='delete all cached DataFrames before processing')
+argParser.add_argument('--clear-state', action='store_true', help='delete the INCREMENTAL state and parse all logfiles again')
+argParser.add_argument('--watch', action='store_true', help='keep running and refresh the output with new logfiles (WATCH)')
+argParser.add_argument('--hw-serial', metavar='SERIAL', help='print the hardware records of a serial number from the HW_INDEX and exit')
+argParser.add_argument('--hw-file', metavar='LOGFILE', help='print the hardware records of a logfile from the HW_INDEX and exit')
+args = argParser.parse_args()
+
+jsonObj = args.config
 cfgDict = loadConfigfile(jsonObj)
 cfgObj = ConfigFile(cfgDict)
 
@@ -72,10 +93,190 @@ Bins = valueCheck(cfgObj.bins(), 5)
 # Checking %OUTLIERS value. The default value is 10.
 Outliers_percent = valueCheck(cfgObj.outliers_percentage(),10)
 
+# Checking WORKERS value. The default value is 1, logfiles are parsed one by one in the main process.
+Workers = valueCheck(cfgObj.workers(), 1)
+
+# If STREAMING is true, logfiles are parsed while the directories are still being walked. The parsed DataFrames are kept
+# until their testName is processed, so only the first STREAMING_BUDGET_MB of logfiles are parsed during the walk, the
+# next logfiles are parsed with their group.
+Streaming = cfgObj.streaming()
+StreamingBudget = cfgObj.streaming_budget()
+if not isinstance(StreamingBudget, (int, float)) or StreamingBudget <= 0:
+    print('STREAMING_BUDGET_MB field in configuration file is invalid, 512 MB is used.')
+    StreamingBudget = 512
+
+# Checking TESTNAME_WORKERS value. The default value is 1, testNames are processed one by one in the main process.
+# With more workers whole testNames are processed in worker processes, the logfiles of a testName are parsed one by
+# one in its worker and WORKERS is not used.
+TestNameWorkers = valueCheck(cfgObj.testname_workers(), 1)
+if TestNameWorkers > 1 and Streaming:
+    print('TESTNAME_WORKERS field in configuration file is not used in STREAMING mode.')
+    TestNameWorkers = 1
+
+# Checking WALK_THREADS value. The default value is 8 threads to list the directory trees.
+WalkThreads = cfgObj.walk_threads()
+if not isinstance(WalkThreads, int) or isinstance(WalkThreads, bool) or WalkThreads < 1:
+    print('WALK_THREADS field in configuration file is invalid, 8 threads are used.')
+    WalkThreads = 8
+
+# If MANIFEST is enabled, the logfiles are selected from the index of the manifest file (default_path) instead of
+# walking the root directories. The manifest is parsed again only when it changed.
+ManifestMode, ManifestFile = cfgObj.manifest()
+if ManifestFile == '':
+    ManifestFile = default_path
+if ManifestMode and not os.path.isfile(ManifestFile):
+    print('MANIFEST File field in configuration file is invalid, the root directories are walked.')
+    ManifestMode = False
+
+# If DEDUP is enabled, the copies of the selected logfiles (the same content under several paths eg: overlapping or
+# mirrored root directories) are removed after the discovery, each logfile is parsed once and counted once per group.
+# Files of the same size are compared by a hash of their first and last BlockKB, then by a hash of their whole content.
+DedupMode, DedupBlock = cfgObj.dedup()
+if not isinstance(DedupBlock, int) or DedupBlock <= 0:
+    print('DEDUP BlockKB field in configuration file is invalid, 64 KB is used.')
+    DedupBlock = 64
+Dedup = FileDeduplicator(WalkThreads, DedupBlock*1024) if DedupMode else None
+
+# Checking STATS_OUTPUT value. 'formulas' (default) writes Excel formulas, 'values' writes the computed statistics,
+# 'both' writes the formulas with the computed statistics as cached values.
+StatsMode = cfgObj.stats_output()
+if StatsMode not in STATS_OUTPUT_MODES:
+    print('STATS_OUTPUT field in configuration file is invalid, formulas are written.')
+    StatsMode = 'formulas'
+
+# If CONSTANT_MEMORY is true, the workbook is written row by row and only one row of a worksheet is kept in memory.
+ConstantMemory = cfgObj.constant_memory()
+if ConstantMemory and not isTableRowsSupported():
+    print('CONSTANT_MEMORY field in configuration file is not supported by the installed XlsxWriter, '
+          'the workbook is written in memory.')
+    ConstantMemory = False
+
+# If SAMPLES_FLOAT32 is true, the samples of the parsed logfiles are kept as float32 until they are merged.
+SamplesFloat32 = cfgObj.samples_float32()
+
+# Checking OUTPUT_FORMATS value. The default is the Excel workbook only, 'parquet', 'csv' and 'feather' files of each
+# testName are written in parallel with the workbook.
+OutputFormats, rejected = checkExportFormats(cfgObj.output_formats())
+for fmt, reason in rejected:
+    print('OUTPUT_FORMATS field in configuration file: {0} is skipped, {1}.'.format(fmt, reason))
+if len(OutputFormats) == 0:
+    OutputFormats = ['xlsx']
+ExportFormats = [fmt for fmt in OutputFormats if fmt in EXPORT_FORMATS]
+
 # cfgObj.hide_groups() method will return boolean values. If user want to keep histrogram and settings columns in
 # excel output, this method will return (True, True):
 keep_hist, keep_settings = cfgObj.hide_groups()
 
+# Setting up the cache of parsed logfiles. The default cache directory is ~/.cache/Cpk_Tool/DataFrames
+useCache, CacheDir, CacheSize = cfgObj.cache()
+if CacheDir == '':
+    CacheDir = DEFAULT_CACHE_DIR
+Cache = DataFrameCache(CacheDir, CacheSize*1024*1024)
+
+if args.clear_cache:
+    Cache.clear()
+
+# If SPILL_MERGE is enabled, the parsed DataFrames of a group are spilled to disk and merged one partition at a time
+# within MemoryMB. The partition files are written to a temporary directory in Dir, the default is the system temp dir.
+SpillMode, SpillDir, SpillMemory = cfgObj.spill_merge()
+if SpillDir == '':
+    SpillDir = tempfile.gettempdir()
+if not isinstance(SpillMemory, (int, float)) or SpillMemory <= 0:
+    print('SPILL_MERGE MemoryMB field in configuration file is invalid, 1024 MB is used.')
+    SpillMemory = 1024
+
+# If WATCH is enabled (or --watch is given), the program keeps running after the first output file. Every IntervalS
+# seconds the new logfiles are selected and the worksheets of their testNames are refreshed. A test session directory
+# is rescanned for HotHours after its start or its last new logfile. A new logfile is processed when its size and
+# modification time didn't change since the previous poll, or it was not modified for SettleS seconds.
+Watch, WatchInterval, HotHours, SettleSeconds = cfgObj.watch()
+Watch = Watch or args.watch
+if Watch and (Streaming or SpillMode):
+    print('WATCH field in configuration file is not used in STREAMING or SPILL_MERGE mode.')
+    Watch = False
+if not isinstance(WatchInterval, (int, float)) or WatchInterval <= 0:
+    print('WATCH IntervalS field in configuration file is invalid, 300 s is used.')
+    WatchInterval = 300
+if not isinstance(HotHours, (int, float)) or HotHours <= 0:
+    print('WATCH HotHours field in configuration file is invalid, 48 hours are used.')
+    HotHours = 48
+if not isinstance(SettleSeconds, (int, float)) or SettleSeconds < 0:
+    print('WATCH SettleS field in configuration file is invalid, 60 s is used.')
+    SettleSeconds = 60
+
+# If INCREMENTAL is enabled, the parsed DataFrames of each testName are kept in a state directory between runs and only
+# new logfiles are parsed. The default state directory is ~/.cache/Cpk_Tool/State
+Incremental, StateDir = cfgObj.incremental()
+if Incremental and (Streaming or SpillMode):
+    print('INCREMENTAL field in configuration file is not used in STREAMING or SPILL_MERGE mode.')
+    Incremental = False
+# In WATCH mode only the new logfiles are parsed at each refresh.
+if Watch and not Incremental:
+    print('INCREMENTAL is enabled in WATCH mode.')
+    Incremental = True
+if StateDir == '':
+    StateDir = DEFAULT_STATE_DIR
+State = IncrementalState(StateDir) if Incremental else None
+if State is not None and args.clear_state:
+    State.clear()
+
+# If HW_INDEX is enabled, the TestSessionData records of the logfiles are kept in an index file and the Cpk of each ID
+# is computed per hardware, the hardware field is SliceBy eg: HighLevelSerialNumber. The default index file is
+# ~/.cache/Cpk_Tool/hwIndex.pkl
+HwIndexMode, IndexFile, HwKey = cfgObj.hw_index()
+if HwIndexMode and SpillMode:
+    print('HW_INDEX field in configuration file is not used in SPILL_MERGE mode.')
+    HwIndexMode = False
+if HwKey not in HW_FIELDS:
+    print('HW_INDEX SliceBy field in configuration file is invalid, HighLevelSerialNumber is used.')
+    HwKey = 'HighLevelSerialNumber'
+if IndexFile == '':
+    IndexFile = DEFAULT_INDEX_FILE
+Index = None
+if HwIndexMode or args.hw_serial is not None or args.hw_file is not None:
+    Index = HwIndex(IndexFile)
+    Index.load()
+
+# Printing the hardware records of a serial number or a logfile from the index, no logfile is read.
+if args.hw_serial is not None or args.hw_file is not None:
+    Records = Index.bySerial(args.hw_serial) if args.hw_serial is not None else Index.byFile(args.hw_file)
+    if Records.empty:
+        print('No hardware records found in ' + IndexFile)
+    else:
+        print(Records.to_string(index=False))
+    sys.exit(0)
+
+# If MEASUREMENT_STORE is enabled, the measurement rows of the selected logfiles are written to an SQLite database
+# as they are parsed, the statistics of any slice can then be queried with query.py. A logfile is ingested again only if
+# it changed. The default database is ~/.cache/Cpk_Tool/measurements.db
+StoreMode, StoreFile = cfgObj.measurement_store()
+if StoreFile == '':
+    StoreFile = DEFAULT_STORE_FILE
+Store = MeasurementStore(StoreFile) if StoreMode else None
+
+# Options of processTestName().
+Options = {'bins': Bins, 'outliers': Outliers_percent, 'keep_hist': keep_hist, 'keep_settings': keep_settings,
+           'float32': SamplesFloat32, 'spill': SpillMode, 'spill_dir': SpillDir,
+           'spill_memory': int(SpillMemory*1024*1024), 'statistics': StatsMode != 'formulas' or bool(ExportFormats),
+           'hw_index': Index if HwIndexMode else None, 'hw_key': HwKey}
+
+# The parsed DataFrames are written to the measurement store by processTestName(). The testNames processed in worker
+# processes are ingested after the output files.
+Options['store'] = Store.addParsed if Store is not None and TestNameWorkers == 1 else None
+
+# Parser is the function used to get the DataFrame of a logfile.
+useCache = useCache and not args.no_cache
+Parser = Cache.getDataFrame if useCache else getDataFrame
+
+# Recording the time of each stage and the parse time of each logfile. The run report is written next to the excel
+# output file.
+writeReport, SlowestFiles = cfgObj.metrics()
+if not isinstance(SlowestFiles, int) or isinstance(SlowestFiles, bool) or SlowestFiles < 0:
+    print('METRICS SlowestFiles field in configuration file is invalid, 10 files are reported.')
+    SlowestFiles = 10
+Metrics = RunMetrics(SlowestFiles)
+Parser = TimedParser(Parser, header=StoreMode)
+
 # Specify path for input files:
 ROOT_DIRs = cfgObj.rootDir()
 # check if the ROOT_DIRs is empty then ROOT_DIRs == default_path, to get files path based on config file.
@@ -88,12 +289,27 @@ if len(ROOT_DIRs) == 0:
 Filters = cfgObj.filenameFilter()
 #print(Filters)
 
+# A session directory is skipped by the YEAR/MONTH filters only if none of the months of its SESSION_DAYS after its
+# start time is selected.
+for Filter in Filters.values():
+    SessionDays = Filter.get('SESSION_DAYS', 31)
+    if not isinstance(SessionDays, int) or isinstance(SessionDays, bool) or SessionDays < 0:
+        print('SESSION_DAYS field in configuration file is invalid, 31 days are used.')
+        Filter['SESSION_DAYS'] = 31
+
 # Exclude files while getting file names
 exclude_files_base = ['linearity', 'ReadFromHardware', 'DutyCycleCheck', 'BadcLinearity', 'WritePartitionTable','MaintenanceRunSummary']
 exclude_files_config = cfgObj.exclude_files()
 exclude_files = exclude_files_base + exclude_files_config
 #print(exclude_files)
 
+# A group state is used again only if the group is selected in the same way and parsed with the same options.
+# With DEDUP the copies are not in the state, the states of the runs without DEDUP are not used.
+Options['state'] = State
+Options['fingerprints'] = {group: getFingerprint(dirList, Filters[group], exclude_files, SamplesFloat32,
+                                                 *(['dedup'] if DedupMode else []))
+                           for group, dirList in zip(sorted(Filters, key=lambda group: int(group[5:])), ROOT_DIRs)}
+
 # Specify excel output file name:
 Username = os.environ["USER"]
 TimeStamp = str(datetime.now().strftime('%Y-%m-%d_%Hh%Mm%Ss'))
@@ -104,12 +320,83 @@ else:
     fileName = cfgObj.Excel_fileName()
 
 ofile = OutputDir + fileName + '_' + TimeStamp + '.xlsx'
+reportFile = OutputDir + fileName + '_' + TimeStamp + '_report.json'
+
+# Exported files are written to a directory named as the excel output file eg: OutputDir/fileName_TimeStamp/testName.csv
+# The Cpk per hardware of HW_INDEX is written as testName_HW.csv, or in the OUTPUT_FORMATS of the exported files.
+ExportDir = OutputDir + fileName + '_' + TimeStamp
+HwFormats = ExportFormats if ExportFormats else ['csv']
+if ExportFormats or HwIndexMode:
+    os.makedirs(ExportDir)
 
 # Step 2: Select files based on configuration file ________________________________________________________________:
 print('\n')
 print('Selecting Logfiles ..................................................................')
 Time1 = datetime.now()
-testNames_dict, filesCount = getFilenames(ROOT_DIRs, Filters, exclude_files)
+
+# In WATCH mode the containers of the root directories are listed before the discovery, so the logfiles added during the
+# discovery are found by the first poll.
+Watchers = []
+if Watch:
+    Watchers = [DirWatcher(dirList, Filters['group' + str(n)], exclude_files, 'group' + str(n), HotHours*3600,
+                           SettleSeconds)
+                for n, dirList in enumerate(ROOT_DIRs, 1)]
+
+# Reading the index of the manifest, the manifest is parsed if it changed since the index was written.
+Manifest = None
+if ManifestMode:
+    with Metrics.stage('manifest index'):
+        Manifest = ManifestIndex(ManifestFile)
+        if Manifest.load():
+            Metrics.addItems('manifest index', len(Manifest))
+
+# Pool of worker processes to parse logfiles, None if WORKERS is 1 or testNames are processed in worker processes.
+Executor = getExecutor(Workers if TestNameWorkers == 1 else 1)
+
+with Metrics.stage('discovery'):
+    if Streaming:
+        # Discovered logfiles are submitted to the workers during the walk. With a single worker the files are parsed
+        # in a thread, which still overlaps the directory I/O with parsing.
+        if Executor is None:
+            Executor = ThreadPoolExecutor(max_workers=1)
+        testNames_dict, filesCount = submitFilenames(iterFilenames(ROOT_DIRs, Filters, exclude_files, WalkThreads,
+                                                                   manifest=Manifest),
+                                                     Executor, Parser, int(StreamingBudget*1024*1024))
+    else:
+        testNames_dict, filesCount = getFilenames(ROOT_DIRs, Filters, exclude_files, WalkThreads, manifest=Manifest)
+Metrics.addItems('discovery', filesCount)
+if Manifest is not None:
+    for file in Manifest.missing:
+        logging.info('Logfile of the manifest not found: ' + file)
+
+# Removing the copies of the selected logfiles, a copy selected by another group is replaced by the path of its first
+# copy so its DataFrame is shared.
+if Dedup is not None:
+    with Metrics.stage('dedup'):
+        testNames_dict, removed = Dedup.dedup(testNames_dict)
+    Metrics.addItems('dedup', filesCount)
+    filesCount -= removed
+    for file, first in Dedup.duplicates:
+        logging.info('Duplicate logfile: {0} is a copy of {1}'.format(file, first))
+
+# In INCREMENTAL mode the testNames and groups of the state are processed even if their logfiles are not found.
+if State is not None:
+    for testName, storedGroups in State.testNames().items():
+        groupsDict = testNames_dict.get(testName, {})
+        for group, fingerprint in storedGroups.items():
+            if Options['fingerprints'].get(group) == fingerprint: groupsDict.setdefault(group, [])
+        if groupsDict:
+            testNames_dict[testName] = dict(sorted(groupsDict.items(), key=lambda item: int(item[0][5:])))
+    testNames_dict = {testName: testNames_dict[testName] for testName in State.getOrder(list(testNames_dict))}
+    State.storeOrder(list(testNames_dict))
+
+# Reading the TestSessionData records of the new and changed logfiles into the hardware index.
+if HwIndexMode:
+    with Metrics.stage('hw index'):
+        Metrics.addItems('hw index', Index.update([file if isinstance(file, str) else file[0]
+                                                   for groupsDict in testNames_dict.values()
+                                                   for filesList in groupsDict.values() for file in filesList], Executor))
+        Index.store()
 
 logging.info('Number of Unique testNames:', len(testNames_dict))
 logging.info('List of Unique testNames:', '\n')
@@ -118,6 +405,10 @@ for key in testNames_dict.keys(): logging.info(key)
 T1 = datetime.now() - Time1
 print('\n')
 print('Total number of logfiles selected: {0}'.format(filesCount))
+if Dedup is not None:
+    print('Duplicate logfiles found: {0}, {1} copies removed'.format(len(Dedup.duplicates), removed))
+if Manifest is not None and Manifest.missing:
+    print('Logfiles of the manifest not found: {0}'.format(len(Manifest.missing)))
 print('Process time : ' + str(T1))
 print('\n')
 
@@ -127,85 +418,76 @@ print('Processing logfiles to generate Excel output file........... ............
 # Unpacking the testNames_dict with key= "test_ID", val= [list of file paths]
 i1 = 0
 i2 = 0
+barTotal = filesCount
 Time2 = datetime.now()
 
-with xlsxwriter.Workbook(ofile) as Workbook:
-    cpk_format = Workbook.add_format({'bg_color': '#FFFF00'})
-
-    for testName, groupsDict in testNames_dict.items():
-        # Initalizing list to store Dataframe from single file.
-        # Once loop is over DF_list is passed as argument to mergeDataframes() function.
-        """
-        testNames_dict:
-            {'testname1': {group1: [filepath1, filepath2, filepath3, filepath4], --->mergedDF1 --> finalMergedDF for excel worksheet
-                           group2: [filepath1, filepath2, filepath3]             --->mergedDF2 -->
-                           },
-                           
-             'testname2': {group1: [filepath1, filepath2, filepath3, filepath4], --->mergedDF1 --> finalMergedDF for excel worksheet
-                           group2: [filepath1, filepath2]                        --->mergedDF2 -->
-                           }
-            }
-        """
-
-        Number_of_groups = len(groupsDict)
-        mergedDF_lst = []
-        IDs_Settings_DFs = []
-
-        idx = 0  # Number of groups to compare
-        for group, filesList in groupsDict.items():
-            DFs_list = []
-
-            for file in filesList:
-                if DEBUG: print(file)
-                fname = file.split('/')[-1]
-                i1 += 1
-                # Initializing a progress bar
-                Bar(i1, total=filesCount, text=fname)
-
-                # Reading logfile and parsing and manipulating data as DataFrame: ----------> processing singlefile
-                TestData_df = getDataFrame(file)
-
-                # Append DataFrames in DF_list.
-                # if TestData_df is not empty append TestData_df to DFs_list else skip
-                if DEBUG: print(testName, '\n', 'Number of Datafames in DFs_list: ', len(DFs_list), '\n')
-                if not TestData_df.empty:
-                    DFs_list.append(TestData_df)
-
-
-# Step 4: Concate/mergeing Dataframes and perform transformation ______________________________________________________:
-
-            # Check if DFs_list is not empty
-            if len(DFs_list) != 0:
-                idx += 1
-                mergedDF, IdsDF, settingDF = mergeDataFrames(DFs_list, Bins, Outliers_percent, keep_hist, IDX = str(idx))
-                mergedDF_lst.append(mergedDF)
-
-                # IdsDF and settingDF is set common for specific test name group(Worksheet)
-                if len(IDs_Settings_DFs) == 0:
-                    # STATS_0 columns appear in Output file if there are atleast two groups in Config file.
-                    if Number_of_groups > 1:
-                        # Add empty STATS_0 columns
-                        STATS_0 = ['STATS_0', 'Mean_A', 'Mean_R', 'Stdev_R', 'Cpk_R']
-                        for col in STATS_0: IdsDF[col] = ''
-
-                    # Appending IdsDF, settingsDF in to IDs_Settings_DFs list
-                    IDs_Settings_DFs.append(IdsDF)
-                    # If keep_settings is True, settings columns will appear in final excel output
-                    if keep_settings:
-                        IDs_Settings_DFs.append(settingDF)
-
-        # Concatenate Dataframes from mergedDF_lst to get finalDF,
-        if len(mergedDF_lst) != 0:
-            finalDF = pd.concat(mergedDF_lst, axis=1, join='inner')
-
-            # Concatenating IDs + finalDF + Settings in to FinalDF for Excel workbook.
-            if keep_settings:
-                FinalDF = pd.concat([IDs_Settings_DFs[0], finalDF, IDs_Settings_DFs[1]], axis=1, join='inner')
-            else:
-                FinalDF = pd.concat([IDs_Settings_DFs[0], finalDF], axis=1, join='inner')
-
-            FinalDF.reset_index(inplace=True)
-            FinalDF.fillna('', inplace=True)
+def updateBar(count, text):
+    """ This function updates the progress bar after count logfiles are processed. """
+    global i1
+    i1 += count
+    Bar(i1, total=barTotal, text=text)
+
+# Pool of worker processes to process whole testNames, None if TESTNAME_WORKERS is 1.
+TestNameExecutor = getExecutor(TestNameWorkers)
+
+# Exports are written in threads while the next testNames are processed.
+Exporter = ThreadPoolExecutor(max_workers=2) if ExportFormats or HwIndexMode else None
+
+# In WATCH mode the results of each testName are kept, only the testNames with new logfiles are processed again.
+Results = {}
+
+def iterResults(refresh):
+    """
+    This function processes the testNames of refresh and yields the results of all testNames in the order of
+    testNames_dict. The results of the other testNames are taken from Results.
+    @param refresh set of testNames to process.
+    @return generator of tuples (testName, (FinalDF, groups, StatsDF, HwDF), True if the testName was processed)
+    """
+    global barTotal
+    refreshDict = {testName: groupsDict for testName, groupsDict in testNames_dict.items() if testName in refresh}
+    barTotal = sum(len(filesList) for groupsDict in refreshDict.values() for filesList in groupsDict.values())
+
+    # Parsing and merging the logfiles of each testName. With TESTNAME_WORKERS whole testNames are processed in worker
+    # processes, the worksheets are still written in the order of testNames_dict.
+    if TestNameExecutor is not None:
+        results = iterTestNames(refreshDict, TestNameExecutor, Options, Parser, Metrics, progress=updateBar,
+                                inflight=TestNameWorkers + 2)
+    else:
+        results = ((testName, processTestName(testName, groupsDict, Options, Parser, Metrics, Executor, Streaming,
+                                              progress=updateBar))
+                   for testName, groupsDict in refreshDict.items())
+
+    for testName in testNames_dict:
+        if testName in refresh:
+            testName, result = next(results)
+            if Watch:
+                Results[testName] = result
+            yield testName, result, True
+        elif testName in Results:
+            yield testName, Results[testName], False
+
+def writeOutputs(refresh):
+    """
+    This function writes the excel output file with the worksheets of all testNames and exports the results of the
+    processed testNames. In WATCH mode the workbook is written to a temporary file first and renamed, so a reader never
+    sees a partial file.
+    @param refresh set of testNames to process.
+    """
+    global i1, i2
+    i1 = 0
+    i2 = 0
+    exportFutures = []
+    workbookFile = ofile + '.tmp' if Watch else ofile
+
+    with ExitStack() as stack:
+        Workbook = None
+        if 'xlsx' in OutputFormats:
+            Workbook = stack.enter_context(xlsxwriter.Workbook(workbookFile, {'constant_memory': ConstantMemory}))
+            cpk_format = Workbook.add_format({'bg_color': '#FFFF00'})
+
+        for testName, (FinalDF, groups, StatsDF, HwDF), processed in iterResults(refresh):
+            if FinalDF is None:
+                continue
             FinalDF_cols = FinalDF.columns.tolist()
             #print(FinalDF_cols)
 
@@ -215,36 +497,115 @@ with xlsxwriter.Workbook(ofile) as Workbook:
             table_Num = str(i2)
             len_table_Num = len(table_Num)
 
-            # Number of groups in a worksheet
-            groups = idx
-
-            # Get paramters for Worksheet.add_table(table_range, options) function.
-            table_range, options, cpkCells_lst = getExcelfile(FinalDF, groups, idx=table_Num)
-
-            # Get worksheet name
-            sheetName = getSheetName(testName, table_Num)
-            # Initialize worksheet and adding table to it.
-
-            Worksheet = Workbook.add_worksheet(sheetName)
-            Worksheet.write(0, 0, testName)
-            Worksheet.add_table(table_range, options)
-
-            # Applying formatting to work sheet
-            # 1) Cpk cells Conditional formatting:
-            for cells in cpkCells_lst:
-                Worksheet.conditional_format(cells,    {     'type': 'cell',
-                                                         'criteria': '<',
-                                                            'value': 2,
-                                                           'format': cpk_format})
-
-            # 2) Apply grouping to columns
-            groupedCols_lst = getgroupedCells(FinalDF_cols)
-            for colsRange in groupedCols_lst:
-            #print(colsRange)
-                Worksheet.set_column(colsRange, None, None, {'level': 1, 'hidden': True})
-
-            # 3) Freezing header row and first four columns
-            Worksheet.freeze_panes(2, 4)
+            # Exporting the testName result, the exported Dataframe is a copy of FinalDF.
+            if ExportFormats and processed:
+                with Metrics.stage('export', items=len(FinalDF)):
+                    ExportDF = getExportDataframe(FinalDF, StatsDF)
+                    for fmt in ExportFormats:
+                        exportFutures.append(Exporter.submit(writeExport, ExportDF, getExportPath(ExportDir, testName, fmt), fmt))
+
+            # Exporting the Cpk per hardware of the testName.
+            if HwDF is not None and processed:
+                with Metrics.stage('export', items=len(HwDF)):
+                    for fmt in HwFormats:
+                        exportFutures.append(Exporter.submit(writeExport, HwDF, getExportPath(ExportDir, testName + '_HW', fmt), fmt))
+
+            if Workbook is None:
+                continue
+
+            # Writing the worksheet.
+            with Metrics.stage('excel', items=len(FinalDF)):
+                if StatsMode == 'values':
+                    for col in StatsDF.columns:
+                        if col in FinalDF: FinalDF[col] = StatsDF[col]
+
+                # Get paramters for Worksheet.add_table(table_range, options) function.
+                table_range, options, cpkCells_lst = getExcelfile(FinalDF, groups, idx=table_Num, stats_mode=StatsMode,
+                                                                  streaming=ConstantMemory)
+
+                # Get worksheet name
+                sheetName = getSheetName(testName, table_Num)
+                # Initialize worksheet and adding table to it.
+
+                Worksheet = Workbook.add_worksheet(sheetName)
+                Worksheet.write(0, 0, testName)
+                if ConstantMemory:
+                    writeTableRows(Worksheet, table_range, options, FinalDF, StatsDF if StatsMode == 'both' else None)
+                else:
+                    Worksheet.add_table(table_range, options)
+                    if StatsMode == 'both':
+                        writeCachedFormulas(Worksheet, options, StatsDF)
+
+                # Applying formatting to work sheet
+                # 1) Cpk cells Conditional formatting:
+                for cells in cpkCells_lst:
+                    Worksheet.conditional_format(cells,    {     'type': 'cell',
+                                                             'criteria': '<',
+                                                                'value': 2,
+                                                               'format': cpk_format})
+
+                # 2) Apply grouping to columns
+                groupedCols_lst = getgroupedCells(FinalDF_cols)
+                for colsRange in groupedCols_lst:
+                #print(colsRange)
+                    Worksheet.set_column(colsRange, None, None, {'level': 1, 'hidden': True})
+
+                # 3) Freezing header row and first four columns
+                Worksheet.freeze_panes(2, 4)
+
+        # Closing the workbook writes the worksheets to the xlsx file.
+        with Metrics.stage('excel'):
+            stack.close()
+            if Workbook is not None and Watch:
+                os.replace(workbookFile, ofile)
+
+    # Waiting for the exported files.
+    with Metrics.stage('export'):
+        for future in exportFutures:
+            path = future.result()
+            logging.info('Exported file: ' + path)
+
+    # Deleting least recently used cache entries if the cache is larger than MaxSizeMB.
+    if useCache:
+        with Metrics.stage('cache evict'):
+            Cache.evict()
+
+    if writeReport:
+        Metrics.info = {'config': jsonObj, 'files': filesCount, 'worksheets': i2, 'workers': Workers,
+                        'streaming': Streaming, 'cache': useCache, 'output_formats': OutputFormats,
+                        'samples_float32': SamplesFloat32, 'spill_merge': SpillMode, 'testname_workers': TestNameWorkers,
+                        'incremental': Incremental, 'watch': Watch, 'refreshed': len(refresh), 'hw_index': HwIndexMode,
+                        'measurement_store': StoreMode, 'manifest': ManifestMode, 'dedup': DedupMode,
+                        'duplicates': Dedup.getReport() if Dedup is not None else [],
+                        'manifest_missing': len(Manifest.missing) if Manifest is not None else 0}
+        Metrics.writeReport(reportFile)
+
+def ingestStore(fileEntries):
+    """
+    This function writes the measurement rows of the new and changed logfiles which were not written by
+    processTestName() to the measurement store, eg: the logfiles of the INCREMENTAL state or of the testNames processed
+    in TESTNAME_WORKERS processes. These logfiles are parsed again, with the cache enabled their DataFrames are read
+    from the cache.
+    @param fileEntries list of tuples (testName, group, filepath)
+    """
+    global i1, barTotal
+    i1 = 0
+    barTotal = len({file for testName, group, file in fileEntries})
+    with Metrics.stage('store ingest'):
+        files, rows = Store.ingest(fileEntries, Executor, Parser, Metrics, progress=updateBar)
+    Metrics.addItems('store ingest', files)
+    logging.info('Measurement store: {0} logfiles, {1} rows ingested'.format(files, rows))
+
+writeOutputs(set(testNames_dict))
+
+if Store is not None:
+    print('\n')
+    print('Writing measurements to the measurement store ...................................')
+    ingestStore([(testName, group, file if isinstance(file, str) else file[0])
+                 for testName, groupsDict in testNames_dict.items()
+                 for group, filesList in groupsDict.items() for file in filesList])
+    if writeReport:
+        Metrics.writeReport(reportFile)
 
 T2 = datetime.now() - Time2
 print(T2)
@@ -252,13 +613,80 @@ print('\n')
 Total_Time = T1 + T2
 print('The Excel Output file directory path:  ')
 print(OutputDir)
+if writeReport:
+    print('Run report:  ')
+    print(reportFile)
+if ExportFormats or HwIndexMode:
+    print('Exported files directory path:  ')
+    print(ExportDir)
+if Store is not None:
+    print('Measurement store:  ')
+    print(StoreFile)
 print('\n')
 print("Total program execution time: {0}".format(Total_Time))
 
-# TODO: Define relationship to link HW_info_df to final merged_df.
-# Appending 'HW_info_df' for each SN in SN_dict:
-# if SN not in SN_dict:
-#    SN_dict[SN] = []
-# SN_dict[SN].append(HwData_DF)
-# Updating TestID_Dfs_info dictionary
-# TestID_DF_info[testName] = [len(DFs_dim), dict(Counter(DFs_dim))]
\ No newline at end of file
+# Step 5: Watching the root directories for new logfiles _____________________________________________________________:
+# Every WatchInterval seconds the watchers list the changed containers and the hot session directories. The new logfiles
+# are added to testNames_dict, only their testNames are processed again and the output files are rewritten.
+if Watch:
+    print('\n')
+    print('Watching for new logfiles every {0} s, press Ctrl+C to stop ...............................'.format(WatchInterval))
+    selectedFiles = {file for groupsDict in testNames_dict.values() for filesList in groupsDict.values()
+                     for file in filesList}
+    try:
+        while True:
+            time.sleep(WatchInterval)
+            Metrics = RunMetrics(SlowestFiles)
+            Time2 = datetime.now()
+
+            with Metrics.stage('discovery'):
+                newFiles = [(testName, group, file) for Watcher in Watchers for testName, group, file in Watcher.poll()
+                            if file not in selectedFiles]
+            Metrics.addItems('discovery', len(newFiles))
+            if len(newFiles) == 0:
+                continue
+
+            # The copies are removed, their paths are not selected again by the next polls.
+            if Dedup is not None:
+                selectedFiles.update(file for testName, group, file in newFiles)
+                with Metrics.stage('dedup'):
+                    newFiles, removed = Dedup.dedupEntries(newFiles, testNames_dict)
+                if len(newFiles) == 0:
+                    continue
+
+            if HwIndexMode:
+                with Metrics.stage('hw index'):
+                    Metrics.addItems('hw index', Index.update([file for testName, group, file in newFiles], Executor))
+                    Index.store()
+
+            refresh = set()
+            for testName, group, file in newFiles:
+                selectedFiles.add(file)
+                testNames_dict.setdefault(testName, {}).setdefault(group, []).append(file)
+                refresh.add(testName)
+            for testName in refresh:
+                testNames_dict[testName] = dict(sorted(testNames_dict[testName].items(), key=lambda item: int(item[0][5:])))
+            State.storeOrder(list(testNames_dict))
+            filesCount += len(newFiles)
+
+            writeOutputs(refresh)
+            if Store is not None:
+                ingestStore(newFiles)
+                if writeReport:
+                    Metrics.writeReport(reportFile)
+            print('\n')
+            print('{0}: {1} new logfiles, {2} testNames refreshed, {3} hot session directories. Process time : {4}'.format(
+                  datetime.now().strftime('%Y-%m-%d %H:%M:%S'), len(newFiles), len(refresh),
+                  sum(len(Watcher) for Watcher in Watchers), datetime.now() - Time2))
+    except KeyboardInterrupt:
+        print('\n')
+        print('Watch mode stopped.')
+
+if Executor is not None:
+    Executor.shutdown()
+if TestNameExecutor is not None:
+    TestNameExecutor.shutdown()
+if Exporter is not None:
+    Exporter.shutdown()
+if Store is not None:
+    Store.close()
@@ -0,0 +1,54 @@
+"""
+@file query.py
+This file queries the measurement store written in MEASUREMENT_STORE mode. It prints the Count, Mean, Std, limits and Cpk
+of each ID of a testName for a slice of dates, workstation, group or hardware, no logfile is read.
+
+eg: python3 query.py Centipede.Awg.Driver.Verification.Regular.Gain.Check --from 2018-08-01 --to 2018-08-31
+    python3 query.py --list
+"""
+
+import argparse
+import os
+from os import sys
+
+from Cpk_modules import MeasurementStore, DEFAULT_STORE_FILE
+
+argParser = argparse.ArgumentParser(description='Cpk Analyzer Tool - measurement store query')
+argParser.add_argument('testName', nargs='?', help='testName eg: Centipede.Awg.Driver.Verification.Regular.Gain.Check')
+argParser.add_argument('--store', default=DEFAULT_STORE_FILE, help='measurement store file (default: %(default)s)')
+argParser.add_argument('--list', action='store_true', help='list the testNames of the slice and their number of logfiles')
+argParser.add_argument('--from', dest='dateFrom', metavar='YYYY-MM-DD', help='first date of the logfiles')
+argParser.add_argument('--to', dest='dateTo', metavar='YYYY-MM-DD', help='last date of the logfiles')
+argParser.add_argument('--workstation', help='workstation of the logfiles')
+argParser.add_argument('--group', help='group of the configuration file eg: group1')
+argParser.add_argument('--hw', dest='HwIds', metavar='HWIDS', help='HwIds of the IDs eg: Slot1')
+argParser.add_argument('--id', dest='ID', metavar='PATTERN', help="IDs 'HwIds|MeasPointIds|MeasNames', SQL LIKE pattern")
+argParser.add_argument('--csv', metavar='FILE', help='write the statistics to a csv file')
+args = argParser.parse_args()
+
+if not os.path.isfile(args.store):
+    print('Measurement store not found: ' + args.store)
+    sys.exit(1)
+
+if args.testName is None and not args.list:
+    argParser.error('a testName or --list is required')
+
+Store = MeasurementStore(args.store)
+Slice = {'testName': args.testName, 'group': args.group, 'dateFrom': args.dateFrom, 'dateTo': args.dateTo,
+         'workstation': args.workstation, 'HwIds': args.HwIds, 'ID': args.ID}
+
+if args.list:
+    ResultDF = Store.getTestNames(**Slice)
+else:
+    ResultDF = Store.getStatistics(**Slice)
+Store.close()
+
+if ResultDF.empty:
+    print('No measurements found.')
+    sys.exit(0)
+
+if args.csv is not None:
+    ResultDF.to_csv(args.csv, index=False)
+    print(args.csv)
+else:
+    print(ResultDF.to_string(index=False))